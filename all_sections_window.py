@@ -0,0 +1,409 @@
+#!/usr/bin/python3
+
+"""
+- This window opens up when 'All Linux Sections' is selected through the
+'Farm_Selection_Window' of the Farm UI.
+Shows every section of the Linux Farm side by side, so all of them can be
+edited and staged together.
+- Created using QtPy.
+- Please only adjust values if totally sure of what you are doing!
+
+Written in Python3.
+"""
+
+from qtpy import QtWidgets, QtCore, QtGui
+from allocation_model import SectionAllocations
+from changes_confirmation_window import UiConfirmFarmChangesMainWindow
+from config_store import load_config
+from share_matrix import ShareMatrix, ShareMatrixPanel
+from staging import get_overlay
+
+
+class UiAllSectionsMainWindow(QtWidgets.QMainWindow):
+    """Main window class for editing every Linux Farm section at once.
+
+    Every show is a row and every section a column of a share matrix, with
+    the nominal total of each section under its name. Rows, columns or blocks
+    of cells can be changed together, and the changes of every section are
+    reviewed in the confirmation window and staged in one go.
+
+    Parameters:
+        linux_farm_sections (list): List of sections within the Linux farm.
+        config_file_path_name (str): Path to the main configuration file.
+        temp_folder (str): Path to the temporary folder for storing temp files.
+        backup_folder (str): Path to the backup folder.
+        fonts (list): List containing large and small QFont objects for UI elements.
+
+    Methods:
+        setup_ui(): Sets up the user interface components.
+        get_sections(): Generates the allocations model of every section.
+        all_sections_window_setup(): Sets up the main window properties.
+        groupbox_creation(): Creates the main Group Box for the UI elements.
+        groupbox_info_creation(): Creates the share matrix and its buttons.
+        info_label_creation(): Creates and sets text for various labels in the window.
+        button_creation(): Creates and sets up the Submit and Cancel buttons.
+        submit_button_clicked(): Reviews the changes of every section.
+        cancel_button_clicked(): Handles the Cancel button click event.
+    """
+
+    def __init__(
+        self,
+        linux_farm_sections,
+        config_file_path_name,
+        temp_folder,
+        backup_folder,
+        fonts,
+    ):
+        """
+        Initializes the UiAllSectionsMainWindow instance.
+
+        Parameters:
+            linux_farm_sections (list): List of sections within the Linux farm.
+            config_file_path_name (str): Path to the main configuration file.
+            temp_folder (str): Path to the temporary folder for storing temp files.
+            backup_folder (str): Path to the backup folder.
+            fonts (list): List containing large and small QFont objects for UI elements.
+
+        Attributes:
+            live_allocations (list): SectionAllocations of every section as
+            they are in the configuration file.
+            allocations (list): SectionAllocations of every section, including
+            the changes staged so far.
+            share_matrix (ShareMatrix): Table with every show of every section.
+            x_axis_window_size (int): Window width.
+            y_axis_window_size (int): Window height.
+
+        Config Data:
+            overlay (StagingOverlay): Changes staged so far on top of the
+            configuration file.
+
+        UI Components:
+            centralwidget (QWidget): Central widget for the main window.
+            all_sections_groupbox (QGroupBox): Group box containing UI elements.
+            error_label (QLabel): Label listing the sections not adding up to 100.
+
+        Fonts:
+            s_font (QFont): Small font for UI elements.
+            l_font (QFont): Large font for UI elements.
+
+        Calls:
+            setup_ui(): Sets up the user interface components.
+        """
+
+        super().__init__()
+
+        # Incoming Variables
+        self.linux_farm_sections = linux_farm_sections
+        self.config_file_path_name = config_file_path_name
+        self.temp_folder = temp_folder
+        self.backup_folder = backup_folder
+        self.l_font = fonts[0]
+        self.s_font = fonts[1]
+        self.fonts = fonts
+
+        # Sections of the window
+        self.centralwidget = ""
+        self.x_axis_window_size = None
+        self.y_axis_window_size = None
+        self.all_sections_groupbox = None
+        self.share_matrix = None
+        self.error_label = None
+        self.live_allocations = []
+        self.allocations = []
+
+        self.overlay = get_overlay(config_file_path_name, temp_folder)
+
+        self.setup_ui()
+
+    def setup_ui(self):
+        """Sets up the user interface components.
+
+        Parameters:
+            self (object): instance of a class.
+
+        Returns:
+            None
+        """
+
+        self.get_sections()
+        self.all_sections_window_setup()
+        self.groupbox_creation()
+        self.groupbox_info_creation()
+        self.info_label_creation()
+        self.button_creation()
+
+    def get_sections(self):
+        """Generates the allocations model of every section, from a single
+        parse of the config file.
+
+        Parameters:
+            self (object): instance of a class.
+
+        Returns:
+            None
+        """
+
+        limits_dict = load_config(self.config_file_path_name)["Limits"]
+        for section in self.linux_farm_sections:
+            live_allocations = SectionAllocations.from_section(
+                section,
+                limits_dict[section],
+                include=lambda key: len(key) == 3 and key != "RND",
+            )
+            self.live_allocations.append(live_allocations)
+            self.allocations.append(self.overlay.applied_to(live_allocations))
+
+    def all_sections_window_setup(self):
+        """This function sets up the window, including the size, style, and
+        title of the window, as well as centering it on the screen.
+
+        Parameters:
+            self (object): instance of a class.
+
+        Returns:
+            None
+        """
+
+        # Title of the Main Window can be changed here.
+        self.setWindowTitle("All Linux Sections Window")
+        self.x_axis_window_size = 740  # Initial window width 740
+        self.y_axis_window_size = 390  # Initial window height 390
+        # Window Size can be adjusted here
+        self.setFixedSize(self.x_axis_window_size, self.y_axis_window_size)
+        # Using this style sheet the theme can be changed
+        self.setStyleSheet(
+            """background-color: rgb(46, 52, 54);color: rgb(238, 238, 236);"""
+        )
+        self.centralwidget = QtWidgets.QWidget(self)
+        self.setCentralWidget(self.centralwidget)
+
+    def groupbox_creation(self):
+        """Creates a Group Box widget within the main window to hold all the UI
+        elements.
+
+        Parameters:
+            self (object): instance of a class.
+
+        Returns:
+            None
+        """
+
+        # Title of the Group Box
+        self.all_sections_groupbox = QtWidgets.QGroupBox(
+            "All Linux Sections", self.centralwidget
+        )
+        self.all_sections_groupbox.setGeometry(10, 10, 721, 348)
+        self.all_sections_groupbox.setFont(self.l_font)
+
+    def groupbox_info_creation(self):
+        """Creates the share matrix within the group box, together with the
+        buttons of its bulk operations.
+
+        The window grows with the amount of shows and sections only until it
+        fills the screen, past that the share matrix scrolls.
+
+        Parameters:
+            self (object): instance of a class.
+
+        Returns:
+            None
+        """
+
+        def section_label(section):
+            return section.replace("linuxfarm", "").strip("_") or "Linux"
+
+        self.share_matrix = ShareMatrix(
+            self.allocations, self.all_sections_groupbox, self.s_font, section_label
+        )
+        model = self.share_matrix.share_model()
+
+        # Sizing the window once for every show and section, capped to the
+        # screen
+        screen = QtGui.QGuiApplication.screenAt(QtGui.QCursor().pos())
+        if screen is None:
+            screen = QtGui.QGuiApplication.primaryScreen()
+        available = screen.availableGeometry()
+        vertical_header = self.share_matrix.verticalHeader()
+        horizontal_header = self.share_matrix.horizontalHeader()
+        self.x_axis_window_size = min(
+            max(
+                self.x_axis_window_size,
+                260
+                + vertical_header.sizeHint().width()
+                + horizontal_header.length()
+                + self.share_matrix.verticalScrollBar().sizeHint().width()
+                + 40,
+            ),
+            max(self.x_axis_window_size, available.width() - 60),
+        )
+        self.y_axis_window_size = min(
+            max(
+                self.y_axis_window_size,
+                40 + horizontal_header.height() + vertical_header.length() + 70,
+            ),
+            max(self.y_axis_window_size, available.height() - 60),
+        )
+        self.setFixedSize(self.x_axis_window_size, self.y_axis_window_size)
+        self.all_sections_groupbox.setGeometry(
+            10, 10, self.x_axis_window_size - 19, self.y_axis_window_size - 20
+        )
+        self.share_matrix.setGeometry(
+            260,
+            40,
+            self.x_axis_window_size - 19 - 260 - 10,
+            self.y_axis_window_size - 20 - 40 - 45,
+        )
+
+        frame = self.frameGeometry()
+        frame.moveCenter(screen.geometry().center())
+        self.move(frame.topLeft())
+
+        # Bulk operations on the selected cells (or all of them)
+        matrix_panel = ShareMatrixPanel(
+            self.share_matrix,
+            self.live_allocations,
+            self.all_sections_groupbox,
+            self.s_font,
+        )
+        matrix_panel.setGeometry(10, 225, 240, 72)
+
+        # Any error shown before goes away as soon as something changes
+        model.dataChanged.connect(lambda *_args: self.error_label.hide())
+
+    def info_label_creation(self):
+        """Creates and sets text for various labels in the window.
+
+        Parameters:
+            self (object): instance of a class.
+
+        Returns:
+            None
+        """
+
+        # Main Definition label
+        all_sections_def_label = QtWidgets.QLabel(
+            "To the right side you will see every current working show (rows) "
+            "of every Linux Farm section (columns), with the total of each "
+            "section under its name.",
+            self.all_sections_groupbox,
+        )
+        all_sections_def_label.setGeometry(10, 40, 231, 101)
+        all_sections_def_label.setFont(self.s_font)
+        all_sections_def_label.setWordWrap(True)
+
+        # Second Definition Label
+        all_sections_def_cells_label = QtWidgets.QLabel(
+            "Click show or section names to select rows or columns, drag to "
+            "select blocks and double click a cell to edit it: ",
+            self.all_sections_groupbox,
+        )
+        all_sections_def_cells_label.setGeometry(10, 145, 231, 71)
+        all_sections_def_cells_label.setFont(self.s_font)
+        all_sections_def_cells_label.setWordWrap(True)
+
+        # Label for the sections not adding up to 100, hidden until needed
+        self.error_label = QtWidgets.QLabel("", self.all_sections_groupbox)
+        self.error_label.setGeometry(
+            10, (self.all_sections_groupbox.frameGeometry().height() - 30), 450, 20
+        )
+        self.error_label.setFont(self.s_font)
+        self.error_label.setTextFormat(QtCore.Qt.TextFormat.AutoText)
+        self.error_label.setWordWrap(True)
+        self.error_label.setStyleSheet("color: red")
+        self.error_label.hide()
+
+    def button_creation(self):
+        """Creates and sets up the Submit and Cancel buttons. The Submit button
+        checks that every section adds up to 100 and reviews the changes of all
+        of them. The Cancel button returns the user to the first window.
+
+        Parameters:
+            self (object): instance of a class.
+
+        Returns:
+            None
+        """
+
+        groupbox_width = self.all_sections_groupbox.frameGeometry().width()
+        groupbox_height = self.all_sections_groupbox.frameGeometry().height()
+
+        # Name of the button can be changed here
+        submit_button = QtWidgets.QPushButton("Submit", self.all_sections_groupbox)
+        submit_button.setGeometry(groupbox_width - 211, groupbox_height - 30, 91, 22)
+        submit_button.setFont(self.s_font)
+        submit_button.clicked.connect(self.submit_button_clicked)
+
+        # Name can be changed here
+        cancel_button = QtWidgets.QPushButton("Cancel", self.all_sections_groupbox)
+        cancel_button.setGeometry(groupbox_width - 101, groupbox_height - 30, 91, 22)
+        cancel_button.setFont(self.s_font)
+        cancel_button.clicked.connect(self.cancel_button_clicked)
+
+    def submit_button_clicked(self):
+        """Checks that every section adds up to 100 and that something changed,
+        then opens the confirmation window to review the changes of every
+        section before they are staged together.
+
+        Parameters:
+            self (object): instance of a class.
+
+        Returns:
+            None
+        """
+
+        model = self.share_matrix.share_model()
+        new_allocations = model.allocations()
+
+        wrong_sections = [
+            allocations.section
+            for column, allocations in enumerate(new_allocations)
+            if model.total(column) != 100.0
+        ]
+        if wrong_sections:
+            self.error_label.setText(
+                f"These sections do not add up to 100: {', '.join(wrong_sections)}"
+            )
+            self.error_label.show()
+            return
+
+        if not any(
+            allocations.changes(current_allocations)
+            for allocations, current_allocations in zip(
+                new_allocations, self.allocations
+            )
+        ):
+            self.error_label.setText("There are no changes to submit.")
+            self.error_label.show()
+            return
+
+        # Every section is reviewed, and then staged, together. The "Stage All"
+        # button is not needed since every section is already in the matrix.
+        changes_confirmation_window = UiConfirmFarmChangesMainWindow(
+            self.allocations,
+            new_allocations,
+            self.config_file_path_name,
+            self.temp_folder,
+            self.backup_folder,
+            False,
+            self.linux_farm_sections,
+            self.fonts,
+        )
+        changes_confirmation_window.show()
+        self.close()
+
+    def cancel_button_clicked(self):
+        """When the cancel button is clicked, it will open the first window of the UI
+        and close this one.
+
+        Parameters:
+            self (object): instance of a class.
+
+        Returns:
+            None
+        """
+
+        from main_farm_selection_window import UiAllocationsMainWindow
+
+        farm_selection_windows = UiAllocationsMainWindow()
+        farm_selection_windows.show()
+        self.close()
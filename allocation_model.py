@@ -0,0 +1,265 @@
+#!/usr/bin/python3
+
+"""
+- Compact model of the show allocations of a single farm section.
+- Show names are stored once and the nominal and hard cap percentages are kept
+in two contiguous arrays, so totals, diffs and validation run over plain
+arrays instead of nested dictionaries and parallel lists of widgets.
+- Please only adjust values if totally sure of what you are doing!
+
+Written in Python3.
+"""
+
+import math
+from array import array
+
+# The spin boxes of the UI work with one decimal
+PERCENT_DECIMALS = 1
+
+
+def round_to_total(weights, total, decimals=PERCENT_DECIMALS):
+    """Splits a total between some weights, proportionally and rounded to the
+    given decimals, so the rounded values add up to exactly the total (the
+    steps lost to rounding go to the largest remainders).
+
+    Parameters:
+        weights (iterable): Non-negative weights, one per value.
+        total (float): Total the values have to add up to.
+        decimals (int): Decimals of every value.
+
+    Returns:
+        values (list): The rounded values, in the order of the weights. Split
+        evenly if every weight is 0.
+    """
+
+    weights = list(weights)
+    if not weights:
+        return []
+
+    scale = 10**decimals
+    total_steps = round(total * scale)
+    weight_sum = math.fsum(weights)
+    if weight_sum <= 0:
+        weights = [1.0] * len(weights)
+        weight_sum = float(len(weights))
+
+    exact = [weight * total_steps / weight_sum for weight in weights]
+    steps = [math.floor(value) for value in exact]
+    missing = total_steps - sum(steps)
+    by_remainder = sorted(
+        range(len(exact)), key=lambda index: steps[index] - exact[index]
+    )
+    for index in by_remainder[:missing]:
+        steps[index] += 1
+
+    return [step / scale for step in steps]
+
+
+class ShareRow:
+    """View of a single show inside a SectionAllocations.
+
+    Rows do not hold any value themselves, they read and write straight from
+    the arrays of the model they belong to.
+
+    Attributes:
+        index (int): Position of the show inside the model.
+    """
+
+    __slots__ = ("_model", "index")
+
+    def __init__(self, model, index):
+        self._model = model
+        self.index = index
+
+    @property
+    def show(self):
+        """Name of the show."""
+        return self._model.shows[self.index]
+
+    @property
+    def nominal(self):
+        """Nominal percentage of the show."""
+        return self._model.nominal[self.index]
+
+    @nominal.setter
+    def nominal(self, value):
+        self._model.nominal[self.index] = value
+
+    @property
+    def cap(self):
+        """Hard cap percentage of the show."""
+        return self._model.cap[self.index]
+
+    @cap.setter
+    def cap(self, value):
+        self._model.cap[self.index] = value
+
+    def __repr__(self):
+        return f"ShareRow({self.show!r}, nominal={self.nominal}, cap={self.cap})"
+
+
+class SectionAllocations:
+    """Nominal and hard cap percentages of every show of one farm section.
+
+    Attributes:
+        section (str): Name of the farm section inside 'Limits'.
+        shows (tuple): Names of the shows, in the order of the config file.
+        nominal (array): Nominal percentage of every show.
+        cap (array): Hard cap percentage of every show.
+
+    Methods:
+        from_section(section, section_dict, include): Builds the model from the
+        parsed section of the config file.
+        copy(): Returns an independent copy of the model.
+        row(show): Returns the row view of a show.
+        total(): Returns the sum of every nominal percentage.
+        nominal_dict() / cap_dict(): Returns the percentages keyed by show.
+        changes(base): Lists the values that differ from another model.
+        to_edits(base, section): Converts the model into share edits for the
+        config file.
+    """
+
+    __slots__ = ("section", "shows", "nominal", "cap", "_positions")
+
+    def __init__(self, section, shows, nominal, cap):
+        self.section = section
+        self.shows = tuple(shows)
+        self.nominal = array("d", nominal)
+        self.cap = array("d", cap)
+        self._positions = {show: index for index, show in enumerate(self.shows)}
+
+        if not len(self.shows) == len(self.nominal) == len(self.cap):
+            raise ValueError("Every show needs both a nominal and a cap value")
+
+    @classmethod
+    def from_section(cls, section, section_dict, include=None):
+        """Builds the model from a section of the config file.
+
+        Parameters:
+            section (str): Name of the farm section inside 'Limits'.
+            section_dict (dict): Parsed contents of the section.
+            include (function): Optional filter receiving every show name and
+            returning if it belongs in the model.
+
+        Returns:
+            allocations (SectionAllocations): The model of the section.
+        """
+
+        shows = []
+        nominal = []
+        cap = []
+        for show, values in section_dict["Shares"].items():
+            if include is not None and not include(show):
+                continue
+            shows.append(show)
+            nominal.append(round(values["nominal"] * 100, PERCENT_DECIMALS))
+            cap.append(round(values["cap"] * 100, PERCENT_DECIMALS))
+
+        return cls(section, shows, nominal, cap)
+
+    def copy(self):
+        """Returns an independent copy of the model.
+
+        Returns:
+            allocations (SectionAllocations): The copy.
+        """
+
+        return SectionAllocations(self.section, self.shows, self.nominal, self.cap)
+
+    def __len__(self):
+        return len(self.shows)
+
+    def __iter__(self):
+        return (ShareRow(self, index) for index in range(len(self.shows)))
+
+    def __getitem__(self, index):
+        if not -len(self.shows) <= index < len(self.shows):
+            raise IndexError(index)
+        return ShareRow(self, index % len(self.shows))
+
+    def __contains__(self, show):
+        return show in self._positions
+
+    def position(self, show):
+        """Returns the position of a show inside the arrays of the model."""
+        return self._positions[show]
+
+    def row(self, show):
+        """Returns the row view of a show.
+
+        Parameters:
+            show (str): Name of the show.
+
+        Returns:
+            row (ShareRow): View of the show inside this model.
+        """
+
+        return ShareRow(self, self._positions[show])
+
+    def total(self):
+        """Returns the sum of every nominal percentage, rounded to the
+        resolution of the UI.
+
+        Returns:
+            total (float): The total nominal percentage.
+        """
+
+        return round(math.fsum(self.nominal), PERCENT_DECIMALS)
+
+    def nominal_dict(self):
+        """Returns the nominal percentages keyed by show."""
+        return dict(zip(self.shows, self.nominal))
+
+    def cap_dict(self):
+        """Returns the hard cap percentages keyed by show."""
+        return dict(zip(self.shows, self.cap))
+
+    def changes(self, base):
+        """Lists every value of this model that differs from another model of
+        the same shows.
+
+        Parameters:
+            base (SectionAllocations): The model to compare against.
+
+        Returns:
+            changes (list): (show, field, old_percentage, new_percentage) tuples.
+        """
+
+        if base.shows != self.shows:
+            raise ValueError("Both models need the same shows to be compared")
+
+        changes = []
+        for field in ("nominal", "cap"):
+            old_values = getattr(base, field)
+            new_values = getattr(self, field)
+            for index, (old, new) in enumerate(zip(old_values, new_values)):
+                if round(old, PERCENT_DECIMALS) != round(new, PERCENT_DECIMALS):
+                    changes.append((self.shows[index], field, old, new))
+        return changes
+
+    def to_edits(self, base=None, section=None):
+        """Converts the model into share edits for the config file writer.
+
+        Parameters:
+            base (SectionAllocations): If given, only the values that differ
+            from it are returned.
+            section (str): Section the edits are meant for, this model's own
+            section by default.
+
+        Returns:
+            edits (dict): New share values (0 to 1) keyed by (section, show, field).
+        """
+
+        section = self.section if section is None else section
+
+        if base is not None:
+            return {
+                (section, show, field): new / 100
+                for show, field, _old, new in self.changes(base)
+            }
+
+        edits = {}
+        for show, nominal, cap in zip(self.shows, self.nominal, self.cap):
+            edits[(section, show, "nominal")] = nominal / 100
+            edits[(section, show, "cap")] = cap / 100
+        return edits
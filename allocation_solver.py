@@ -0,0 +1,204 @@
+#!/usr/bin/python3
+
+"""
+- Headless allocation solver of the Farm UI.
+- Turns target weights into nominal percentages that add up to exactly 100 at
+the resolution of the spin boxes, keeping every show between its floor and
+ceiling and leaving locked shows alone. Hard caps are only raised where they
+would end up below the new nominal value.
+- The weights are split proportionally, shows hitting a floor or ceiling are
+fixed there and the rest is split again, so the result is the closest
+feasible one to the weights. Every section of 'Limits' can be solved in the
+same call, farm-wide rebalances take milliseconds.
+- Please only adjust values if totally sure of what you are doing!
+
+Written in Python3.
+"""
+
+import math
+
+from allocation_model import PERCENT_DECIMALS, round_to_total
+
+# Total every solved section adds up to
+TOTAL_PERCENT = 100
+
+# Amount of spin box steps in one percent
+PERCENT_STEPS = 10**PERCENT_DECIMALS
+
+
+class ShareConstraint:
+    """Limits of the nominal value of one show while solving.
+
+    Attributes:
+        floor (float): Lowest nominal percentage allowed.
+        ceiling (float): Highest nominal percentage allowed.
+        locked (float): Nominal percentage the show has to keep, None if it
+        can move.
+    """
+
+    __slots__ = ("floor", "ceiling", "locked")
+
+    def __init__(self, floor=0.0, ceiling=TOTAL_PERCENT, locked=None):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.locked = locked
+
+        if floor > ceiling:
+            raise ValueError(f"Floor {floor} is above the ceiling {ceiling}")
+
+    def __repr__(self):
+        return (
+            f"ShareConstraint(floor={self.floor}, ceiling={self.ceiling}, "
+            f"locked={self.locked})"
+        )
+
+
+def _split(weights, low, high, remaining):
+    """Splits some steps proportionally to weights within per-value bounds.
+
+    Parameters:
+        weights (list): Non-negative weights.
+        low (list): Lowest amount of steps of every value.
+        high (list): Highest amount of steps of every value.
+        remaining (int): Steps to split, between sum(low) and sum(high).
+
+    Returns:
+        steps (list): Steps of every value, adding up to 'remaining'.
+    """
+
+    if math.fsum(weights) <= 0:
+        weights = [1.0] * len(weights)
+
+    steps = [None] * len(weights)
+    active = list(range(len(weights)))
+    while active:
+        weight_sum = math.fsum(weights[index] for index in active)
+        if weight_sum <= 0:
+            weight_sum = float(len(active))
+            weights = [1.0] * len(weights)
+        scale = remaining / weight_sum
+
+        over = []
+        under = []
+        over_by = 0.0
+        under_by = 0.0
+        for index in active:
+            exact = weights[index] * scale
+            if exact > high[index] + 1e-9:
+                over.append(index)
+                over_by += exact - high[index]
+            elif exact < low[index] - 1e-9:
+                under.append(index)
+                under_by += low[index] - exact
+        if not over and not under:
+            break
+
+        # Fixing the side that is the furthest out first keeps the others
+        # proportional to their weights
+        if over_by >= under_by:
+            fixed, bounds = over, high
+        else:
+            fixed, bounds = under, low
+        for index in fixed:
+            steps[index] = bounds[index]
+            remaining -= bounds[index]
+        fixed = set(fixed)
+        active = [index for index in active if index not in fixed]
+
+    if not active:
+        if remaining:
+            raise ValueError("The floors and ceilings cannot add up to the total")
+        return steps
+
+    values = round_to_total(
+        [weights[index] for index in active], remaining / PERCENT_STEPS
+    )
+    for index, value in zip(active, values):
+        steps[index] = round(value * PERCENT_STEPS)
+    return steps
+
+
+def solve_sections(allocations, weights=None, constraints=None):
+    """Solves the nominal and hard cap percentages of many sections at once.
+
+    Parameters:
+        allocations (iterable): SectionAllocations objects to solve.
+        weights (dict): Optional target weights keyed by (section, show), the
+        current nominal values are used for the shows without one.
+        constraints (dict): Optional ShareConstraint objects keyed by
+        (section, show).
+
+    Returns:
+        solved (list): New SectionAllocations objects, in the same order, the
+        given ones are left untouched.
+    """
+
+    weights = weights or {}
+    constraints = constraints or {}
+    total_steps = TOTAL_PERCENT * PERCENT_STEPS
+    no_constraint = ShareConstraint()
+
+    solved = []
+    for section_allocations in allocations:
+        section = section_allocations.section
+        result = section_allocations.copy()
+
+        free = []
+        free_weights = []
+        low = []
+        high = []
+        locked_steps = 0
+        for index, show in enumerate(result.shows):
+            constraint = constraints.get((section, show), no_constraint)
+            if constraint.locked is not None:
+                # The stored value and the steps it takes come from the same
+                # rounding, so the section still adds up to the total
+                steps = round(constraint.locked * PERCENT_STEPS)
+                result.nominal[index] = steps / PERCENT_STEPS
+                locked_steps += steps
+                continue
+            free.append(index)
+            free_weights.append(
+                max(0.0, weights.get((section, show), result.nominal[index]))
+            )
+            low.append(math.ceil(constraint.floor * PERCENT_STEPS - 1e-9))
+            high.append(math.floor(constraint.ceiling * PERCENT_STEPS + 1e-9))
+
+        remaining = total_steps - locked_steps
+        if not sum(low) <= remaining <= sum(high):
+            raise ValueError(
+                f"{section} cannot add up to {TOTAL_PERCENT}: the locked shows "
+                f"take {locked_steps / PERCENT_STEPS}, the others need between "
+                f"{sum(low) / PERCENT_STEPS} and {sum(high) / PERCENT_STEPS}"
+            )
+
+        for index, steps in zip(free, _split(free_weights, low, high, remaining)):
+            result.nominal[index] = steps / PERCENT_STEPS
+
+        # Hard caps never stay below the nominal values
+        for index, nominal in enumerate(result.nominal):
+            if result.cap[index] < nominal:
+                result.cap[index] = nominal
+
+        solved.append(result)
+    return solved
+
+
+def solve_section(allocations, weights=None, constraints=None):
+    """Solves the nominal and hard cap percentages of a single section.
+
+    Parameters:
+        allocations (SectionAllocations): The section to solve.
+        weights (dict): Optional target weights keyed by show.
+        constraints (dict): Optional ShareConstraint objects keyed by show.
+
+    Returns:
+        solved (SectionAllocations): New model of the section.
+    """
+
+    section = allocations.section
+    return solve_sections(
+        [allocations],
+        {(section, show): weight for show, weight in (weights or {}).items()},
+        {(section, show): rule for show, rule in (constraints or {}).items()},
+    )[0]
@@ -0,0 +1,312 @@
+#!/usr/bin/python3
+
+"""
+- Worker writing the staged changes of the Farm UI to the live config file.
+- Rendering, writing, reloading Tractor and checking the engine all happen on
+a worker thread, reporting their progress through Qt signals, so the windows
+keep responding while Tractor picks up the changes. An apply can be cancelled
+at any point; once the config file has been written, cancelling only stops
+the reloading and checking.
+- Nothing is written or reloaded if the config file and the engine already
+have every staged value.
+- Rollbacks to a backed up version run the same way, on their own worker.
+- Please only adjust values if totally sure of what you are doing!
+
+Written in Python3.
+"""
+
+import threading
+
+from qtpy import QtCore
+
+from backup_store import BackupNotFound
+from config_store import cache_stats
+from engine_targets import apply_to_targets, format_report, load_targets
+from rollback import rollback_targets
+from tractor_engine import engine_metrics, reload_metrics
+
+# Amount of mismatching values listed in the window after a rollback
+MAX_LISTED_MISMATCHES = 5
+
+
+class ApplyCancelled(Exception):
+    """Raised inside the worker when the apply has been cancelled."""
+
+
+class ApplyWorker(QtCore.QObject):
+    """Writes the staged changes, reloads Tractor and checks the engine.
+
+    Meant to be moved into a QThread, with its run() method connected to the
+    'started' signal of the thread.
+
+    Attributes:
+        config_file_path_name (str): Path to the main configuration file.
+        overlay (StagingOverlay): Changes staged on top of the configuration file.
+        backup_folder (str): Path to the backup folder.
+        expected (dict): Share values (0 to 1) the engine has to end up using,
+        keyed by (section, show, field), usually every staged value.
+        targets (list): Engines to push to, the ones of 'engine_targets.json'
+        (or just the main engine) if None.
+
+    Signals:
+        progress (int, str): Percentage done and a message about the current step.
+        done (bool, str): Emitted once, with whether the engine is using the
+        new values and a message to show the user.
+
+    Methods:
+        run(): Runs the whole apply, meant to be called by the thread.
+        cancel(): Asks the apply to stop as soon as possible.
+    """
+
+    progress = QtCore.Signal(int, str)
+    done = QtCore.Signal(bool, str)
+
+    def __init__(
+        self, config_file_path_name, overlay, backup_folder, expected, targets=None
+    ):
+        super().__init__()
+
+        self.config_file_path_name = config_file_path_name
+        self.overlay = overlay
+        self.backup_folder = backup_folder
+        self.expected = expected
+        self.targets = targets
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Asks the apply to stop as soon as possible. Safe to call from any
+        thread.
+
+        Returns:
+            None
+        """
+
+        self._cancelled.set()
+
+    def _check_cancelled(self, written):
+        if self._cancelled.is_set():
+            if written:
+                raise ApplyCancelled(
+                    "Cancelled. The config file was written but Tractor may "
+                    "not be using the new values yet."
+                )
+            raise ApplyCancelled("Cancelled. Nothing was written.")
+
+    def run(self):
+        """Writes the staged changes, reloads Tractor and checks the engine,
+        reporting every step through the 'progress' signal and the outcome
+        through the 'done' signal.
+
+        Returns:
+            None
+        """
+
+        written = False
+        try:
+            self._check_cancelled(written)
+            if not self.overlay:
+                self.done.emit(False, "There are no staged changes to write.")
+                return
+
+            if self.overlay.base_changed():
+                print(
+                    "The config file changed since these changes were staged, "
+                    "they will be applied on top of its current version."
+                )
+
+            targets = self.targets or load_targets(
+                self.config_file_path_name, self.backup_folder
+            )
+            edits = dict(self.overlay.items())
+
+            finished = set()
+
+            def report(result):
+                if result.finished:
+                    finished.add(result.target.name)
+                self.progress.emit(
+                    10 + 90 * len(finished) // len(targets),
+                    f"{result.target.name}: {result.message}",
+                )
+
+            self.progress.emit(10, "Writing the config file...")
+            self._check_cancelled(written)
+
+            # Every target is written, reloaded and verified at the same time.
+            # The previous version of every config file goes to the backup store.
+            results = apply_to_targets(
+                targets,
+                edits,
+                expected=self.expected,
+                cancelled=self._cancelled,
+                report=report,
+            )
+            written = any(result.written for result in results)
+
+            # The staged changes are only dropped once every target has them
+            if all(result.written or result.unchanged for result in results):
+                self.overlay.discard()
+
+            print(format_report(results))
+            self._check_cancelled(written)
+
+            if all(result.verified for result in results):
+                sections = {section for section, _show, _field in self.expected}
+                if not any(result.written or result.reloads for result in results):
+                    message = (
+                        f"Nothing to do, Tractor is already using all "
+                        f"{len(self.expected)} values of {len(sections)} section(s)."
+                    )
+                    self.progress.emit(100, message)
+                    self.done.emit(True, message)
+                    return
+                message = (
+                    f"Tractor is using all {len(self.expected)} new values "
+                    f"of {len(sections)} section(s)"
+                )
+                if len(targets) > 1:
+                    message += f" on all {len(targets)} engines"
+                self.progress.emit(100, message + ".")
+                self.done.emit(True, message + ".")
+                return
+
+            if len(targets) > 1:
+                self.done.emit(False, format_report(results))
+            elif results[0].mismatches:
+                self.done.emit(
+                    False,
+                    "The Config was reloaded too many times before this change "
+                    "could be properly applied. Attempt to reload manually.",
+                )
+            else:
+                self.done.emit(False, results[0].message)
+        except ApplyCancelled as cancelled:
+            self.done.emit(False, str(cancelled))
+        except Exception as error:
+            # Reported to the window instead of being lost inside the thread
+            self.done.emit(False, f"The changes could not be applied: {error}")
+        finally:
+            if written:
+                print(f"Engine requests: {engine_metrics()}")
+                print(f"Engine reloads: {reload_metrics()}")
+                print(f"Config cache: {cache_stats()}")
+
+
+class RollbackWorker(QtCore.QObject):
+    """Rolls the live config file back to a backed up version, reloads every
+    engine target reading it and checks they use the restored values. Targets
+    with a config file of their own are reported as not rolled back.
+
+    Meant to be moved into a QThread, with its run() method connected to the
+    'started' signal of the thread.
+
+    Attributes:
+        version (dict): Index entry of the version to roll back to.
+        config_file_path_name (str): Path to the main configuration file.
+        backup_folder (str): Path to the backup folder.
+
+    Signals:
+        progress (int, str): Percentage done and a message about the current step.
+        done (bool, str): Emitted once, with whether every engine target was
+        rolled back and uses the restored values, and a message to show the
+        user, listing the values the engines did not match and the targets
+        left alone.
+
+    Methods:
+        run(): Runs the whole rollback, meant to be called by the thread.
+        cancel(): Asks the rollback to stop as soon as possible.
+    """
+
+    progress = QtCore.Signal(int, str)
+    done = QtCore.Signal(bool, str)
+
+    def __init__(self, version, config_file_path_name, backup_folder):
+        super().__init__()
+
+        self.version = version
+        self.config_file_path_name = config_file_path_name
+        self.backup_folder = backup_folder
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Asks the rollback to stop as soon as possible. Once the config file
+        has been rolled back, only the checking of the engine stops. Safe to
+        call from any thread.
+
+        Returns:
+            None
+        """
+
+        self._cancelled.set()
+
+    def run(self):
+        """Rolls the config file back, reloads Tractor and checks the engine,
+        reporting every step through the 'progress' signal and the outcome
+        through the 'done' signal.
+
+        Returns:
+            None
+        """
+
+        name = self.version["name"]
+        try:
+            if self._cancelled.is_set():
+                self.done.emit(False, "Cancelled. Nothing was rolled back.")
+                return
+
+            self.progress.emit(10, f"Rolling back to {name}...")
+            mismatches, left_alone = rollback_targets(
+                self.version,
+                self.config_file_path_name,
+                self.backup_folder,
+                cancelled=self._cancelled,
+                progress=lambda message: self.progress.emit(50, message),
+            )
+
+            if self._cancelled.is_set():
+                self.done.emit(
+                    False,
+                    f"Cancelled. The config file was rolled back to {name} but "
+                    "Tractor may not be using the restored values yet.",
+                )
+                return
+
+            wrong = {engine: values for engine, values in mismatches.items() if values}
+            if not wrong and not left_alone:
+                engines = (
+                    "Tractor is"
+                    if len(mismatches) == 1
+                    else f"all {len(mismatches)} engines are"
+                )
+                message = (
+                    f"Rolled back to {name}, {engines} using every restored value."
+                )
+                self.progress.emit(100, message)
+                self.done.emit(True, message)
+                return
+
+            lines = [f"Rolled back to {name} only partly:"]
+            for engine, values in wrong.items():
+                lines.append(f"{engine} does not match {len(values)} restored values:")
+                for (section, show, field), (value, engine_value) in list(
+                    values.items()
+                )[:MAX_LISTED_MISMATCHES]:
+                    lines.append(
+                        f"    {section} / {show} / {field}: {value} | {engine_value}"
+                    )
+                if len(values) > MAX_LISTED_MISMATCHES:
+                    lines.append(f"    ... {len(values) - MAX_LISTED_MISMATCHES} more")
+            for target in left_alone:
+                lines.append(
+                    f"{target.name} was not rolled back, it reads its own config "
+                    f"file ({target.config_file_path_name}), roll it back from "
+                    f"{target.backup_folder}."
+                )
+            self.done.emit(False, "\n".join(lines))
+        except BackupNotFound as error:
+            # The version is not in the backup store anymore
+            self.done.emit(False, str(error))
+        except Exception as error:
+            # Unreadable backups, write and engine errors are all reported to
+            # the window instead of being lost inside the thread
+            self.done.emit(False, f"The rollback to {name} failed: {error}")
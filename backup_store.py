@@ -0,0 +1,458 @@
+#!/usr/bin/python3
+
+"""
+- Backup store for the versions of the Tractor 'limits.config' file.
+- Every version is addressed by the SHA-256 of its contents, so a version that
+was already backed up is never stored twice. Versions are kept zlib
+compressed, either as a full base or as a small delta on top of the previous
+version, and the chains of deltas are cut automatically so fetching any
+version only ever needs a handful of small reads.
+- A single index file lists every version, so listing, fetching or restoring
+a version does not depend on how long the history is.
+- Only the latest MAX_VERSIONS versions younger than MAX_AGE_DAYS are kept.
+Older ones are pruned as new ones are added, and the objects only they used
+are deleted, turning the oldest delta left of every chain into a base.
+- Please only adjust values if totally sure of what you are doing!
+
+Written in Python3.
+"""
+
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from config_store import write_atomic
+
+INDEX_FILE_NAME = "index.json"
+LOCK_FILE_NAME = ".lock"
+OBJECTS_FOLDER_NAME = "objects"
+
+# Longest chain of deltas allowed before a new full base is stored
+MAX_CHAIN_DEPTH = 10
+# A delta bigger than this fraction of the file is stored as a base instead
+MAX_DELTA_RATIO = 0.5
+# Amount of versions kept, the oldest ones are pruned first
+MAX_VERSIONS = 500
+# Versions older than this are pruned, the latest one is always kept
+MAX_AGE_DAYS = 365
+
+
+class BackupNotFound(KeyError):
+    """Raised when no backed up version matches a name or hash."""
+
+    def __str__(self):
+        return self.args[0]
+
+
+def content_hash(data):
+    """Returns the SHA-256 used to address a version of the config file.
+
+    Parameters:
+        data (bytes): Contents of the configuration file.
+
+    Returns:
+        hash (str): Hexadecimal digest of the contents.
+    """
+
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_delta(parent, data):
+    """Builds a line based delta that turns 'parent' into 'data'.
+
+    Every change the Farm UI makes to the config file is an in-place edit of a
+    number, which never adds or removes lines, so the common case compares the
+    two files line by line. Otherwise only the lines between the common start
+    and end of both files are stored.
+
+    Parameters:
+        parent (bytes): Contents the delta is based on.
+        data (bytes): Contents the delta has to produce.
+
+    Returns:
+        ops (list): [start, end, text] operations replacing the lines
+        start:end of the parent with 'text'.
+    """
+
+    parent_lines = parent.splitlines(True)
+    lines = data.splitlines(True)
+
+    ops = []
+    if len(parent_lines) == len(lines):
+        start = None
+        for number, (old, new) in enumerate(zip(parent_lines, lines)):
+            if old != new and start is None:
+                start = number
+            elif old == new and start is not None:
+                ops.append([start, number, b"".join(lines[start:number])])
+                start = None
+        if start is not None:
+            ops.append([start, len(lines), b"".join(lines[start:])])
+    else:
+        prefix = 0
+        limit = min(len(parent_lines), len(lines))
+        while prefix < limit and parent_lines[prefix] == lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while (
+            suffix < limit - prefix and parent_lines[-1 - suffix] == lines[-1 - suffix]
+        ):
+            suffix += 1
+        ops.append(
+            [
+                prefix,
+                len(parent_lines) - suffix,
+                b"".join(lines[prefix : len(lines) - suffix]),
+            ]
+        )
+
+    return [[start, end, text.decode("utf-8")] for start, end, text in ops]
+
+
+def apply_delta(parent, ops):
+    """Rebuilds a version from its parent and the delta made by make_delta().
+
+    Parameters:
+        parent (bytes): Contents the delta is based on.
+        ops (list): [start, end, text] operations of the delta.
+
+    Returns:
+        data (bytes): The rebuilt contents.
+    """
+
+    parent_lines = parent.splitlines(True)
+    pieces = []
+    previous_end = 0
+    for start, end, text in ops:
+        pieces.extend(parent_lines[previous_end:start])
+        pieces.append(text.encode("utf-8"))
+        previous_end = end
+    pieces.extend(parent_lines[previous_end:])
+    return b"".join(pieces)
+
+
+class BackupStore:
+    """Content-addressed, compressed and deduplicated store of config versions.
+
+    Attributes:
+        backup_folder (str): Path to the backup folder.
+        max_versions (int): Amount of versions kept, None for no limit.
+        max_age_days (int): Age in days of the oldest version kept, None for
+        no limit.
+
+    Methods:
+        add(data, name): Backs up a version of the config file.
+        list_versions(): Lists every backed up version, oldest first.
+        find(version): Finds a version by its name, hash or hash prefix.
+        get(version): Returns the contents of a version.
+        restore(version, file_path_name): Writes a version into a file.
+        compact(): Prunes the expired versions and removes unused objects.
+        import_legacy(): Adds the old 'D<date>-T<time>.config' backups.
+    """
+
+    def __init__(
+        self, backup_folder, max_versions=MAX_VERSIONS, max_age_days=MAX_AGE_DAYS
+    ):
+        self.backup_folder = backup_folder
+        self.max_versions = max_versions
+        self.max_age_days = max_age_days
+        self._index_file = os.path.join(backup_folder, INDEX_FILE_NAME)
+        self._objects_folder = os.path.join(backup_folder, OBJECTS_FOLDER_NAME)
+        self._cache = OrderedDict()
+
+    @contextmanager
+    def _locked(self):
+        # More than one person can be running the UI, so every change to the
+        # store is done while holding a lock on the backup folder.
+        os.makedirs(self._objects_folder, exist_ok=True)
+        with open(os.path.join(self.backup_folder, LOCK_FILE_NAME), "a") as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _load_index(self):
+        try:
+            with open(self._index_file, "r") as index_file:
+                return json.load(index_file, object_pairs_hook=OrderedDict)
+        except FileNotFoundError:
+            return OrderedDict([("objects", OrderedDict()), ("versions", [])])
+
+    def _save_index(self, index):
+        write_atomic(self._index_file, json.dumps(index, indent=1))
+
+    def _object_path(self, object_hash):
+        return os.path.join(self._objects_folder, f"{object_hash}.z")
+
+    def _write_object(self, object_hash, header, payload):
+        write_atomic(
+            self._object_path(object_hash), zlib.compress(header + b"\n" + payload)
+        )
+
+    def _read_object(self, object_hash):
+        with open(self._object_path(object_hash), "rb") as object_file:
+            raw = zlib.decompress(object_file.read())
+        header, payload = raw.split(b"\n", 1)
+        return header, payload
+
+    def _contents(self, index, object_hash):
+        if object_hash in self._cache:
+            self._cache.move_to_end(object_hash)
+            return self._cache[object_hash]
+
+        # Walking back to the closest base and applying the deltas forward
+        chain = []
+        current = object_hash
+        while True:
+            header, payload = self._read_object(current)
+            if header == b"B":
+                data = payload
+                break
+            chain.append(json.loads(payload))
+            current = index["objects"][current]["parent"]
+            if current in self._cache:
+                data = self._cache[current]
+                break
+
+        for ops in reversed(chain):
+            data = apply_delta(data, ops)
+
+        if content_hash(data) != object_hash:
+            raise ValueError(f"Backup {object_hash} is corrupted")
+
+        self._cache[object_hash] = data
+        while len(self._cache) > 4:
+            self._cache.popitem(last=False)
+        return data
+
+    def _store(self, index, data, object_hash):
+        objects = index["objects"]
+        parent_hash = index["versions"][-1]["object"] if index["versions"] else None
+
+        if parent_hash in objects and objects[parent_hash]["depth"] < MAX_CHAIN_DEPTH:
+            parent = self._contents(index, parent_hash)
+            ops = make_delta(parent, data)
+            payload = json.dumps(ops, separators=(",", ":")).encode("utf-8")
+            # Once the deltas since the last base add up to the size of the
+            # file itself a new base is cheaper to read back.
+            chain_size = objects[parent_hash]["chain_size"] + len(payload)
+            if len(payload) <= len(data) * MAX_DELTA_RATIO and chain_size <= len(data):
+                self._write_object(object_hash, b"D", payload)
+                objects[object_hash] = OrderedDict(
+                    [
+                        ("kind", "delta"),
+                        ("parent", parent_hash),
+                        ("depth", objects[parent_hash]["depth"] + 1),
+                        ("chain_size", chain_size),
+                        ("size", len(data)),
+                    ]
+                )
+                return
+
+        self._write_object(object_hash, b"B", data)
+        objects[object_hash] = OrderedDict(
+            [
+                ("kind", "base"),
+                ("parent", None),
+                ("depth", 0),
+                ("chain_size", 0),
+                ("size", len(data)),
+            ]
+        )
+
+    def add(self, data, name=None, created=None):
+        """Backs up a version of the config file.
+
+        Parameters:
+            data (bytes): Contents of the configuration file.
+            name (str): Name of the version, 'D<date>-T<time>' by default.
+            created (datetime): When the version was made, now by default.
+
+        Returns:
+            version (dict): Index entry of the new version.
+        """
+
+        created = created or datetime.now()
+        name = name or created.strftime("D%Y-%m-%d-T%H%M%S")
+        object_hash = content_hash(data)
+
+        with self._locked():
+            index = self._load_index()
+            # Identical contents are only ever stored once
+            if object_hash not in index["objects"]:
+                self._store(index, data, object_hash)
+            version = OrderedDict(
+                [
+                    ("name", name),
+                    ("object", object_hash),
+                    ("created", created.isoformat(timespec="seconds")),
+                    ("size", len(data)),
+                ]
+            )
+            index["versions"].append(version)
+            if self._prune(index, created):
+                self._remove_unused(index)
+            self._save_index(index)
+
+        self._cache[object_hash] = data
+        return version
+
+    def list_versions(self):
+        """Lists every backed up version, oldest first.
+
+        Returns:
+            versions (list): Index entries with the 'name', 'object' (hash),
+            'created' and 'size' of every version.
+        """
+
+        return self._load_index()["versions"]
+
+    def find(self, version):
+        """Finds a version by its name, its hash or the start of its hash. If
+        more than one version matches, the latest one is returned.
+
+        Parameters:
+            version (str or dict): Name, hash or index entry of the version.
+
+        Returns:
+            version (dict): Index entry of the version, BackupNotFound is
+            raised if no version matches.
+        """
+
+        if isinstance(version, dict):
+            return version
+
+        for entry in reversed(self.list_versions()):
+            if entry["name"] == version or entry["object"].startswith(version):
+                return entry
+        raise BackupNotFound(f"There is no backup called '{version}'")
+
+    def get(self, version):
+        """Returns the contents of a backed up version.
+
+        Parameters:
+            version (str or dict): Name, hash or index entry of the version.
+
+        Returns:
+            data (bytes): Contents of the configuration file.
+        """
+
+        entry = self.find(version)
+        return self._contents(self._load_index(), entry["object"])
+
+    def restore(self, version, file_path_name):
+        """Writes a backed up version into a file, atomically.
+
+        Parameters:
+            version (str or dict): Name, hash or index entry of the version.
+            file_path_name (str): Path of the file to write.
+
+        Returns:
+            data (bytes): The contents that were written.
+        """
+
+        data = self.get(version)
+        write_atomic(file_path_name, data)
+        return data
+
+    def _prune(self, index, now):
+        # Drops the versions past the retention limits, the latest one stays
+        versions = index["versions"]
+        kept = versions[:-1]
+        if self.max_versions is not None:
+            kept = kept[max(0, len(kept) - self.max_versions + 1) :]
+        if self.max_age_days is not None:
+            oldest = now - timedelta(days=self.max_age_days)
+            oldest = oldest.isoformat(timespec="seconds")
+            kept = [entry for entry in kept if entry["created"] >= oldest]
+        kept.extend(versions[-1:])
+
+        pruned = len(versions) - len(kept)
+        if pruned:
+            index["versions"] = kept
+        return pruned
+
+    def _remove_unused(self, index):
+        # Every delta whose parent is not used anymore is rebuilt as a base,
+        # parents always come before their deltas in the index.
+        objects = index["objects"]
+        used = {entry["object"] for entry in index["versions"]}
+        old_chain_sizes = {
+            object_hash: info["chain_size"] for object_hash, info in objects.items()
+        }
+
+        for object_hash, info in objects.items():
+            if object_hash not in used or info["parent"] is None:
+                continue
+            parent_hash = info["parent"]
+            if parent_hash in used:
+                payload_size = (
+                    old_chain_sizes[object_hash] - old_chain_sizes[parent_hash]
+                )
+                info["depth"] = objects[parent_hash]["depth"] + 1
+                info["chain_size"] = objects[parent_hash]["chain_size"] + payload_size
+                continue
+            data = self._contents(index, object_hash)
+            self._write_object(object_hash, b"B", data)
+            info.update(kind="base", parent=None, depth=0, chain_size=0)
+
+        removed = 0
+        for object_hash in list(objects):
+            if object_hash not in used:
+                del objects[object_hash]
+                self._cache.pop(object_hash, None)
+                if os.path.exists(self._object_path(object_hash)):
+                    os.remove(self._object_path(object_hash))
+                removed += 1
+        return removed
+
+    def compact(self):
+        """Prunes the versions past the retention limits and removes the
+        objects no version uses anymore. Also done by add() whenever a limit
+        is exceeded.
+
+        Returns:
+            removed (int): Amount of objects removed.
+        """
+
+        with self._locked():
+            index = self._load_index()
+            self._prune(index, datetime.now())
+            removed = self._remove_unused(index)
+            self._save_index(index)
+
+        return removed
+
+    def import_legacy(self, remove=False):
+        """Adds the full-copy backups written by older versions of the UI
+        ('D<date>-T<time>.config') to the store, oldest first.
+
+        Parameters:
+            remove (bool): Deletes every old backup once it has been added.
+
+        Returns:
+            imported (int): Amount of old backups added.
+        """
+
+        known = {entry["name"] for entry in self.list_versions()}
+        imported = 0
+        for legacy_file in sorted(
+            glob.glob(os.path.join(self.backup_folder, "D*-T*.config"))
+        ):
+            name = os.path.basename(legacy_file)[: -len(".config")]
+            if name not in known:
+                with open(legacy_file, "rb") as config_file:
+                    data = config_file.read()
+                created = datetime.fromtimestamp(os.stat(legacy_file).st_mtime)
+                self.add(data, name=name, created=created)
+                imported += 1
+            if remove:
+                os.remove(legacy_file)
+        return imported
@@ -11,18 +11,8 @@ Created by Guillermo Aguero - Render TD
 Written in Python3.
 """
 
-import json
-import os
-import subprocess
-from urllib.request import urlopen
-
-# import urllib2
-import sys
-
-from collections import OrderedDict
-from time import sleep
-from datetime import datetime, date
-from qtpy import QtWidgets, QtGui
+from qtpy import QtWidgets, QtGui, QtCore
+from apply_worker import ApplyWorker, RollbackWorker
 
 
 class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
@@ -47,17 +37,21 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
         and 'Exit' buttons, with corresponding functionalities for each button.
         more_changes_button_clicked(self): Handles the click event of the 'More
         Changes' button and navigates back to the first window for making further
-        changes to the current TMP file.
+        changes on top of the staged ones.
+        write_button_clicked(self): Starts applying the staged changes on a
+        worker thread, reporting its progress in the window.
+        cancel_button_clicked(self): Cancels the apply currently running.
+        rollback_button_clicked(self): Handles the click event of the 'Rollback'
+        button and puts a backed up version of the config file back live on a
+        worker thread.
+        rollback_done(self): Shows the outcome of the rollback in the window.
     """
 
     def __init__(
         self,
         config_file_path_name,
-        contents_dict,
-        tmp_file_name,
+        overlay,
         backup_folder,
-        new_values_dict,
-        farm_name,
         fonts,
     ):
         """Initializes the UiChangesAppliedWindow instance.
@@ -69,16 +63,10 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
 
         Parameters:
             config_file_path_name (str): Path to the main configuration file.
-            contents_dict (dict): Dictionary containing the configuration file contents.
-            tmp_file_name (str): Name of the temporary file used during the update process.
+            overlay (StagingOverlay): Changes staged on top of the configuration file.
             backup_folder (str): Path to the backup folder.
-            new_values_dict (dict): Dictionary of new values to be applied.
-            farm_name (str): The name of the farm section.
             fonts (list): List containing large and small QFont objects for UI elements.
 
-        Config Data:
-            contents_dict (dict): Dictionary containing the configuration file contents.
-
         UI Components:
             centralwidget (QWidget): Central widget for the changes applied window.
             changes_applied_groupbox (QGroupBox): Group box containing UI elements
@@ -96,17 +84,23 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
 
         # Incoming Variables
         self.config_file_path_name = config_file_path_name
-        self.contents_dict = contents_dict
-        self.tmp_file_name = tmp_file_name
+        self.overlay = overlay
         self.backup_folder = backup_folder
-        self.new_values_dict = new_values_dict
-        self.farm_name = farm_name
         self.l_font = fonts[0]
         self.s_font = fonts[1]
 
         # Sections of the window
         self.centralwidget = ""
         self.changes_applied_groupbox = None
+        self.question_label = None
+        self.progress_bar = None
+        self.write_button = None
+        self.cancel_button = None
+        self.other_buttons = []
+
+        # Worker applying the changes or rolling back, and the thread it runs on
+        self.apply_thread = None
+        self.apply_worker = None
 
         self.setup_ui()
 
@@ -194,21 +188,31 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
             None
         """
 
-        question_label = QtWidgets.QLabel(
-            "Would you like to write to Config File or make more changes?",
+        # Every staged section is written at once, with a single reload
+        self.question_label = QtWidgets.QLabel(
+            f"{len(self.overlay)} values in {len(self.overlay.sections())} "
+            "section(s) are staged. Would you like to write them all to Config "
+            "File or make more changes?",
             self.changes_applied_groupbox,
         )
-        question_label.setGeometry(10, 35, 271, 61)
-        question_label.setFont(self.s_font)
-        question_label.setWordWrap(True)
+        self.question_label.setGeometry(10, 35, 271, 61)
+        self.question_label.setFont(self.s_font)
+        self.question_label.setWordWrap(True)
+
+        # Only shown while the changes are being applied
+        self.progress_bar = QtWidgets.QProgressBar(self.changes_applied_groupbox)
+        self.progress_bar.setGeometry(10, 90, 421, 14)
+        self.progress_bar.setFont(self.s_font)
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.hide()
 
     def button_creation(self):
         """Creates and sets up the Write, More Changes and Exit buttons. Using the
         'Write' button will write the changes made to the main configuration being
         used by Tractor while creating a backup. The 'More Changes' button will
-        allow the user to go back to the beginning whick will use a temporary config
-        file to allow the user to adjust more values before writing. The 'exit'
-        button will exit the application and delete the TMP file being used.
+        allow the user to go back to the beginning while keeping the staged changes
+        to allow the user to adjust more values before writing. The 'exit'
+        button will exit the application and discard every staged change.
 
         Parameters:
             self (object): instance of a class.
@@ -235,10 +239,7 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
         exit_button.setFont(self.s_font)
         exit_button.setStyleSheet("color : #D21404")
 
-        def delete_tmp():
-            os.remove(self.tmp_file_name)
-
-        exit_button.clicked.connect(delete_tmp)
+        exit_button.clicked.connect(self.overlay.discard)
         exit_button.clicked.connect(self.close)
 
         # Text can be changed here
@@ -246,137 +247,144 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
         write_button.setGeometry(10, 110, 121, 22)
         write_button.setFont(self.s_font)
         write_button.setStyleSheet("color : #A7F432")
+        write_button.clicked.connect(self.write_button_clicked)
+
+        # Takes the place of the 'Write' button while the changes are applied
+        cancel_button = QtWidgets.QPushButton("Cancel", self.changes_applied_groupbox)
+        cancel_button.setGeometry(10, 110, 121, 22)
+        cancel_button.setFont(self.s_font)
+        cancel_button.setStyleSheet("color : #D21404")
+        cancel_button.clicked.connect(self.cancel_button_clicked)
+        cancel_button.hide()
+
+        self.write_button = write_button
+        self.cancel_button = cancel_button
+        self.other_buttons = [more_changes_button, exit_button]
+
+        # Text can be changed here
+        rollback_button = QtWidgets.QPushButton(
+            "Rollback...", self.changes_applied_groupbox
+        )
+        rollback_button.setGeometry(310, 55, 121, 22)
+        rollback_button.setFont(self.s_font)
+        rollback_button.setStyleSheet("color : orange")
+        rollback_button.clicked.connect(self.rollback_button_clicked)
+        self.other_buttons.append(rollback_button)
+
+    def write_button_clicked(self):
+        """Handles the click event of the 'Write' button. Starts applying the
+        staged changes on a worker thread, so the window keeps responding while
+        the config file is written and Tractor reloaded, and swaps the 'Write'
+        button for a 'Cancel' one until it is done.
+
+        Parameters:
+            self (object): instance of a class.
+
+        Returns:
+            None
+        """
+
+        print("Applying the staged changes")
+
+        if not self.overlay:
+            print("There are no staged changes to write.")
+            return
+
+        # Every staged value is checked in the engine, nominal and hard cap of
+        # every section touched, including the ones staged with 'Stage All'
+        expected = dict(self.overlay.items())
+
+        self.apply_thread = QtCore.QThread(self)
+        self.apply_worker = ApplyWorker(
+            self.config_file_path_name, self.overlay, self.backup_folder, expected
+        )
+        self.apply_worker.moveToThread(self.apply_thread)
+        self.apply_thread.started.connect(self.apply_worker.run)
+        self.apply_worker.progress.connect(self.apply_progress)
+        self.apply_worker.done.connect(self.apply_done)
+        self.apply_worker.done.connect(self.apply_thread.quit)
+
+        self.write_button.hide()
+        self.cancel_button.show()
+        self.cancel_button.setEnabled(True)
+        for button in self.other_buttons:
+            button.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+
+        self.apply_thread.start()
+
+    def cancel_button_clicked(self):
+        """Handles the click event of the 'Cancel' button, asking the worker to
+        stop applying the changes as soon as possible.
+
+        Parameters:
+            self (object): instance of a class.
+
+        Returns:
+            None
+        """
+
+        if self.apply_worker is not None:
+            self.apply_worker.cancel()
+            self.cancel_button.setEnabled(False)
+            self.question_label.setText("Cancelling...")
+
+    def apply_progress(self, percentage, message):
+        """Shows the progress reported by the worker applying the changes.
 
-        # backup_folder, new_values_dict, farm_name, self.changes_applied_groupbox
-        def write_to_config():
-            """Writes contents to the config file and performs config file
-            reload.
-
-            Parameters:
-                None
-
-            Returns:
-                None
-            """
-
-            print("The write_to_config() method has started")
-
-            # Creates the Backup file for the config file and then deletes
-            # the temporary one used while the tool is running
-            if os.path.exists(self.config_file_path_name):
-                backup_file_name = (
-                    f"{self.backup_folder}D{date.today()}"
-                    f"-T{datetime.now().strftime('%H:%M:%S')}.config"
-                )
-
-                final_backup_file = backup_file_name.replace(":", "")
-                os.rename(self.config_file_path_name, final_backup_file)
-
-            if os.path.exists(self.tmp_file_name):
-                with open(self.tmp_file_name, mode="r") as tmp_file:
-                    tmp_data = json.load(tmp_file, object_pairs_hook=OrderedDict)
-                json.dump(
-                    tmp_data, open(self.config_file_path_name, mode="w"), indent=4
-                )
-                sleep(5)
-                os.remove(self.tmp_file_name)
-            else:
-                json.dump(
-                    self.contents_dict,
-                    open(self.config_file_path_name, mode="w"),
-                    indent=4,
-                )
-                sleep(5)
-
-            return_code = subprocess.call(["tq", "reloadconfig", "--limits"])
-            if return_code != 0:
-                print("Command failed with error code: ", return_code)
-                print("Tryin again with os.system()")
-                os.system("tq reloadconfig --limits")  # , shell=True
-                sleep(10)
-            else:
-                print("Command executed successfully")
-
-            # Loading website containing the updated '.config' file info
-            web_info = urlopen("http://tractor-engine/Tractor/queue?q=limits")
-            sleep(5)
-            web_info_dict = json.load(web_info)
-            print("Config-file website has just been fully loaded!")
-
-            # Iterates through the 'New Values Directory' sent from the
-            # previous window and compares every value to those in the
-            # 'Tractor Limits' website.
-            index = 1
-            for show, percentage in self.new_values_dict.items():
-
-                full_number = float(percentage)
-                web_value = (
-                    float(
-                        web_info_dict["Limits"][self.farm_name]["Shares"][show][
-                            "nominal"
-                        ]
-                    )
-                    * 100
-                )
-
-                web_value = round(web_value, 1)
-                print(f"Show: {show}")
-                print("Full Number | Web Value")
-                print(full_number, web_value)
-
-                while web_value != full_number:
-
-                    web_info = urlopen("http://tractor-engine/Tractor/queue?q=limits")
-
-                    web_info_dict = json.load(web_info)
-                    web_value = (
-                        float(
-                            web_info_dict["Limits"][self.farm_name]["Shares"][show][
-                                "nominal"
-                            ]
-                        )
-                        * 100
-                    )
-
-                    web_value = round(web_value, 1)
-                    print(f"Show: {show}")
-                    print("Full Number | Web Value")
-                    print(full_number, web_value)
-
-                    index += 1
-
-                    if 1 < index <= 7:
-
-                        return_code = subprocess.call(
-                            ["tq", "reloadconfig", "--limits"]
-                        )
-
-                        print(f"Amount of config-reloads: {index}")
-
-                        sleep(10)
-                        if return_code != 0:
-                            print("Command failed with error code: ", return_code)
-                            print("Trying again with os.system()")
-                            os.system("tq reloadconfig --limits")  # , shell=True
-                            sleep(10)
-                        else:
-                            print("Command executed successfully")
-
-                    elif index == 8:
-                        print(
-                            "The Config was reloaded too many times before "
-                            "this change could be properly applied. "
-                            "Attempt to reload manually."
-                        )
-                        sys.exit()
-
-        write_button.clicked.connect(write_to_config)
-        write_button.clicked.connect(self.close)
+        Parameters:
+            percentage (int): Percentage of the apply done so far.
+            message (str): Description of the current step.
+
+        Returns:
+            None
+        """
+
+        print(message)
+        self.progress_bar.setValue(percentage)
+        self.question_label.setText(message)
+
+    def apply_done(self, success, message):
+        """Handles the end of the apply. Closes the window if Tractor is using
+        the new values, otherwise shows what went wrong and gives the buttons
+        back to the user.
+
+        Parameters:
+            success (bool): True if the engine is using the new values.
+            message (str): Outcome of the apply.
+
+        Returns:
+            None
+        """
+
+        print(message)
+        self.apply_worker = None
+
+        if success:
+            self.close()
+            return
+
+        self.question_label.setText(message)
+        self.progress_bar.hide()
+        self.cancel_button.hide()
+        self.write_button.show()
+        for button in self.other_buttons:
+            button.setEnabled(True)
+
+    def closeEvent(self, event):
+        """Stops a running apply before the window is closed."""
+        if self.apply_thread is not None and self.apply_thread.isRunning():
+            if self.apply_worker is not None:
+                self.apply_worker.cancel()
+            self.apply_thread.quit()
+            self.apply_thread.wait()
+        super().closeEvent(event)
 
     def more_changes_button_clicked(self):
         """Handles the click event of the 'More Changes' button and goes back
-        to the first window so the user can make more changes to the current
-        TMP file.
+        to the first window so the user can make more changes on top of the
+        staged ones.
 
         Parameters:
             self (object): instance of a class.
@@ -389,3 +397,101 @@ class UiChangesAppliedMainWindow(QtWidgets.QMainWindow):
 
         farm_selection_window = UiAllocationsMainWindow()
         farm_selection_window.show()
+
+    def rollback_button_clicked(self):
+        """Handles the click event of the 'Rollback' button. Lets the user pick
+        a version from the backup store, newest first, and rolls the live config
+        file back to it on a worker thread, reloading every engine reading it
+        once and verifying them while the window keeps responding. The user is
+        told up front about the engines with a config file of their own, which
+        are not rolled back.
+
+        Parameters:
+            self (object): instance of a class.
+
+        Returns:
+            None
+        """
+
+        from backup_store import BackupStore
+        from rollback import split_targets
+
+        versions = BackupStore(self.backup_folder).list_versions()[::-1]
+        if not versions:
+            print("There are no backups to roll back to.")
+            self.question_label.setText("There are no backups to roll back to.")
+            return
+
+        try:
+            _rolled_back, left_alone = split_targets(
+                self.config_file_path_name, self.backup_folder
+            )
+        except (OSError, ValueError) as error:
+            print(error)
+            self.question_label.setText(f"The engine targets are unusable: {error}")
+            return
+
+        # Engines with a config file of their own keep their values
+        text = "Version to roll back to:"
+        if left_alone:
+            text = (
+                "Only the engines reading this config file are rolled back, not "
+                + ", ".join(target.name for target in left_alone)
+                + ".\n"
+                + text
+            )
+
+        labels = [f"{entry['name']}  ({entry['object'][:12]})" for entry in versions]
+        label, accepted = QtWidgets.QInputDialog.getItem(
+            self, "Rollback", text, labels, 0, False
+        )
+        if not accepted:
+            return
+
+        self.apply_thread = QtCore.QThread(self)
+        self.apply_worker = RollbackWorker(
+            versions[labels.index(label)],
+            self.config_file_path_name,
+            self.backup_folder,
+        )
+        self.apply_worker.moveToThread(self.apply_thread)
+        self.apply_thread.started.connect(self.apply_worker.run)
+        self.apply_worker.progress.connect(self.apply_progress)
+        self.apply_worker.done.connect(self.rollback_done)
+        self.apply_worker.done.connect(self.apply_thread.quit)
+
+        self.write_button.hide()
+        self.cancel_button.show()
+        self.cancel_button.setEnabled(True)
+        for button in self.other_buttons:
+            button.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+
+        self.apply_thread.start()
+
+    def rollback_done(self, success, message):
+        """Handles the end of a rollback. Shows its outcome, and the values the
+        engine did not match if any, and gives the buttons back to the user.
+
+        Parameters:
+            success (bool): True if the engine is using the restored values.
+            message (str): Outcome of the rollback.
+
+        Returns:
+            None
+        """
+
+        print(message)
+        self.apply_worker = None
+
+        # The values the engine did not match do not fit in the label
+        summary, _newline, mismatches = message.partition("\n")
+        self.question_label.setText(summary)
+        if mismatches:
+            QtWidgets.QMessageBox.warning(self, "Rollback", message)
+        self.progress_bar.hide()
+        self.cancel_button.hide()
+        self.write_button.show()
+        for button in self.other_buttons:
+            button.setEnabled(True)
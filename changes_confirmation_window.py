@@ -12,10 +12,12 @@ Created by Guillermo Aguero - Render TD
 Written in Python3.
 """
 
-import json
 from qtpy import QtGui, QtWidgets
 
+from allocation_model import SectionAllocations
 from changes_applied_window import UiChangesAppliedMainWindow
+from share_diff import FIELD_NAMES, diff_share_values, format_changes, format_percent
+from staging import get_overlay
 
 
 class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
@@ -26,12 +28,10 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
     and handle user interactions for confirming changes in the farm settings.
 
     Parameters:
-        current_values_dict (dict): The current values for the farm's settings.
-        new_values_dict (dict): The new values to be applied to the farm's settings.
-        current_values_cap_dict (dict): The current cap values for the farm's settings.
-        new_hard_values_dict (dict): The new hard cap values to be applied to the farm's settings.
-        farm_name (str): The name of the farm.
-        contents_dict (dict): The configuration content for the farm.
+        current_allocations (SectionAllocations): The current values for the farm's
+        settings, or a list of them to review many sections at once.
+        new_allocations (SectionAllocations): The new values to be applied to the
+        farm's settings, or a list of them in the same order.
         config_file_path_name (str): Path to the configuration file.
         temp_folder (str): Path to the temporary folder for storing temp files.
         backup_folder (str): Path to the backup folder.
@@ -44,19 +44,17 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
         changes_confirmation_window_setup(): Sets up the changes confirmation window.
         groupbox_creation(): Creates a group box for UI elements.
         label_creation(): Creates labels for the UI.
-        text_browser_creation(): Creates text browsers to display values before and after changes.
+        text_browser_creation(): Creates text browsers to display the values
+        changed in this section, before and after the changes.
+        change_set_creation(): Lists every change the next write would make.
         button_creation(): Creates and sets up buttons for the changes confirmation group box.
         cancel_button_clicked(): Handles the click event for the cancel button.
     """
 
     def __init__(
         self,
-        current_values_dict,
-        new_values_dict,
-        current_values_cap_dict,
-        new_hard_values_dict,
-        farm_name,
-        contents_dict,
+        current_allocations,
+        new_allocations,
         config_file_path_name,
         temp_folder,
         backup_folder,
@@ -72,12 +70,12 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
         is ready to be displayed.
 
         Parameters:
-            current_values_dict (dict): Dictionary of current nominal percentage values for shows.
-            new_values_dict (dict): Dictionary of new nominal percentage values for shows.
-            current_values_cap_dict (dict): Dictionary of current hard cap
-            percentage values for shows.
-            new_hard_values_dict (dict): Dictionary of new hard cap percentage values for shows.
-            farm_name (str): The name of the farm section.
+            current_allocations (SectionAllocations): Current nominal and hard cap
+            percentage values for the shows of the farm section, or a list of
+            them when many sections are reviewed at once.
+            new_allocations (SectionAllocations): New nominal and hard cap
+            percentage values for the shows of the farm section, or a list of
+            them in the same order as 'current_allocations'.
             config_file_path_name (str): Path to the main configuration file.
             temp_folder (str): Path to the temporary folder for storing temp files.
             backup_folder (str): Path to the backup folder.
@@ -86,15 +84,16 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
             fonts (list): List containing large and small QFont objects for UI elements.
 
         Attributes:
-            sorted_current_values_dict (dict): Sorted dictionary of current nominal
-            percentage values.
-            sorted_current_values_cap_dict (dict): Sorted dictionary of current
-            hard cap percentage values.
+            farm_name (str): The name of the farm section (or sections).
+            section_changes (list): ShareChange objects of the values changed
+            in the previous window, against the ones it started from.
             l_font (QFont): Large font for UI elements.
             s_font (QFont): Small font for UI elements.
-
-        Config Data:
-            contents_dict (dict): Dictionary containing the configuration file contents.
+            overlay (StagingOverlay): Changes staged so far, in every section.
+            pending_edits (dict): Values of the reviewed sections differing from
+            the staged ones, keyed by (section, show, field).
+            changes (list): ShareChange objects of every value the next write
+            would change, in every section, against the config file.
 
         UI Components:
             centralwidget (QWidget): Central widget for the confirmation window.
@@ -113,14 +112,16 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
         super().__init__()
 
         # Incoming Variables
-        self.sorted_current_values_dict = dict(sorted(current_values_dict.items()))
-        self.sorted_current_values_cap_dict = dict(
-            sorted(current_values_cap_dict.items())
-        )
-        self.new_values_dict = new_values_dict
-        self.new_hard_values_dict = new_hard_values_dict
-        self.farm_name = farm_name
-        self.contents_dict = contents_dict
+        self.current_allocations = current_allocations
+        self.new_allocations = new_allocations
+        # The all sections window hands over every section at once
+        if isinstance(new_allocations, SectionAllocations):
+            current_sections = [current_allocations]
+            new_sections = [new_allocations]
+        else:
+            current_sections = list(current_allocations)
+            new_sections = list(new_allocations)
+        self.farm_name = ", ".join(allocations.section for allocations in new_sections)
         self.config_file_path_name = config_file_path_name
         self.temp_folder = temp_folder
         self.backup_folder = backup_folder
@@ -129,6 +130,20 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
         self.l_font = fonts[0]
         self.s_font = fonts[1]
         self.fonts = fonts
+        self.overlay = get_overlay(config_file_path_name, temp_folder)
+        self.pending_edits = {}
+        current_values = {}
+        new_values = {}
+        for current, new in zip(current_sections, new_sections):
+            self.pending_edits.update(new.to_edits(base=current))
+            current_values.update(current.to_edits())
+            new_values.update(new.to_edits())
+
+        # Only what changed is shown: in the reviewed sections against the
+        # values the previous window started from, and in every section
+        # against the config file
+        self.section_changes = diff_share_values(current_values, new_values)
+        self.changes = diff_share_values(*self.overlay.snapshots(self.pending_edits))
 
         # Sections of the Window
         self.centralwidget = ""
@@ -151,6 +166,7 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
         self.groupbox_creation()
         self.label_creation()
         self.text_browser_creation()
+        self.change_set_creation()
         self.button_creation()
 
     def changes_confirmation_window_setup(self):
@@ -167,7 +183,7 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
         # Title of the Main Window can be changed here.
         self.setWindowTitle("Changes Confirmation Window")
         # Window Size can be adjusted here
-        self.setFixedSize(463, 349)
+        self.setFixedSize(463, 489)
         # Using this style sheet the theme can be changed
         self.setStyleSheet(
             """background-color: rgb(46, 52, 54);color: rgb(238, 238, 236);"""
@@ -203,7 +219,7 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
         self.changes_confirmation_groupbox = QtWidgets.QGroupBox(
             "Review Your Changes", self.centralwidget
         )
-        self.changes_confirmation_groupbox.setGeometry(10, 10, 441, 331)
+        self.changes_confirmation_groupbox.setGeometry(10, 10, 441, 471)
         self.changes_confirmation_groupbox.setFont(self.l_font)
 
     def label_creation(self):
@@ -240,7 +256,8 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
         after_label.setStyleSheet("color : #A7F432")
 
     def text_browser_creation(self):
-        """Creates text browsers to display values before and after changes.
+        """Creates text browsers to display the values changed in the reviewed
+        section (or sections), before and after the changes.
 
         Parameters:
             self (object): The object instance.
@@ -249,38 +266,90 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
             None
         """
 
+        sections = list(
+            dict.fromkeys(change.section for change in self.section_changes)
+        )
+
+        before_lines = []
+        after_lines = []
+        for section in sections:
+            # Sections are only named when there is more than one
+            if len(sections) > 1:
+                before_lines.append(f"{section}:")
+                after_lines.append(f"{section}:")
+            for field, label in FIELD_NAMES.items():
+                changes = [
+                    change
+                    for change in self.section_changes
+                    if change.section == section and change.field == field
+                ]
+                if not changes:
+                    continue
+                before_lines.append(f"{label}:\n")
+                after_lines.append(f"{label}:\n")
+                for change in changes:
+                    before_lines.append(f"{change.show}: {format_percent(change.old)}")
+                    after_lines.append(
+                        f"{change.show}: {format_percent(change.new)} "
+                        f"({change.delta:+})"
+                    )
+                before_lines.append("")
+                after_lines.append("")
+
         before_text_browser = QtWidgets.QTextBrowser(self.changes_confirmation_groupbox)
         before_text_browser.setGeometry(10, 140, 141, 131)
         before_text_browser.setFont(self.s_font)
         before_text_browser.setReadOnly(True)
 
         # This is how the shows are displayed in the Text Browser
-        before_text_browser.append("Nominal:\n")
-        for show, percentage in self.sorted_current_values_dict.items():
-            before_text_browser.append(f"{show}: {percentage}%")
-        before_text_browser.append("\nHard Cap:\n")
-        for show, percentage in self.sorted_current_values_cap_dict.items():
-            before_text_browser.append(f"{show}: {percentage}%")
-
+        before_text_browser.setPlainText("\n".join(before_lines) or "No changes")
         before_text_browser.horizontalScrollBar().setValue(0)
 
-        # Sorted dictionaries
-        sorted_new_values_dict = dict(sorted(self.new_values_dict.items()))
-        sorted_new_hard_values_dict = dict(sorted(self.new_hard_values_dict.items()))
-
         after_text_browser = QtWidgets.QTextBrowser(self.changes_confirmation_groupbox)
-        after_text_browser.setGeometry(230, 140, 141, 131)
+        after_text_browser.setGeometry(230, 140, 201, 131)
         after_text_browser.setFont(self.s_font)
         after_text_browser.setReadOnly(True)
         after_text_browser.setObjectName("after_text_browser")
 
         # This is how the shows are displayed in the Text Browser
-        after_text_browser.append("Nominal:\n")
-        for show, percentage in sorted_new_values_dict.items():
-            after_text_browser.append(f"{show}: {percentage}%")
-        after_text_browser.append("\nHard Cap:\n")
-        for show, percentage in sorted_new_hard_values_dict.items():
-            after_text_browser.append(f"{show}: {percentage}%")
+        after_text_browser.setPlainText("\n".join(after_lines) or "No changes")
+
+    def change_set_creation(self):
+        """Creates a text browser listing every change the next write would
+        make: the ones made here together with the ones already staged for other
+        sections. They are all written at once, with a single reload of Tractor.
+
+        The changes come from the diff engine and are rendered as a single
+        document, each with its absolute and relative delta.
+
+        Parameters:
+            self (object): The object instance.
+
+        Returns:
+            None
+        """
+
+        sections = {change.section for change in self.changes}
+
+        change_set_label = QtWidgets.QLabel(
+            f"Written together with a single reload: {len(self.changes)} values "
+            f"in {len(sections)} section(s)",
+            self.changes_confirmation_groupbox,
+        )
+        change_set_label.setGeometry(10, 280, 421, 20)
+        change_set_label.setFont(self.s_font)
+        change_set_label.setWordWrap(True)
+
+        change_set_text_browser = QtWidgets.QTextBrowser(
+            self.changes_confirmation_groupbox
+        )
+        change_set_text_browser.setGeometry(10, 305, 421, 121)
+        change_set_text_browser.setFont(self.s_font)
+        change_set_text_browser.setReadOnly(True)
+        change_set_text_browser.setObjectName("change_set_text_browser")
+
+        # This is how the changes are displayed, grouped by section
+        change_set_text_browser.setPlainText(format_changes(self.changes))
 
     def button_creation(self):
         """Creates and sets up the buttons for the changes confirmation groupbox.
@@ -303,41 +372,28 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
         stage_button = QtWidgets.QPushButton(
             "Stage", self.changes_confirmation_groupbox
         )
-        stage_button.setGeometry(160, 300, 121, 22)
+        stage_button.setGeometry(160, 440, 121, 22)
         stage_button.setFont(self.s_font)
 
         def stage_button_clicked():
             """Handles the click event for the "Stage" button.
 
-            This function updates the configuration with the new nominal and cap
-            values, saves the updated configuration to a temporary file, and
-            shows the changes applied window.
+            This function stages the new nominal and cap values in the staging
+            overlay (the config file itself is not touched), and shows the
+            changes applied window.
 
             Returns:
                 None
             """
 
-            tmp_file_name = f"{self.temp_folder}temp.config"
-
-            for show, percentage in self.new_values_dict.items():
-                self.contents_dict["Limits"][self.farm_name]["Shares"][show][
-                    "nominal"
-                ] = round(percentage / 100, 3)
-
-            for show, percentage in self.new_hard_values_dict.items():
-                self.contents_dict["Limits"][self.farm_name]["Shares"][show]["cap"] = (
-                    round(percentage / 100, 3)
-                )
-
-            json.dump(self.contents_dict, open(tmp_file_name, mode="w"), indent=4)
+            # Only the values that were actually changed are staged, next to
+            # the ones already staged for other sections
+            self.overlay.stage(self.pending_edits)
 
             changes_applied_window = UiChangesAppliedMainWindow(
                 self.config_file_path_name,
-                self.contents_dict,
-                tmp_file_name,
+                self.overlay,
                 self.backup_folder,
-                self.new_values_dict,
-                self.farm_name,
                 self.fonts,
             )
             changes_applied_window.show()
@@ -356,7 +412,7 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
             # Takes in the y-axis created by the GroupBox Creation minus 30
             stage_all_button.setGeometry(
                 10,
-                300,
+                440,
                 121,
                 22,
             )
@@ -365,38 +421,26 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
             def apply_to_all_button_clicked():
                 """Handles the click event for the "Stage All" button.
 
-                This function updates the configuration for all farm sections
-                with the new nominal and cap values, saves the updated
-                configuration to a temporary file, and shows the changes applied
+                This function stages the new nominal and cap values for all farm
+                sections in the staging overlay, and shows the changes applied
                 window.
 
                 Return:
                     None
                 """
 
-                tmp_file_name = f"{self.temp_folder}temp.config"
+                edits = {}
 
                 for section in self.farm_sections:
                     if section != "linuxfarm_Denoise":
-                        for show, percentage in self.new_values_dict.items():
-                            self.contents_dict["Limits"][section]["Shares"][show][
-                                "nominal"
-                            ] = round(percentage / 100, 3)
-
-                        for show, percentage in self.new_hard_values_dict.items():
-                            self.contents_dict["Limits"][section]["Shares"][show][
-                                "cap"
-                            ] = round(percentage / 100, 3)
+                        edits.update(self.new_allocations.to_edits(section=section))
 
-                json.dump(self.contents_dict, open(tmp_file_name, mode="w"), indent=4)
+                self.overlay.stage(edits)
 
                 changes_applied_window = UiChangesAppliedMainWindow(
                     self.config_file_path_name,
-                    self.contents_dict,
-                    tmp_file_name,
+                    self.overlay,
                     self.backup_folder,
-                    self.new_values_dict,
-                    self.farm_name,
                     self.fonts,
                 )
                 changes_applied_window.show()
@@ -408,7 +452,7 @@ class UiConfirmFarmChangesMainWindow(QtWidgets.QMainWindow):
         cancel_button = QtWidgets.QPushButton(
             "Cancel", self.changes_confirmation_groupbox
         )
-        cancel_button.setGeometry(310, 300, 121, 22)
+        cancel_button.setGeometry(310, 440, 121, 22)
         cancel_button.setFont(self.s_font)
         cancel_button.clicked.connect(self.cancel_button_clicked)
         cancel_button.clicked.connect(self.close)
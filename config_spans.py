@@ -0,0 +1,646 @@
+#!/usr/bin/python3
+
+"""
+- Format-preserving editor for the Tractor 'limits.config' file.
+- Instead of dumping the whole configuration again every time a value changes,
+this module finds the byte span of every 'Limits/<section>/Shares/<show>'
+'nominal' and 'cap' value and rewrites only the numbers that actually changed.
+Everything else in the file stays byte-identical.
+- The offsets of every section and value are kept in a small sidecar index
+inside the cache folder of the user, never next to the production file,
+built once per version of it, so single sections can be read through mmap
+without parsing the rest of the file. When there is no
+index yet, a section can also be streamed out of the file directly.
+- Please only adjust values if totally sure of what you are doing!
+
+Written in Python3.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from config_store import file_signature, write_atomic
+
+# Fields of a show inside 'Shares' that can be edited in place
+SHARE_FIELDS = ("nominal", "cap")
+
+_STRING_PATTERN = rb'"[^"\\]*(?:\\.[^"\\]*)*"'
+# An object or array without any container nested inside it
+_FLAT_PATTERN = rb'[^"{}\[\]]*(?:' + _STRING_PATTERN + rb'[^"{}\[\]]*)*'
+_NUMBER_PATTERN = rb"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?"
+
+_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+_STRING = re.compile(_STRING_PATTERN, re.DOTALL)
+_NUMBER = re.compile(_NUMBER_PATTERN)
+_LITERAL = re.compile(rb"true|false|null")
+_FLAT_OBJECT = re.compile(rb"\{" + _FLAT_PATTERN + rb"\}", re.DOTALL)
+# Strings and flat containers are consumed whole, so skipping a container only
+# steps through the brackets of the containers nested in it.
+_SKIP_TOKEN = re.compile(
+    _STRING_PATTERN
+    + rb"|\{"
+    + _FLAT_PATTERN
+    + rb"\}|\["
+    + _FLAT_PATTERN
+    + rb"\]|[{}\[\]]",
+    re.DOTALL,
+)
+# Inside a flat object a string followed by ':' can only be a key
+_SHARE_FIELD = re.compile(
+    rb'"(nominal|cap)"[ \t\n\r]*:[ \t\n\r]*(' + _NUMBER_PATTERN + rb")"
+)
+
+# Folder the sidecar indexes are saved in
+INDEX_FOLDER = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "farm_ui"
+)
+
+# Indexes of the files already scanned, keyed by their absolute path
+_index_cache = {}
+# Single sections parsed by load_section(), keyed by (path, section)
+_section_cache = {}
+_section_stats = {"hits": 0, "misses": 0}
+_index_lock = threading.Lock()
+
+
+def _skip_whitespace(data, pos):
+    return _WHITESPACE.match(data, pos).end()
+
+
+def _decode_key(token):
+    # Plain keys are by far the most common, so only escaped ones go
+    # through the json module.
+    if b"\\" in token:
+        return json.loads(token)
+    return token[1:-1].decode("utf-8")
+
+
+def _skip_value(data, pos):
+    """Returns the offset right after the JSON value that starts at 'pos'
+    without building any Python object for it.
+
+    Parameters:
+        data (bytes or mmap): Contents of the configuration file.
+        pos (int): Offset where the value starts.
+
+    Returns:
+        end (int): Offset right after the value.
+    """
+
+    first = data[pos : pos + 1]
+
+    if first == b'"':
+        return _STRING.match(data, pos).end()
+
+    if first in (b"{", b"["):
+        depth = 0
+        while True:
+            match = _SKIP_TOKEN.search(data, pos)
+            if match is None:
+                raise ValueError(f"Unterminated container at byte {pos}")
+            pos = match.end()
+            token = data[match.start() : match.start() + 1]
+            if token == b'"' or pos - match.start() > 1:
+                # A whole string or flat container
+                if depth == 0:
+                    return pos
+            elif token in (b"{", b"["):
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return pos
+
+    match = _NUMBER.match(data, pos) or _LITERAL.match(data, pos)
+    if match is None:
+        raise ValueError(f"Unexpected character at byte {pos}")
+    return match.end()
+
+
+def _walk_object(data, pos, visit):
+    """Walks the members of the JSON object that starts at 'pos'.
+
+    For every member 'visit(key, value_start)' is called. It returns the offset
+    right after the value if it consumed it, or None to have it skipped.
+
+    Parameters:
+        data (bytes or mmap): Contents of the configuration file.
+        pos (int): Offset where the object starts.
+        visit (function): Function called for every member of the object.
+
+    Returns:
+        end (int): Offset right after the object.
+    """
+
+    pos = _skip_whitespace(data, pos)
+    if data[pos : pos + 1] != b"{":
+        raise ValueError(f"Expected an object at byte {pos}")
+    pos = _skip_whitespace(data, pos + 1)
+
+    if data[pos : pos + 1] == b"}":
+        return pos + 1
+
+    while True:
+        match = _STRING.match(data, pos)
+        if match is None:
+            raise ValueError(f"Expected a key at byte {pos}")
+        key = _decode_key(match.group())
+
+        pos = _skip_whitespace(data, match.end())
+        if data[pos : pos + 1] != b":":
+            raise ValueError(f"Expected ':' at byte {pos}")
+        pos = _skip_whitespace(data, pos + 1)
+
+        end = visit(key, pos)
+        if end is None:
+            end = _skip_value(data, pos)
+
+        pos = _skip_whitespace(data, end)
+        separator = data[pos : pos + 1]
+        if separator == b"}":
+            return pos + 1
+        if separator != b",":
+            raise ValueError(f"Expected ',' or '}}' at byte {pos}")
+        pos = _skip_whitespace(data, pos + 1)
+
+
+class ConfigIndex:
+    """Byte-offset index of one version of a '.config' file.
+
+    Attributes:
+        signature (tuple): The (mtime, size, inode) of the indexed file.
+        sections (OrderedDict): (start, end) offsets of every section of
+        'Limits', in the order they appear in the file.
+        spans (dict): (start, end) offsets of every share value keyed by
+        (section, show, field).
+    """
+
+    def __init__(self, signature, sections, spans):
+        self.signature = tuple(signature)
+        self.sections = sections
+        self.spans = spans
+
+    def to_json(self):
+        """Serializes the index into the compact format of the sidecar file.
+
+        Every section stores its byte range followed by one entry per show
+        with the (start, end) of its 'nominal' and 'cap' values, using -1 for
+        a value that is not there.
+
+        Returns:
+            text (str): The index as JSON.
+        """
+
+        shows = OrderedDict()
+        for (section, show, field), (start, end) in self.spans.items():
+            entry = shows.setdefault((section, show), [show, -1, -1, -1, -1])
+            offset = 1 + 2 * SHARE_FIELDS.index(field)
+            entry[offset : offset + 2] = [start, end]
+
+        sections = OrderedDict(
+            (section, [start, end, []])
+            for section, (start, end) in self.sections.items()
+        )
+        for (section, _show), entry in shows.items():
+            sections[section][2].append(entry)
+
+        return json.dumps(
+            {"signature": list(self.signature), "sections": sections},
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def from_json(cls, text):
+        """Builds an index back from the contents of a sidecar file.
+
+        Parameters:
+            text (str or bytes): The index as JSON.
+
+        Returns:
+            index (ConfigIndex): The loaded index.
+        """
+
+        raw = json.loads(text, object_pairs_hook=OrderedDict)
+        sections = OrderedDict()
+        spans = {}
+        for section, (start, end, shows) in raw["sections"].items():
+            sections[section] = (start, end)
+            for show, *offsets in shows:
+                for number, field in enumerate(SHARE_FIELDS):
+                    field_start, field_end = offsets[2 * number : 2 * number + 2]
+                    if field_start >= 0:
+                        spans[(section, show, field)] = (field_start, field_end)
+        return cls(raw["signature"], sections, spans)
+
+
+def scan_config(data):
+    """Finds the byte range of every section of 'Limits' and the byte span of
+    every 'nominal' and 'cap' value of every show in them.
+
+    Parameters:
+        data (bytes or mmap): Contents of the configuration file.
+
+    Returns:
+        sections (OrderedDict): (start, end) offsets keyed by section.
+        spans (dict): (start, end) offsets keyed by (section, show, field).
+    """
+
+    sections = OrderedDict()
+    spans = {}
+
+    def visit_show(section, show):
+        def visit(key, pos):
+            if key not in SHARE_FIELDS:
+                return None
+            match = _NUMBER.match(data, pos)
+            if match is None:
+                return None
+            spans[(section, show, key)] = match.span()
+            return match.end()
+
+        return visit
+
+    def visit_shares(section):
+        def visit(show, pos):
+            if data[pos : pos + 1] != b"{":
+                return None
+            # Shows normally hold plain values only, so their fields can be
+            # picked straight out of the matched object.
+            flat = _FLAT_OBJECT.match(data, pos)
+            if flat is None:
+                return _walk_object(data, pos, visit_show(section, show))
+            for field in _SHARE_FIELD.finditer(data, pos, flat.end()):
+                spans[(section, show, field.group(1).decode())] = field.span(2)
+            return flat.end()
+
+        return visit
+
+    def visit_section(section):
+        def visit(key, pos):
+            if key != "Shares" or data[pos : pos + 1] != b"{":
+                return None
+            return _walk_object(data, pos, visit_shares(section))
+
+        return visit
+
+    def visit_limits(section, pos):
+        if data[pos : pos + 1] == b"{":
+            end = _walk_object(data, pos, visit_section(section))
+        else:
+            end = _skip_value(data, pos)
+        sections[section] = (pos, end)
+        return end
+
+    def visit_root(key, pos):
+        if key != "Limits":
+            return None
+        return _walk_object(data, pos, visit_limits)
+
+    _walk_object(data, _skip_whitespace(data, 0), visit_root)
+    return sections, spans
+
+
+def scan_share_spans(data):
+    """Finds the byte span of every 'nominal' and 'cap' value of every show in
+    every section of 'Limits'.
+
+    Parameters:
+        data (bytes or mmap): Contents of the configuration file.
+
+    Returns:
+        spans (dict): (start, end) offsets keyed by (section, show, field).
+    """
+
+    return scan_config(data)[1]
+
+
+def index_file_path_name(config_file_path_name):
+    """Returns the path of the sidecar index file of a '.config' file.
+
+    Parameters:
+        config_file_path_name (str): Path to the configuration file.
+
+    Returns:
+        index_file_path_name (str): Path to the index file inside INDEX_FOLDER,
+        named after the file and a hash of its path.
+    """
+
+    path = os.path.abspath(config_file_path_name)
+    path_hash = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(INDEX_FOLDER, f"{os.path.basename(path)}.{path_hash}.index")
+
+
+def _index_for_open_file(path, config_file):
+    signature = file_signature(os.fstat(config_file.fileno()))
+
+    with _index_lock:
+        cached = _index_cache.get(path)
+        if cached is not None and cached.signature == signature:
+            return cached
+
+    index = None
+    sidecar = index_file_path_name(path)
+    try:
+        with open(sidecar, "rb") as index_file:
+            index = ConfigIndex.from_json(index_file.read())
+    except (OSError, ValueError, KeyError):
+        index = None
+
+    if index is None or index.signature != signature:
+        if signature[1] == 0:
+            raise ValueError(f"{path} is empty")
+        with mmap.mmap(config_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            sections, spans = scan_config(data)
+        index = ConfigIndex(signature, sections, spans)
+        try:
+            os.makedirs(INDEX_FOLDER, exist_ok=True)
+            write_atomic(sidecar, index.to_json())
+        except OSError as error:
+            # The index can always be rebuilt from the config itself, so it
+            # is only kept in memory until the next run.
+            print(f"The index of {path} could not be saved: {error}")
+
+    with _index_lock:
+        _index_cache[path] = index
+
+    return index
+
+
+def load_config_index(config_file_path_name):
+    """Returns the byte-offset index of a '.config' file.
+
+    The index is built once per version of the file and saved into a sidecar
+    file inside INDEX_FOLDER, so it is only scanned again once the file
+    changes.
+
+    Parameters:
+        config_file_path_name (str): Path to the configuration file.
+
+    Returns:
+        index (ConfigIndex): Index of the current version of the file.
+    """
+
+    path = os.path.abspath(config_file_path_name)
+    with open(path, "rb") as config_file:
+        return _index_for_open_file(path, config_file)
+
+
+def section_names(config_file_path_name):
+    """Lists the sections of 'Limits' without parsing any of them.
+
+    Parameters:
+        config_file_path_name (str): Path to the configuration file.
+
+    Returns:
+        sections (list): Names of the sections, in the order of the file.
+    """
+
+    return list(load_config_index(config_file_path_name).sections)
+
+
+def read_section(config_file_path_name, section):
+    """Parses a single section of 'Limits', reading only that section's bytes
+    through mmap.
+
+    Parameters:
+        config_file_path_name (str): Path to the configuration file.
+        section (str): Name of the section inside 'Limits'.
+
+    Returns:
+        contents (OrderedDict): Contents of the section.
+    """
+
+    path = os.path.abspath(config_file_path_name)
+    with open(path, "rb") as config_file:
+        index = _index_for_open_file(path, config_file)
+        start, end = index.sections[section]
+        with mmap.mmap(config_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            raw = data[start:end]
+
+    return json.loads(raw, object_pairs_hook=OrderedDict)
+
+
+class _SectionFound(Exception):
+    """Stops the streaming scan as soon as the wanted section is found."""
+
+    def __init__(self, start, end):
+        super().__init__()
+        self.start = start
+        self.end = end
+
+
+def find_section(data, section):
+    """Streams through the file until the wanted section of 'Limits' is found,
+    skipping everything before it without building any object.
+
+    Parameters:
+        data (bytes or mmap): Contents of the configuration file.
+        section (str): Name of the section inside 'Limits'.
+
+    Returns:
+        span (tuple): (start, end) offsets of the section, or None if the file
+        does not have it.
+    """
+
+    def visit_limits(key, pos):
+        if key != section:
+            return None
+        raise _SectionFound(pos, _skip_value(data, pos))
+
+    def visit_root(key, pos):
+        if key != "Limits":
+            return None
+        return _walk_object(data, pos, visit_limits)
+
+    try:
+        _walk_object(data, _skip_whitespace(data, 0), visit_root)
+    except _SectionFound as found:
+        return found.start, found.end
+    return None
+
+
+def load_section(config_file_path_name, section):
+    """Parses a single section of 'Limits' without materializing the rest of
+    the file.
+
+    If the index of the current version of the file is already known the
+    section is read straight from its byte range, otherwise the file is
+    streamed until the section is found. Parsed sections are cached until the
+    file changes, and are shared, so they must be treated as read-only.
+
+    Parameters:
+        config_file_path_name (str): Path to the configuration file.
+        section (str): Name of the section inside 'Limits'.
+
+    Returns:
+        contents (OrderedDict): Contents of the section.
+    """
+
+    path = os.path.abspath(config_file_path_name)
+
+    with open(path, "rb") as config_file:
+        signature = file_signature(os.fstat(config_file.fileno()))
+
+        with _index_lock:
+            cached = _section_cache.get((path, section))
+            if cached is not None and cached[0] == signature:
+                _section_stats["hits"] += 1
+                return cached[1]
+            index = _index_cache.get(path)
+
+        if signature[1] == 0:
+            raise ValueError(f"{path} is empty")
+
+        with mmap.mmap(config_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if index is not None and index.signature == signature:
+                span = index.sections.get(section)
+            else:
+                span = find_section(data, section)
+            if span is None:
+                raise KeyError(f"'{section}' is not a section of {path}")
+            raw = data[span[0] : span[1]]
+
+    contents = json.loads(raw, object_pairs_hook=OrderedDict)
+
+    with _index_lock:
+        _section_cache[(path, section)] = (signature, contents)
+        _section_stats["misses"] += 1
+
+    return contents
+
+
+def section_cache_stats():
+    """Returns the hit/miss counters of the cache of load_section().
+
+    Returns:
+        stats (dict): Amount of 'hits', 'misses' and currently 'cached' sections.
+    """
+
+    with _index_lock:
+        stats = dict(_section_stats)
+        stats["cached"] = len(_section_cache)
+    return stats
+
+
+def read_share_values(config_file_path_name, keys):
+    """Reads single share values straight from their byte spans, without
+    parsing any section of the file.
+
+    Parameters:
+        config_file_path_name (str): Path to the configuration file.
+        keys (iterable): (section, show, field) keys of the values to read.
+
+    Returns:
+        values (dict): Share values (0 to 1) keyed by (section, show, field).
+        Keys that are not in the file are left out.
+    """
+
+    path = os.path.abspath(config_file_path_name)
+    with open(path, "rb") as config_file:
+        index = _index_for_open_file(path, config_file)
+        with mmap.mmap(config_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return {
+                key: float(data[index.spans[key][0] : index.spans[key][1]])
+                for key in keys
+                if key in index.spans
+            }
+
+
+def _read_with_spans(config_file_path_name):
+    path = os.path.abspath(config_file_path_name)
+
+    with open(path, "rb") as config_file:
+        index = _index_for_open_file(path, config_file)
+        data = config_file.read()
+
+    return data, index.spans
+
+
+def load_share_spans(config_file_path_name):
+    """Returns the value spans of a '.config' file, scanning it only if it
+    changed since the last time it was requested.
+
+    Parameters:
+        config_file_path_name (str): Path to the configuration file.
+
+    Returns:
+        spans (dict): (start, end) offsets keyed by (section, show, field).
+    """
+
+    return load_config_index(config_file_path_name).spans
+
+
+def format_share_value(value):
+    """Formats a share value the same way json.dump() would write it.
+
+    Parameters:
+        value (float): Share value between 0 and 1.
+
+    Returns:
+        text (bytes): The value as it is written in the file.
+    """
+
+    return json.dumps(round(value, 3)).encode("utf-8")
+
+
+def apply_share_edits(data, edits, spans=None):
+    """Rewrites the given share values in place, leaving every other byte of
+    the file untouched.
+
+    Values that are numerically the same as the ones already in the file are
+    left as they are, so unchanged shows keep their original formatting.
+
+    Parameters:
+        data (bytes): Contents of the configuration file.
+        edits (dict): New share values (0 to 1) keyed by (section, show, field).
+        spans (dict): Spans of 'data' if they are already known.
+
+    Returns:
+        new_data (bytes): Contents of the configuration file with the edits.
+    """
+
+    if spans is None:
+        spans = scan_share_spans(data)
+
+    replacements = []
+    for key, value in edits.items():
+        if key not in spans:
+            raise KeyError(f"No '{key[2]}' value for {key[1]} in {key[0]}")
+        start, end = spans[key]
+        if float(data[start:end]) != round(value, 3):
+            replacements.append((start, end, format_share_value(value)))
+
+    if not replacements:
+        return bytes(data)
+
+    replacements.sort()
+    pieces = []
+    previous_end = 0
+    for start, end, text in replacements:
+        pieces.append(data[previous_end:start])
+        pieces.append(text)
+        previous_end = end
+    pieces.append(data[previous_end:])
+
+    return b"".join(pieces)
+
+
+def edit_config_file(source_file_path_name, edits):
+    """Reads a '.config' file and returns its contents with the given share
+    values rewritten in place.
+
+    Parameters:
+        source_file_path_name (str): Path to the configuration file to edit.
+        edits (dict): New share values (0 to 1) keyed by (section, show, field).
+
+    Returns:
+        new_data (bytes): Contents of the configuration file with the edits.
+    """
+
+    data, spans = _read_with_spans(source_file_path_name)
+    return apply_share_edits(data, edits, spans)
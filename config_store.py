@@ -0,0 +1,192 @@
+#!/usr/bin/python3
+
+"""
+- Process-wide store for the '.config' files used by the Farm UI.
+- Every window asks this module for the parsed config instead of loading the
+file on its own, so the file is only parsed again once it has actually changed
+on disk (checked through its mtime, size and inode).
+- Changes to the config files are committed through here as well, always
+going through a fsync'd temporary file that atomically replaces the live one.
+- Please only adjust values if totally sure of what you are doing!
+
+Written in Python3.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Parsed config files keyed by their absolute path. Every entry holds the
+# (mtime, size, inode) signature of the file it was parsed from.
+_config_cache = {}
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+
+def file_signature(stat_result):
+    """Builds the signature used to decide if a cached file is still valid.
+
+    Parameters:
+        stat_result (os.stat_result): Result of os.stat() or os.fstat().
+
+    Returns:
+        signature (tuple): The (mtime, size, inode) of the file.
+    """
+
+    return stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino
+
+
+def load_config(config_file_path_name):
+    """Returns the parsed contents of a '.config' file, parsing it only if it
+    changed since the last time it was requested.
+
+    The returned OrderedDict is shared by every window of the UI, so it must be
+    treated as read-only. Make a copy of it before changing any value.
+
+    Parameters:
+        config_file_path_name (str): Path to the configuration file.
+
+    Returns:
+        contents_dict (OrderedDict): Dictionary containing the configuration data.
+    """
+
+    path = os.path.abspath(config_file_path_name)
+
+    with open(path, "r") as i:
+        # Using the stat of the open file so the signature always matches the
+        # data that gets parsed below, even if the file is replaced meanwhile.
+        signature = file_signature(os.fstat(i.fileno()))
+
+        with _cache_lock:
+            cached = _config_cache.get(path)
+            if cached is not None and cached[0] == signature:
+                _cache_stats["hits"] += 1
+                return cached[1]
+
+        contents_dict = json.load(i, object_pairs_hook=OrderedDict)
+
+    with _cache_lock:
+        _config_cache[path] = (signature, contents_dict)
+        _cache_stats["misses"] += 1
+
+    return contents_dict
+
+
+def invalidate(config_file_path_name=None):
+    """Drops a single file from the cache, or every file if no path is given.
+
+    Parameters:
+        config_file_path_name (str): Path to the configuration file.
+
+    Returns:
+        None
+    """
+
+    with _cache_lock:
+        if config_file_path_name is None:
+            _config_cache.clear()
+        else:
+            _config_cache.pop(os.path.abspath(config_file_path_name), None)
+
+
+def cache_stats():
+    """Returns the hit/miss counters of the config cache, and of the cache of
+    the single sections read by the farm windows.
+
+    Returns:
+        stats (dict): Amount of 'hits', 'misses' and currently 'cached' files,
+        and the same counters of the sections under 'sections'.
+    """
+
+    # Imported here, config_spans itself imports this module
+    from config_spans import section_cache_stats
+
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["cached"] = len(_config_cache)
+    stats["sections"] = section_cache_stats()
+    return stats
+
+
+def write_atomic(file_path_name, data):
+    """Writes data to a file so that readers only ever see the old or the new
+    contents, never a partially written file.
+
+    The data is written to a temporary file in the same folder, flushed and
+    fsync'd, and then moved over the target with os.replace().
+
+    Parameters:
+        file_path_name (str): Path to the file being written.
+        data (str or bytes): New contents of the file.
+
+    Returns:
+        None
+    """
+
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+
+    folder = os.path.dirname(os.path.abspath(file_path_name))
+    file_descriptor, tmp_path = tempfile.mkstemp(
+        prefix=f".{os.path.basename(file_path_name)}.", suffix=".tmp", dir=folder
+    )
+
+    try:
+        with os.fdopen(file_descriptor, "wb") as tmp_file:
+            tmp_file.write(data)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+
+        # mkstemp() creates the file readable by the owner only, so the
+        # permissions of the file being replaced are kept.
+        try:
+            os.chmod(tmp_path, os.stat(file_path_name).st_mode & 0o7777)
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o644)
+
+        os.replace(tmp_path, file_path_name)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    # Making sure the rename itself survives a crash as well.
+    folder_descriptor = os.open(folder, os.O_RDONLY)
+    try:
+        os.fsync(folder_descriptor)
+    finally:
+        os.close(folder_descriptor)
+
+
+def commit_config(config_file_path_name, data, backup_folder):
+    """Commits new contents to the live configuration file while keeping a
+    backup of the previous version.
+
+    The live file stays in place the whole time; its contents are added to the
+    backup store of the backup folder and then the file is atomically replaced,
+    so Tractor never sees a missing or half written config.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+        data (str or bytes): New contents of the configuration file.
+        backup_folder (str): Path to the backup folder.
+
+    Returns:
+        backup (dict): Backup store entry of the previous version, or None if
+        there was no live file to back up.
+    """
+
+    # Imported here as the backup store itself writes through write_atomic()
+    from backup_store import BackupStore
+
+    backup = None
+
+    if os.path.exists(config_file_path_name):
+        with open(config_file_path_name, "rb") as config_file:
+            backup = BackupStore(backup_folder).add(config_file.read())
+
+    write_atomic(config_file_path_name, data)
+
+    return backup
@@ -0,0 +1,376 @@
+#!/usr/bin/python3
+
+"""
+- HTTP client of the Farm UI for the Tractor Engine.
+- Keeps connections to the engine open between requests, asks for gzip
+compressed answers and remembers the ETag/Last-Modified of every page, so
+polling a page that did not change only costs a '304 Not Modified'. Every
+request has a deadline, so a slow engine can never hang the tool, and the
+latency of every request is kept for reporting.
+- Please only adjust values if totally sure of what you are doing!
+
+Written in Python3.
+"""
+
+import gzip
+import http.client
+import json
+import math
+import threading
+import time
+from collections import deque
+from urllib.parse import quote, urlsplit
+
+# Seconds a whole request (connecting, sending and reading) may take
+DEFAULT_TIMEOUT = 10.0
+# Idle connections kept open per engine
+MAX_IDLE_CONNECTIONS = 4
+# Amount of request latencies kept for the metrics
+LATENCY_SAMPLES = 256
+
+# One client per engine for the whole process
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class EngineError(OSError):
+    """Raised when the engine answers with an unexpected HTTP status.
+
+    Attributes:
+        status (int): The HTTP status of the answer.
+    """
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class EngineResponse:
+    """Answer of the engine to a single request.
+
+    Attributes:
+        status (int): HTTP status of the answer, 304 if the page did not change.
+        body (bytes): Decompressed body of the page, the cached one on a 304.
+        headers (dict): Headers of the answer, with lower case names.
+        latency (float): Seconds the request took.
+        not_modified (bool): True if the cached copy of the page was reused.
+    """
+
+    __slots__ = ("status", "body", "headers", "latency", "not_modified")
+
+    def __init__(self, status, body, headers, latency, not_modified):
+        self.status = status
+        self.body = body
+        self.headers = headers
+        self.latency = latency
+        self.not_modified = not_modified
+
+
+class EngineClient:
+    """Pooled keep-alive HTTP client for a single engine.
+
+    Attributes:
+        scheme (str): Either 'http' or 'https'.
+        host (str): Host name of the engine.
+        port (int): Port of the engine, the default of the scheme if None.
+        timeout (float): Default deadline of every request, in seconds.
+
+    Methods:
+        from_url(url): Builds a client for the engine of a URL.
+        get(path, timeout): Fetches a page, reusing the cached copy on a 304.
+        get_json(path, timeout): Fetches and parses a JSON page.
+        session_id(user): Returns the engine session of a user, logging in once.
+        metrics(): Returns the request counters and latencies.
+        close(): Closes every idle connection.
+    """
+
+    def __init__(self, host, port=None, scheme="http", timeout=DEFAULT_TIMEOUT):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+        self._idle = []
+        self._lock = threading.Lock()
+        # Last answer of every page: (validators, body, parsed JSON or None)
+        self._pages = {}
+        # Engine session ids keyed by user name
+        self._sessions = {}
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._counters = {
+            "requests": 0,
+            "not_modified": 0,
+            "errors": 0,
+            "new_connections": 0,
+            "reused_connections": 0,
+            "bytes_received": 0,
+        }
+
+    @classmethod
+    def from_url(cls, url, timeout=DEFAULT_TIMEOUT):
+        """Builds a client for the engine a URL points to.
+
+        Parameters:
+            url (str): Any URL of the engine.
+            timeout (float): Default deadline of every request, in seconds.
+
+        Returns:
+            client (EngineClient): The new client.
+        """
+
+        parts = urlsplit(url)
+        return cls(parts.hostname, parts.port, parts.scheme or "http", timeout)
+
+    def _connection(self, reuse=True):
+        with self._lock:
+            if reuse and self._idle:
+                self._counters["reused_connections"] += 1
+                return self._idle.pop(), True
+            self._counters["new_connections"] += 1
+
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port), False
+        return http.client.HTTPConnection(self.host, self.port), False
+
+    def _release(self, connection, response):
+        if response.will_close:
+            connection.close()
+            return
+        with self._lock:
+            if len(self._idle) < MAX_IDLE_CONNECTIONS:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def _send(self, connection, path, headers, deadline):
+        remaining = deadline - time.monotonic()
+        connection.timeout = remaining
+        if connection.sock is not None:
+            connection.sock.settimeout(remaining)
+        connection.request("GET", path, headers=headers)
+        connection.sock.settimeout(max(deadline - time.monotonic(), 0.001))
+        return connection.getresponse()
+
+    def _read(self, connection, response, deadline):
+        # The socket timeout is shrunk before every read, so the whole body
+        # has to arrive before the deadline and not just every single chunk.
+        chunks = []
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("Deadline exceeded while reading the answer")
+            if connection.sock is not None:
+                connection.sock.settimeout(remaining)
+            chunk = response.read(65536)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    def get(self, path, timeout=None, cache=True):
+        """Fetches a page of the engine. If the engine answers that the page
+        did not change since the last time, the cached copy is returned.
+
+        Parameters:
+            path (str): Path and query of the page, e.g. '/Tractor/queue?q=limits'.
+            timeout (float): Deadline of the request, the client default if None.
+            cache (bool): False for requests that do something in the engine,
+            which must never be answered from the cache.
+
+        Returns:
+            response (EngineResponse): The answer of the engine.
+        """
+
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        headers = {"Accept-Encoding": "gzip", "Connection": "keep-alive"}
+        with self._lock:
+            page = self._pages.get(path) if cache else None
+        if page is not None:
+            headers.update(page[0])
+
+        connection, reused = self._connection()
+        try:
+            try:
+                response = self._send(connection, path, headers, deadline)
+            except (http.client.RemoteDisconnected, ConnectionError):
+                # The engine closed an idle connection, one try on a new
+                # connection is enough
+                connection.close()
+                if not reused:
+                    raise
+                connection, reused = self._connection(reuse=False)
+                response = self._send(connection, path, headers, deadline)
+            raw = self._read(connection, response, deadline)
+        except BaseException as error:
+            connection.close()
+            with self._lock:
+                self._counters["errors"] += 1
+            if isinstance(error, TimeoutError):
+                raise TimeoutError(
+                    f"The engine did not answer {path} within {timeout} seconds"
+                ) from error
+            raise
+
+        self._release(connection, response)
+
+        latency = time.monotonic() - start
+        response_headers = {
+            name.lower(): value for name, value in response.getheaders()
+        }
+
+        with self._lock:
+            self._counters["requests"] += 1
+            self._counters["bytes_received"] += len(raw)
+            self._latencies.append(latency)
+
+            if response.status == 304 and page is not None:
+                self._counters["not_modified"] += 1
+                return EngineResponse(304, page[1], response_headers, latency, True)
+
+        if response.status != 200:
+            with self._lock:
+                self._counters["errors"] += 1
+            raise EngineError(
+                f"The engine answered {path} with {response.status}", response.status
+            )
+
+        if response_headers.get("content-encoding") == "gzip":
+            raw = gzip.decompress(raw)
+
+        validators = {}
+        if "etag" in response_headers:
+            validators["If-None-Match"] = response_headers["etag"]
+        if "last-modified" in response_headers:
+            validators["If-Modified-Since"] = response_headers["last-modified"]
+        with self._lock:
+            if validators and cache:
+                self._pages[path] = (validators, raw, None)
+            else:
+                self._pages.pop(path, None)
+
+        return EngineResponse(200, raw, response_headers, latency, False)
+
+    def get_json(self, path, timeout=None):
+        """Fetches and parses a JSON page of the engine. The parsed contents of
+        a page that did not change are reused, so they must be treated as
+        read-only.
+
+        Parameters:
+            path (str): Path and query of the page.
+            timeout (float): Deadline of the request, the client default if None.
+
+        Returns:
+            contents (dict): The parsed page.
+        """
+
+        response = self.get(path, timeout)
+        with self._lock:
+            page = self._pages.get(path)
+            if response.not_modified and page is not None and page[2] is not None:
+                return page[2]
+
+        contents = json.loads(response.body)
+        with self._lock:
+            page = self._pages.get(path)
+            if page is not None and page[1] is response.body:
+                self._pages[path] = (page[0], page[1], contents)
+        return contents
+
+    def session_id(self, user, timeout=None):
+        """Returns the id of the engine session of a user, logging in the first
+        time. Engines that do not use sessions get None.
+
+        Parameters:
+            user (str): Name of the user the session belongs to.
+            timeout (float): Deadline of the login, the client default if None.
+
+        Returns:
+            tsid (str): The session id, or None.
+        """
+
+        with self._lock:
+            if user in self._sessions:
+                return self._sessions[user]
+
+        try:
+            response = self.get(
+                f"/Tractor/monitor?q=login&user={quote(user)}", timeout, cache=False
+            )
+            answer = json.loads(response.body)
+        except (EngineError, ValueError):
+            # No login page, or one that is not answering JSON
+            answer = None
+        tsid = answer.get("tsid") if isinstance(answer, dict) else None
+
+        with self._lock:
+            self._sessions[user] = tsid
+        return tsid
+
+    def forget_session(self, user):
+        """Drops the session of a user, so the next request logs in again."""
+        with self._lock:
+            self._sessions.pop(user, None)
+
+    def metrics(self):
+        """Returns the request counters and latencies of the client.
+
+        Returns:
+            metrics (dict): The counters plus the minimum, average, 95th
+            percentile and maximum latency of the last requests, in milliseconds.
+        """
+
+        with self._lock:
+            metrics = dict(self._counters)
+            latencies = sorted(self._latencies)
+
+        if latencies:
+            metrics["latency_ms"] = {
+                "min": round(latencies[0] * 1000, 2),
+                "avg": round(math.fsum(latencies) / len(latencies) * 1000, 2),
+                "p95": round(latencies[math.ceil(len(latencies) * 0.95) - 1] * 1000, 2),
+                "max": round(latencies[-1] * 1000, 2),
+            }
+        return metrics
+
+    def close(self):
+        """Closes every idle connection of the client.
+
+        Returns:
+            None
+        """
+
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+def get_client(url, timeout=DEFAULT_TIMEOUT):
+    """Returns the client of the engine a URL points to, shared by the whole
+    process so every caller reuses the same connections and cached pages.
+
+    Parameters:
+        url (str): Any URL of the engine.
+        timeout (float): Default deadline of every request, used when the
+        client is first created.
+
+    Returns:
+        client (EngineClient): The client of the engine.
+    """
+
+    parts = urlsplit(url)
+    key = (parts.scheme or "http", parts.hostname, parts.port)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = EngineClient.from_url(url, timeout)
+            _clients[key] = client
+    return client
+
+
+def request_path(url):
+    """Returns the path and query of a URL, as sent to the engine."""
+    parts = urlsplit(url)
+    return (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
@@ -0,0 +1,306 @@
+#!/usr/bin/python3
+
+"""
+- Engine targets of the Farm UI.
+- Changes can be pushed to more than one Tractor Engine (per-site engines, a
+standby...), each one with its own 'limits.config'. The targets are listed in
+'engine_targets.json' next to the main config file; without that file the
+only target is the usual engine and config file.
+- Writing, reloading and verifying run at the same time on every target, so
+pushing to many engines takes about as long as the slowest one. The changes
+are first applied in memory to the config file of every target, so if they
+do not fit one of them nothing is written anywhere; past that point every
+target reports its own outcome.
+- Targets whose config file already has every new value are not written, and
+if their engine is using those values too they are not reloaded either.
+- Please only adjust values if totally sure of what you are doing!
+
+Example of 'engine_targets.json':
+    [
+        {"name": "main", "engine": "tractor-engine",
+         "config": "/sw/tractor/config/limits.config"},
+        {"name": "standby", "engine": "tractor-standby:8080",
+         "config": "/sw/tractor/standby/limits.config",
+         "backup_folder": "/sw/tractor/standby/limits_backup/"}
+    ]
+
+Written in Python3.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPException
+
+from config_spans import edit_config_file
+from config_store import commit_config, load_config
+from tractor_engine import (
+    ENGINE,
+    MAX_RELOADS,
+    fetch_limits,
+    limits_digest,
+    reload_and_verify,
+)
+
+# Name of the file next to the main config file listing the engine targets
+TARGETS_FILE_NAME = "engine_targets.json"
+
+
+class EngineTarget:
+    """A Tractor Engine and the config file it reads its limits from.
+
+    Attributes:
+        name (str): Name of the target, shown to the user.
+        engine (str): The engine, 'host' or 'host:port'.
+        config_file_path_name (str): Path to the config file of the engine.
+        backup_folder (str): Path to the backup folder of that config file.
+    """
+
+    __slots__ = ("name", "engine", "config_file_path_name", "backup_folder")
+
+    def __init__(self, name, engine, config_file_path_name, backup_folder):
+        self.name = name
+        self.engine = engine
+        self.config_file_path_name = config_file_path_name
+        self.backup_folder = backup_folder
+
+    @property
+    def limits_url(self):
+        """Engine page listing the limits currently in use."""
+        return f"http://{self.engine}/Tractor/queue?q=limits"
+
+    @property
+    def reload_url(self):
+        """Engine control page reloading the limits."""
+        return f"http://{self.engine}/Tractor/ctrl?q=reloadconfig&file=limits.config"
+
+    def __repr__(self):
+        return f"EngineTarget({self.name!r}, {self.engine!r})"
+
+
+class TargetResult:
+    """Outcome of pushing the changes to one target.
+
+    Attributes:
+        target (EngineTarget): The target.
+        written (bool): True if its config file was written.
+        unchanged (bool): True if its config file already had every new value.
+        reloads (int): Amount of times its engine was reloaded.
+        verified (bool): True if its engine is using every new value.
+        message (str): What happened, for the user.
+        mismatches (dict): Values its engine did not match, if any.
+        finished (bool): True once nothing else will happen to the target.
+        seconds (float): Time the target took.
+    """
+
+    __slots__ = (
+        "target",
+        "written",
+        "unchanged",
+        "reloads",
+        "verified",
+        "message",
+        "mismatches",
+        "finished",
+        "seconds",
+    )
+
+    def __init__(self, target):
+        self.target = target
+        self.written = False
+        self.unchanged = False
+        self.reloads = 0
+        self.verified = False
+        self.message = "Not started"
+        self.mismatches = {}
+        self.finished = False
+        self.seconds = 0.0
+
+
+def load_targets(config_file_path_name, backup_folder):
+    """Returns the engine targets the changes are pushed to.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file,
+        next to which the targets file is looked for.
+        backup_folder (str): Path to the backup folder, used by the targets
+        that do not have their own.
+
+    Returns:
+        targets (list): The EngineTarget objects, only the main engine and
+        config file if there is no targets file. ValueError is raised if the
+        targets file lists no target or a target without an engine.
+    """
+
+    targets_file = os.path.join(
+        os.path.dirname(os.path.abspath(config_file_path_name)), TARGETS_FILE_NAME
+    )
+    if not os.path.exists(targets_file):
+        return [EngineTarget(ENGINE, ENGINE, config_file_path_name, backup_folder)]
+
+    with open(targets_file, "r") as i:
+        entries = json.load(i)
+
+    # A broken targets file must stop the push instead of pushing nowhere
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{targets_file} has to list at least one engine target")
+
+    targets = []
+    for position, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict) or not entry.get("engine"):
+            raise ValueError(
+                f"Target {position} of {targets_file} has no 'engine': {entry!r}"
+            )
+        targets.append(
+            EngineTarget(
+                entry.get("name", entry["engine"]),
+                entry["engine"],
+                entry.get("config", config_file_path_name),
+                entry.get("backup_folder", backup_folder),
+            )
+        )
+    return targets
+
+
+def apply_to_targets(targets, edits, expected=None, cancelled=None, report=None):
+    """Writes share edits to the config file of every target, reloads every
+    engine and checks that each one uses the new values, all at once.
+
+    Parameters:
+        targets (list): The EngineTarget objects to push to.
+        edits (dict): New share values (0 to 1) keyed by (section, show, field).
+        expected (dict): Values to check in the engines, the edits by default.
+        cancelled (threading.Event): Optional event stopping every target.
+        report (function): Optional callback receiving the TargetResult of a
+        target every time it makes progress. Called from the threads doing
+        the work.
+
+    Returns:
+        results (list): One TargetResult per target, in the same order.
+    """
+
+    expected = edits if expected is None else expected
+    results = [TargetResult(target) for target in targets]
+
+    def status(result, message, finished=False):
+        result.message = message
+        result.finished = finished
+        if report is not None:
+            report(result)
+
+    # Every target gets its new contents before anything is written, so
+    # changes that do not fit one of the config files are never half pushed.
+    # Their hashes tell which config files already have every new value.
+    contents = {}
+    digests = {}
+    unchanged = {}
+    for target in targets:
+        path = target.config_file_path_name
+        if path not in contents:
+            contents[path] = edit_config_file(path, edits)
+            digests[path] = limits_digest(json.loads(contents[path]))
+            unchanged[path] = digests[path][0] == limits_digest(load_config(path))[0]
+
+    # Targets sharing a config file only write it once
+    commit_locks = {path: threading.Lock() for path in contents}
+    committed = {}
+
+    def push(result):
+        target = result.target
+        start = time.monotonic()
+        try:
+            path = target.config_file_path_name
+            if unchanged[path]:
+                result.unchanged = True
+                engine_digests = engine_section_digests(target, digests[path][1])
+                if engine_digests is None:
+                    status(
+                        result,
+                        "Nothing written, the config file already has these "
+                        "values (the engine could not be checked)",
+                        finished=True,
+                    )
+                    return result
+                if engine_digests == digests[path][1]:
+                    result.verified = True
+                    status(result, "Nothing to do, already in use", finished=True)
+                    return result
+                status(result, "Config file unchanged, the engine is not")
+            else:
+                with commit_locks[path]:
+                    if cancelled is not None and cancelled.is_set():
+                        status(result, "Cancelled before writing", finished=True)
+                        return result
+                    if path not in committed:
+                        commit_config(path, contents[path], target.backup_folder)
+                        committed[path] = True
+                result.written = True
+                status(result, "Written")
+
+            result.mismatches, result.reloads = reload_and_verify(
+                expected,
+                url=target.limits_url,
+                reload_url=target.reload_url,
+                cancelled=cancelled,
+                progress=lambda count: status(
+                    result, f"Reloading ({count}/{MAX_RELOADS})"
+                ),
+            )
+            result.seconds = time.monotonic() - start
+            if cancelled is not None and cancelled.is_set():
+                status(result, "Cancelled after writing", finished=True)
+            elif result.mismatches:
+                status(
+                    result,
+                    f"{len(result.mismatches)} values still wrong after "
+                    f"{result.reloads} reloads",
+                    finished=True,
+                )
+            else:
+                result.verified = True
+                status(result, "Verified", finished=True)
+        except Exception as error:
+            result.seconds = time.monotonic() - start
+            status(result, f"Failed: {error}", finished=True)
+        return result
+
+    with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+        return list(pool.map(push, results))
+
+
+def engine_section_digests(target, section_digests):
+    """Returns the hashes of the share values a target's engine is using.
+
+    Parameters:
+        target (EngineTarget): The target.
+        section_digests (dict): Hashes of the config file of the target keyed
+        by section, only these sections are hashed from the engine.
+
+    Returns:
+        digests (dict): Hashes keyed by section, None if the engine could not
+        be asked.
+    """
+
+    try:
+        limits_dict = fetch_limits(target.limits_url)
+    except (OSError, ValueError, HTTPException):
+        return None
+    return limits_digest(limits_dict, sections=section_digests)[1]
+
+
+def format_report(results):
+    """Builds the per-target report of a push.
+
+    Parameters:
+        results (list): TargetResult objects returned by apply_to_targets().
+
+    Returns:
+        report (str): One line per target.
+    """
+
+    return "\n".join(
+        f"{result.target.name}: {result.message} ({result.seconds:.1f}s)"
+        for result in results
+    )
@@ -12,13 +12,13 @@ Created by Guillermo Aguero - Render TD
 Written in Python3.
 """
 
-import json
-import os
 import re
-from collections import OrderedDict
-from functools import partial
 from qtpy import QtWidgets, QtCore, QtGui
 from changes_confirmation_window import UiConfirmFarmChangesMainWindow
+from allocation_model import SectionAllocations
+from share_editor import ShareBulkPanel, ShareEditor, ShareTotalBox
+from config_spans import load_section
+from staging import get_overlay
 
 
 class UiLinuxFarmMainWindow(QtWidgets.QMainWindow):
@@ -42,13 +42,11 @@ class UiLinuxFarmMainWindow(QtWidgets.QMainWindow):
         sets up UI components. Checks to see if there is temporary file to be used,
         otherwise the main configuration file is opened.
         setup_ui(): Sets up the user interface components.
-        get_shows(): Generates a list of show names that the farm has access to.
+        get_shows(): Generates the allocations model and list of show names.
         linux_farm_window_setup(): Sets up the main window properties.
         groupbox_creation(): Creates the main Group Box for the UI elements.
-        groupbox_info_creation(): Creates and configures UI components within
-        the Group Box.
-        current_values_show(show, slider, spin_box, hardcap_spin_box): Updates
-        current percentage values.
+        groupbox_info_creation(): Creates the share editor and the total
+        within the Group Box.
         info_label_creation(): Creates and sets text for various labels in the window.
         button_creation(): Creates and sets up the Submit and Cancel buttons.
         cancel_button_clicked(): Handles the Cancel button click event.
@@ -83,18 +81,18 @@ class UiLinuxFarmMainWindow(QtWidgets.QMainWindow):
             shows (list): List of show names available on the farm.
             y_axis_window_size (int): Initial window height.
             cleaned_farm_name (str): Cleaned and formatted farm name for display.
-            current_perc_list (list): List of current percentage values for shows.
-            spinboxes_list (list): List of spin box widgets for nominal percentages.
-            sliders_list (list): List of slider widgets for nominal percentages.
-            spinboxes_hardcap_list (list): List of spin box widgets for hard cap
-            percentages.
-            current_values_full_dict (dict): Dictionary of current percentage
-            values for shows.
-            current_values_cap_full_dict (dict): Dictionary of current hard cap
-            percentage values for shows.
+            share_editor (ShareEditor): Table with the slider and spin boxes
+            of every show.
+            allocations (SectionAllocations): Current nominal and hard cap
+            percentages of every show, including the changes staged so far.
+            live_allocations (SectionAllocations): The same percentages as
+            they are in the configuration file.
 
         Config Data:
-            contents_dict (dict): Dictionary containing the configuration file contents.
+            section_dict (OrderedDict): Contents of this farm's section of the
+            configuration file.
+            overlay (StagingOverlay): Changes staged so far on top of the
+            configuration file.
 
         UI Components:
             centralwidget (QWidget): Central widget for the main window.
@@ -128,21 +126,15 @@ class UiLinuxFarmMainWindow(QtWidgets.QMainWindow):
         self.y_axis_window_size = None
         self.cleaned_farm_name = None
         self.linux_farm_groupbox = None
-        self.current_perc_list = []
-        self.spinboxes_list = []
-        self.sliders_list = []
-        self.spinboxes_hardcap_list = []
-        self.current_values_full_dict = dict()  # This is the value to use
-        self.current_values_cap_full_dict = dict()
-
-        # Opening config file
-        if os.path.exists(self.temp_folder + "temp.config"):
-            with open(self.temp_folder + "temp.config", "r") as i:
-                self.contents_dict = json.load(i, object_pairs_hook=OrderedDict)
-        else:
-            # Opening config file if temp file does not exist.
-            with open(config_file_path_name, "r") as i:
-                self.contents_dict = json.load(i, object_pairs_hook=OrderedDict)
+        self.share_editor = None
+        self.live_allocations = None
+        self.allocations = None
+
+        # Opening only this farm's section of the config file (shared and only
+        # parsed again if it changed). Changes staged so far are kept apart
+        # from it in the staging overlay.
+        self.section_dict = load_section(config_file_path_name, self.farm_name)
+        self.overlay = get_overlay(config_file_path_name, temp_folder)
 
         self.m_font = QtGui.QFont("Cantarell", 12, QtGui.QFont.Bold)
         self.m_font.setUnderline(True)
@@ -171,7 +163,8 @@ class UiLinuxFarmMainWindow(QtWidgets.QMainWindow):
         self.button_creation()
 
     def get_shows(self):
-        """Generates a list of show names that the farm has access to.
+        """Generates the allocations model and the list of show names that the
+        farm has access to.
 
         Parameters:
             self (object): instance of a class.
@@ -180,11 +173,14 @@ class UiLinuxFarmMainWindow(QtWidgets.QMainWindow):
             None
         """
 
-        # This generates a list of all shows for this farm
-        for key in self.contents_dict["Limits"][self.farm_name]["Shares"].keys():
-
-            if len(key) == 3 and key != "RND":
-                self.shows.append(key)
+        # This generates the model (and list) of all shows for this farm
+        self.live_allocations = SectionAllocations.from_section(
+            self.farm_name,
+            self.section_dict,
+            include=lambda key: len(key) == 3 and key != "RND",
+        )
+        self.allocations = self.overlay.applied_to(self.live_allocations)
+        self.shows = list(self.allocations.shows)
 
     def linux_farm_window_setup(self):
         """This function sets up the Linux Farm window, including the size,
@@ -280,154 +276,43 @@ class UiLinuxFarmMainWindow(QtWidgets.QMainWindow):
         self.linux_farm_groupbox.setFont(self.l_font)
 
     def groupbox_info_creation(self):
-        """Creates and configures UI components (labels, spin boxes, and sliders)
-        within a group box for displaying and modifying show allocations.
+        """Creates the share editor (a table with a label, slider and spin
+        boxes per show) within the group box for displaying and modifying show
+        allocations, the spin box showing the total of every nominal
+        percentage and the buttons of the bulk operations.
 
-        This function iterates through the list of shows and dynamically creates
-        labels, spin boxes, and sliders for each show. It then connects the spin
-        boxes and sliders to synchronize their values and calculates the total
-        percentage of allocations. If the UI components exceed the initial window
-        size, the window and group box sizes are adjusted accordingly.
+        The window grows with the amount of shows only until it fills the
+        screen, past that the share editor scrolls. Only the rows on screen are
+        drawn, so farms with hundreds of shows open as fast as small ones.
 
         Parameters:
             self (object): instance of a class.
 
         Internal Functions:
-            label_creation(show, y_axis_value): Creates a label for a show.
-            spin_box_creation(y_axis_value): Creates spin boxes for show allocations
-            and hard cap values.
-            sliders_creation(y_axis_value): Creates a horizontal slider for a show.
-            connect_parts(spin_box, slider): Connects a spin box and a slider to
-            update each other's values.
             current_percent_spin_box_creation(): Creates a spin box to display the
             total current percentage of allocations.
         """
 
-        y_axis_value = 70
-
-        def label_creation(show, y_axis_value):
-            """Creates a QLabel object with the provided show title and sets its
-            properties.
-
-            Parameters:
-                show (str): The title of the show.
-                y_axis_value (int): The y-axis value where the label will
-                be created.
-
-            Returns:
-                None
-            """
-
-            # Tests
-
-            label = QtWidgets.QLabel(show, self.linux_farm_groupbox)
-            label.setGeometry(270, y_axis_value, 35, 20)
-            label.setFont(self.m_font)
-            label.setTextFormat(QtCore.Qt.TextFormat.AutoText)
-            label.setScaledContents(False)
-            label.setWordWrap(True)
-
-        def spin_box_creation(y_axis_value):
-            """Creates two QDoubleSpinBoxes for a show and its hard cap value
-
-            Parameters:
-                show (str): name of the show
-                y_axis_value (int): y-axis value for positioning
-                the spin boxes
-
-            Returns:
-                spin_box (QDoubleSpinBox): QDoubleSpinBox for the
-                show
-                hardCapSpinBox (QDoubleSpinBox): QDoubleSpinBox
-                for the hard cap value of the show
-            """
-            minimum = 0
-            maximum = 100
-
-            spin_box = QtWidgets.QDoubleSpinBox(self.linux_farm_groupbox)
-            spin_box.setGeometry(570, y_axis_value, 57, 22)
-            spin_box.setFont(self.s_font)
-            spin_box.setDecimals(1)
-            spin_box.setMinimum(minimum)
-            spin_box.setMaximum(maximum)
-
-            hardcap_spin_box = QtWidgets.QDoubleSpinBox(self.linux_farm_groupbox)
-            hardcap_spin_box.setGeometry(640, y_axis_value, 60, 22)
-            hardcap_spin_box.setFont(self.s_font)
-            hardcap_spin_box.setDecimals(1)
-            hardcap_spin_box.setMinimum(minimum)
-            hardcap_spin_box.setMaximum(maximum)
-
-            return spin_box, hardcap_spin_box
-
-        def sliders_creation(y_axis_value):
-            """Creates a horizontal slider widget and sets its properties.
-
-            Parameters:
-                show (str): A string representing the name of the
-                slider.
-                y_axis_value (int): An integer representing the
-                y-axis value of the slider.
-
-            Returns:
-                slider (QSlider): A horizontal slider widget with
-                a specified range and name.
-            """
-
-            # Minimum and Maximum for all sliders
-            minimum = 0
-            maximum = 100
-            # Setting up
-            slider = QtWidgets.QSlider(self.linux_farm_groupbox)
-            slider.setGeometry(310, y_axis_value, 251, 20)  # Location in window
-            slider.setTracking(True)
-            slider.setOrientation(QtCore.Qt.Orientation.Horizontal)
-            slider.setMinimum(minimum)
-            slider.setMaximum(maximum)
-
-            return slider
-
-        def connect_parts(spin_box, slider):
-            """Connects a Spin Box and Slider to update each other's values.
-
-            Parameters:
-                spin_box (QSpinBox): the spin box to be connected to the slider.
-                slider (QSlider): the slider to be connected to the spin box.
-
-            Returns:
-                None
-            """
-
-            def _update_slider(slide, value):
-                slide.setValue(value)
-
-            def _update_box(box, value):
-                box.setValue(value)
-
-            spin_box.valueChanged.connect(partial(_update_slider, slider))
-            slider.valueChanged.connect(partial(_update_box, spin_box))
-
-        for show in self.shows:
-            label_creation(show, y_axis_value)
-            spin_box, hardcap_spin_box = spin_box_creation(y_axis_value)
-            slider = sliders_creation(y_axis_value)
-            # Connecting all sliders to their Spin Boxes and vice versa
-            connect_parts(spin_box, slider)
-            # Getting current Percentages per show to be able to pass it to the
-            # Confirmation Window
-            self.current_values_show(
-                show,
-                slider,
-                spin_box,
-                hardcap_spin_box,
-            )
-
-            self.sliders_list.append(slider)
-            self.spinboxes_list.append(spin_box)
-            self.spinboxes_hardcap_list.append(hardcap_spin_box)
-            y_axis_value = y_axis_value + 40
+        self.share_editor = ShareEditor(
+            self.allocations, self.linux_farm_groupbox, self.s_font, self.m_font
+        )
 
-        total_current_percent = sum(self.current_perc_list)
+        # Sizing the window once for every show, capped to the screen
+        screen = QtGui.QGuiApplication.screenAt(QtGui.QCursor().pos())
+        if screen is None:
+            screen = QtGui.QGuiApplication.primaryScreen()
+        self.y_axis_window_size = min(
+            max(
+                self.y_axis_window_size,
+                70 + self.share_editor.height_for_rows(len(self.shows)) + 70,
+            ),
+            max(self.y_axis_window_size, screen.availableGeometry().height() - 60),
+        )
+        self.setFixedSize(740, self.y_axis_window_size)
+        self.linux_farm_groupbox.setGeometry(10, 10, 721, self.y_axis_window_size - 20)
+        self.share_editor.setGeometry(
+            260, 70, 451, self.y_axis_window_size - 20 - 70 - 45
+        )
 
         def current_percent_spin_box_creation():
             """Creates a spinbox to be able to show the current total of all
@@ -436,86 +321,27 @@ class UiLinuxFarmMainWindow(QtWidgets.QMainWindow):
             Returns:
                 None
             """
-            total_spin_box = QtWidgets.QDoubleSpinBox(self.linux_farm_groupbox)
-            total_spin_box.setGeometry(190, 250, 50, 22)
-            total_spin_box.setFont(self.s_font)
-            total_spin_box.setDecimals(0)
-            total_spin_box.setValue(total_current_percent)
-            total_spin_box.setDisabled(True)
-            total_spin_box.setButtonSymbols(
-                QtWidgets.QAbstractSpinBox.ButtonSymbols.NoButtons
+            total_spin_box = ShareTotalBox(
+                self.linux_farm_groupbox, self.s_font, self.allocations.total()
             )
-            total_spin_box.setMaximum(2000)
-            total_spin_box.setStyleSheet("color: green")
-
-            def update_total():
-                total_value = sum(box.value() for box in self.spinboxes_list)
-                total_spin_box.setValue(total_value)
-
-                if total_value > 100 or total_value < 100:
-                    total_spin_box.setStyleSheet("color: red")
-                else:
-                    total_spin_box.setStyleSheet("color: green")
+            total_spin_box.setGeometry(190, 250, 50, 22)
 
-            for box, slide in zip(self.spinboxes_list, self.sliders_list):
-                box.valueChanged.connect(update_total)
-                slide.valueChanged.connect(update_total)
+            # The model keeps the total itself and only signals real changes
+            self.share_editor.share_model().totalChanged.connect(
+                total_spin_box.set_total
+            )
 
         current_percent_spin_box_creation()
 
-        # If the size of the y-axis being used to create all the sliders,
-        # labels and boxes is greater than the window size minus 50 then it
-        # increases the size of both the Window and
-        # the groupbox.
-
-        if y_axis_value > (self.y_axis_window_size - 50):
-            while y_axis_value > (self.y_axis_window_size - 50):
-                self.y_axis_window_size = self.y_axis_window_size + 35  # 90
-                self.setFixedSize(740, self.y_axis_window_size)
-
-            self.y_axis_window_size = self.y_axis_window_size - 20
-            self.linux_farm_groupbox.setGeometry(10, 10, 721, self.y_axis_window_size)
-
-    def current_values_show(
-        self,
-        show,
-        slider,
-        spin_box,
-        hardcap_spin_box,
-    ):
-        """Function to update the current percentage values for the nominal and
-        hard cap for a given show.
-
-        Parameters:
-            self (object): instance of a class.
-            show (str): The show name.
-            slider (QSlider): The slider for the nominal percentage.
-            spin_box (QSpinBox): The spin box for the nominal percentage.
-            hardcap_spin_box (QSpinBox): The spin box for the hard cap
-            percentage.
-
-        Returns:
-            None
-        """
-
-        # Nominal
-        current_value = self.contents_dict["Limits"][self.farm_name]["Shares"][show][
-            "nominal"
-        ]
-        current_perc = round(current_value * 100, 1)
-        slider.setValue(current_perc)
-        spin_box.setValue(current_perc)
-        self.current_values_full_dict.update({show: current_perc})
-
-        self.current_perc_list.append(current_perc)
-
-        # Hard Cap
-        current_cap_value = self.contents_dict["Limits"][self.farm_name]["Shares"][
-            show
-        ]["cap"]
-        current_cap_perc = round(current_cap_value * 100, 1)
-        hardcap_spin_box.setValue(current_cap_perc)
-        self.current_values_cap_full_dict.update({show: current_cap_perc})
+        # Bulk operations on the selected shows (or all of them) and the
+        # switch keeping the total at 100
+        bulk_panel = ShareBulkPanel(
+            self.share_editor,
+            self.live_allocations,
+            self.linux_farm_groupbox,
+            self.s_font,
+        )
+        bulk_panel.setGeometry(10, 285, 240, 72)
 
     def info_label_creation(self):
         """Creates and sets text for various labels in the window.
@@ -577,7 +403,7 @@ class UiLinuxFarmMainWindow(QtWidgets.QMainWindow):
 
         # Nominal and Hard Cap labels
         nominal_label = QtWidgets.QLabel("Nominal", self.linux_farm_groupbox)
-        nominal_label.setGeometry(410, 40, 61, 20)
+        nominal_label.setGeometry(450, 40, 61, 20)
         nominal_label.setFont(self.m_font)
         nominal_label.setTextFormat(QtCore.Qt.TextFormat.AutoText)
         nominal_label.setScaledContents(False)
@@ -621,17 +447,9 @@ class UiLinuxFarmMainWindow(QtWidgets.QMainWindow):
                 None
             """
 
-            new_values_list = []
-            for box in self.spinboxes_list:
-                new_value = box.value()
-                new_values_list.append(new_value)
-
-            new_hard_values_list = []
-            for box in self.spinboxes_hardcap_list:
-                new_hard_value = box.value()
-                new_hard_values_list.append(new_hard_value)
+            new_allocations = self.share_editor.share_model().allocations()
 
-            big_sum = round(sum(new_values_list), 1)
+            big_sum = new_allocations.total()
 
             if big_sum < 100.0 or big_sum > 100.0:
                 error_label = QtWidgets.QLabel(
@@ -653,19 +471,13 @@ class UiLinuxFarmMainWindow(QtWidgets.QMainWindow):
                 error_label.show()
 
             else:
-                new_values_dict = dict(zip(self.shows, new_values_list))
-                new_hard_values_dict = dict(zip(self.shows, new_hard_values_list))
                 # This check is needed for the following window to choose whether
                 # to display the "Stage All" button or not
                 linux_check = True
 
                 changes_confirmation_window = UiConfirmFarmChangesMainWindow(
-                    self.current_values_full_dict,
-                    new_values_dict,
-                    self.current_values_cap_full_dict,
-                    new_hard_values_dict,
-                    self.farm_name,
-                    self.contents_dict,
+                    self.allocations,
+                    new_allocations,
                     self.config_file_path_name,
                     self.temp_folder,
                     self.backup_folder,
@@ -11,13 +11,15 @@ Written in Python3.
 """
 
 import sys
-import json
 import re
-from collections import OrderedDict
 from qtpy import QtWidgets, QtGui
+from config_spans import section_names
 
 # These are all the other windows being imported
 
+# Combo box entry opening every Linux Farm section at once
+ALL_LINUX_SECTIONS = "All Linux Sections"
+
 
 class UiAllocationsMainWindow(QtWidgets.QMainWindow):
     """Main window class for the Farm UI for Show Allocations.
@@ -27,7 +29,7 @@ class UiAllocationsMainWindow(QtWidgets.QMainWindow):
     configuration.
 
      Methods:
-        __init__(): Initializes the main window, loads configuration data, and
+        __init__(): Initializes the main window, loads the config section index, and
         sets up UI components.
         setup_ui(): Sets up the user interface components.
         generate_farm_sections(): Generates and sorts a list of farm sections.
@@ -39,13 +41,16 @@ class UiAllocationsMainWindow(QtWidgets.QMainWindow):
         open_windows_farm_window(farm_name): Opens the Windows Farm window based on selection.
         open_linux_farm_window(farm_name, linux_farm_sections): Opens the Linux
         Farm window based on selection.
+        open_all_sections_window(linux_farm_sections): Opens the window editing
+        every Linux Farm section at once.
     """
 
     def __init__(self):
         """Initializes the main window for the Linux Farm application.
 
-        This method sets up various configuration paths, initializes UI components,
-        and loads the configuration data from a specified file.
+        This method sets up various configuration paths and initializes UI
+        components. The configuration file itself is not parsed here, only its
+        section index is used to list the farm sections.
 
         Attributes:
             config_file_path_name (str): Path to the main configuration file.
@@ -61,10 +66,6 @@ class UiAllocationsMainWindow(QtWidgets.QMainWindow):
         Variables:
             farm_sections (list): List to hold the sections of the farm.
 
-        Config Data:
-            contents_dict (OrderedDict): Dictionary containing the configuration data
-            loaded from the configuration file.
-
         Fonts:
             l_font (QFont): Large font for UI elements.
             s_font (QFont): Small font for UI elements.
@@ -91,10 +92,6 @@ class UiAllocationsMainWindow(QtWidgets.QMainWindow):
         # Variables
         self.farm_sections = []
 
-        # Opening config file
-        with open(self.config_file_path_name, "r") as i:
-            self.contents_dict = json.load(i, object_pairs_hook=OrderedDict)
-
         # Windows
 
         # Fonts
@@ -132,7 +129,7 @@ class UiAllocationsMainWindow(QtWidgets.QMainWindow):
     def generate_farm_sections(self):
         """Generates and sorts a list of farm sections.
 
-        This method creates a list of all the farm sections from the configuration data,
+        This method creates a list of all the farm sections from the configuration index,
         filters them based on specified criteria, and sorts them in natural order.
 
         Parameters:
@@ -141,9 +138,10 @@ class UiAllocationsMainWindow(QtWidgets.QMainWindow):
         Returns:
             None
         """
-        # This generates a list of all farm sections
+        # This generates a list of all farm sections straight from the section
+        # index of the config file, without parsing any of the Shares
         include = ["linuxfarm", "_windowsfarm"]
-        for farm_section in self.contents_dict["Limits"].keys():
+        for farm_section in section_names(self.config_file_path_name):
             for word in include:
                 if word in farm_section:
                     self.farm_sections.append(farm_section)  # IMPORTANT
@@ -243,6 +241,9 @@ class UiAllocationsMainWindow(QtWidgets.QMainWindow):
                 self.farm_select_combo_box.addItem(capital_name)
                 index += 1
 
+        if any("linux" in farm_section for farm_section in self.farm_sections):
+            self.farm_select_combo_box.addItem(ALL_LINUX_SECTIONS)
+
     def label_creation(self):
         """Creates a label with specified properties and text.
 
@@ -288,16 +289,18 @@ class UiAllocationsMainWindow(QtWidgets.QMainWindow):
         # Opening the other windows according to the selection of the Combo Box
         def farm_select_button_clicked():  # Combo Box
             current = self.farm_select_combo_box.currentText()
-            if "linux" in current.lower():
+            linux_farm_sections = []
 
-                linux_farm_sections = []
+            for section in self.farm_sections:
+                # Doing only linux since we want the option to 'apply all the
+                # same values across the board' just for the Linux Farm.
+                if "windows" not in section:
+                    linux_farm_sections.append(section)
 
-                for section in self.farm_sections:
-                    # Doing only linux since we want the option to 'apply all the
-                    # same values across the board' just for the Linux Farm.
-                    if "windows" not in section:
-                        linux_farm_sections.append(section)
+            if current == ALL_LINUX_SECTIONS:
+                self.open_all_sections_window(linux_farm_sections)
 
+            elif "linux" in current.lower():
                 self.open_linux_farm_window(current.lower(), linux_farm_sections)
 
             elif "windows" in current.lower():
@@ -361,6 +364,30 @@ class UiAllocationsMainWindow(QtWidgets.QMainWindow):
         linux_farm.show()
         self.close()
 
+    def open_all_sections_window(self, linux_farm_sections):
+        """Creates and displays a new window editing every section of the Linux
+        farm at once.
+
+        Parameters:
+            self (object): The object instance.
+            linux_farm_sections (list): Sections of the Linux farm.
+
+        Returns:
+            None
+        """
+        from all_sections_window import UiAllSectionsMainWindow
+
+        all_sections = UiAllSectionsMainWindow(
+            linux_farm_sections,
+            self.config_file_path_name,
+            self.temp_folder,
+            self.backup_folder,
+            [self.l_font, self.s_font],
+        )
+
+        all_sections.show()
+        self.close()
+
 
 if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
@@ -0,0 +1,285 @@
+#!/usr/bin/python3
+
+"""
+- Rollback tool of the Farm UI.
+- Puts any version kept in the backup store back into the live 'limits.config'
+file, reloads Tractor once and checks that the engine is using the restored
+values. Can be used from the terminal or from the Changes Applied window.
+- Every engine target of 'engine_targets.json' reading that config file is
+reloaded and checked. Targets with a config file of their own keep their
+values and are reported as not rolled back, their backups live in their own
+store.
+- Please only adjust values if totally sure of what you are doing!
+
+Usage:
+    rollback.py --list
+    rollback.py [version]   (the latest backup if no version is given)
+
+Written in Python3.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from backup_store import BackupNotFound, BackupStore
+from config_store import commit_config
+from engine_targets import EngineTarget, load_targets
+from tractor_engine import ENGINE, ENGINE_LIMITS_URL, engine_reload_url
+from tractor_engine import reload_limits
+from tractor_engine import share_values, wait_for_limits
+
+CONFIG_FILE_PATH_NAME = "/sw/tractor/config/limits.config"
+BACKUP_FOLDER = "/sw/tractor/config/limits_backup/"
+
+
+def _restore(version, config_file_path_name, backup_folder, report):
+    # Puts a version back live, returning the share values it holds
+    store = BackupStore(backup_folder)
+    entry = store.find(version)
+    data = store.get(entry)
+    report(f"Rolling back to {entry['name']} ({entry['object'][:12]})")
+
+    commit_config(config_file_path_name, data, backup_folder)
+    return share_values(json.loads(data))
+
+
+def _reload_and_check(
+    expected, url, reload_url, verify, timeout, cancelled, report, engine="The engine"
+):
+    # Reloads a single engine once and waits for it to use the restored values
+    if not reload_limits(reload_url or engine_reload_url(url)):
+        report(f"{engine} could not be reloaded. Attempt to reload manually.")
+
+    if not verify:
+        return {}
+
+    report(f"Checking {engine} is using the {len(expected)} restored values...")
+    mismatches = wait_for_limits(
+        expected, timeout=timeout, url=url, cancelled=cancelled
+    )
+    if mismatches:
+        print(f"{engine} does not match {len(mismatches)} restored values:")
+        for (section, show, field), (value, engine_value) in mismatches.items():
+            print(f"    {section} / {show} / {field}: {value} | {engine_value}")
+    else:
+        report(f"{engine} is using all {len(expected)} restored values.")
+    return mismatches
+
+
+def _reporter(progress):
+    def report(message):
+        if progress is None:
+            print(message)
+        else:
+            progress(message)
+
+    return report
+
+
+def rollback(
+    version,
+    config_file_path_name=CONFIG_FILE_PATH_NAME,
+    backup_folder=BACKUP_FOLDER,
+    verify=True,
+    timeout=30.0,
+    url=ENGINE_LIMITS_URL,
+    reload_url=None,
+    cancelled=None,
+    progress=None,
+):
+    """Rolls the live config file back to a version of the backup store and
+    reloads a single engine.
+
+    The version being replaced is itself backed up first, so a rollback can
+    always be undone by rolling back again.
+
+    Parameters:
+        version (str or dict): Name, hash or index entry of the version.
+        config_file_path_name (str): Path to the main configuration file.
+        backup_folder (str): Path to the backup folder.
+        verify (bool): Checks the engine is using the restored values.
+        timeout (float): Seconds to wait for the engine to pick them up.
+        url (str): Engine page listing the limits.
+        reload_url (str): Engine control page that reloads the limits, the
+        one of the engine 'url' points to by default.
+        cancelled (threading.Event): Optional event that stops checking the
+        engine as soon as it is set.
+        progress (function): Optional callback receiving a message about
+        every step, the messages are printed if None.
+
+    Returns:
+        mismatches (dict): Values the engine did not match, keyed by
+        (section, show, field). Empty if everything matched or if not verified.
+    """
+
+    report = _reporter(progress)
+    expected = _restore(version, config_file_path_name, backup_folder, report)
+    # The engine reloaded is always the one being checked
+    return _reload_and_check(
+        expected, url, reload_url, verify, timeout, cancelled, report
+    )
+
+
+def split_targets(config_file_path_name, backup_folder):
+    """Splits the engine targets of 'engine_targets.json' between the ones
+    reading the main config file, which a rollback puts back, and the ones
+    with a config file of their own, which it leaves alone.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+        backup_folder (str): Path to the backup folder.
+
+    Returns:
+        targets (tuple): The EngineTarget objects reading the main config file
+        (the main engine if none does), and the other ones.
+    """
+
+    path = os.path.abspath(config_file_path_name)
+    rolled_back = []
+    left_alone = []
+    for target in load_targets(config_file_path_name, backup_folder):
+        if os.path.abspath(target.config_file_path_name) == path:
+            rolled_back.append(target)
+        else:
+            left_alone.append(target)
+    if not rolled_back:
+        rolled_back.append(
+            EngineTarget(ENGINE, ENGINE, config_file_path_name, backup_folder)
+        )
+    return rolled_back, left_alone
+
+
+def rollback_targets(
+    version,
+    config_file_path_name=CONFIG_FILE_PATH_NAME,
+    backup_folder=BACKUP_FOLDER,
+    verify=True,
+    timeout=30.0,
+    cancelled=None,
+    progress=None,
+):
+    """Rolls the live config file back to a version of the backup store and
+    reloads every engine target reading it.
+
+    Targets with a config file of their own are not touched, as their backups
+    are kept in their own store and do not match the versions of this one.
+
+    Parameters:
+        version (str or dict): Name, hash or index entry of the version.
+        config_file_path_name (str): Path to the main configuration file.
+        backup_folder (str): Path to the backup folder.
+        verify (bool): Checks the engines are using the restored values.
+        timeout (float): Seconds to wait for every engine to pick them up.
+        cancelled (threading.Event): Optional event that stops checking the
+        engines as soon as it is set.
+        progress (function): Optional callback receiving a message about
+        every step, the messages are printed if None.
+
+    Returns:
+        outcome (tuple): The values every rolled back engine did not match,
+        keyed by target name, and the EngineTarget objects left alone.
+    """
+
+    report = _reporter(progress)
+    rolled_back, left_alone = split_targets(config_file_path_name, backup_folder)
+    for target in left_alone:
+        report(
+            f"{target.name} has its own config file "
+            f"({target.config_file_path_name}) and is not rolled back."
+        )
+
+    expected = _restore(version, config_file_path_name, backup_folder, report)
+    mismatches = {}
+    for target in rolled_back:
+        if cancelled is not None and cancelled.is_set():
+            break
+        mismatches[target.name] = _reload_and_check(
+            expected,
+            target.limits_url,
+            target.reload_url,
+            verify,
+            timeout,
+            cancelled,
+            report,
+            engine=target.name,
+        )
+    return mismatches, left_alone
+
+
+def main(argv=None):
+    """Command line entry point of the rollback tool.
+
+    Parameters:
+        argv (list): Command line arguments, sys.argv by default.
+
+    Returns:
+        exit_code (int): 0 if every engine target was rolled back and
+        verified, 1 otherwise.
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Roll the Tractor limits config back to a backup."
+    )
+    parser.add_argument(
+        "version", nargs="?", help="Name or hash of the backup, latest by default."
+    )
+    parser.add_argument("--list", action="store_true", help="List the backups.")
+    parser.add_argument("--config", default=CONFIG_FILE_PATH_NAME)
+    parser.add_argument("--backup-folder", default=BACKUP_FOLDER)
+    parser.add_argument(
+        "--url",
+        help="Limits page of the only engine to reload and check, every engine "
+        "target reading the config file by default.",
+    )
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--no-verify", action="store_true")
+    args = parser.parse_args(argv)
+
+    store = BackupStore(args.backup_folder)
+    versions = store.list_versions()
+
+    if args.list:
+        for entry in versions:
+            print(f"{entry['name']}  {entry['object'][:12]}  {entry['created']}")
+        return 0
+
+    if not versions:
+        print("There are no backups to roll back to.")
+        return 1
+
+    version = args.version or versions[-1]
+    try:
+        if args.url:
+            mismatches = rollback(
+                version,
+                args.config,
+                args.backup_folder,
+                verify=not args.no_verify,
+                timeout=args.timeout,
+                url=args.url,
+            )
+            return 1 if mismatches else 0
+
+        mismatches, left_alone = rollback_targets(
+            version,
+            args.config,
+            args.backup_folder,
+            verify=not args.no_verify,
+            timeout=args.timeout,
+        )
+    except BackupNotFound as error:
+        print(error)
+        return 1
+
+    if left_alone:
+        print(
+            "Not rolled back, roll them back from their own backup folder: "
+            + ", ".join(target.name for target in left_alone)
+        )
+    return 1 if left_alone or any(mismatches.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
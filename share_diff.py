@@ -0,0 +1,158 @@
+#!/usr/bin/python3
+
+"""
+- Diff engine of the Farm UI.
+- Compares two snapshots of the share values of every section (the config
+file and the staged changes, two backed up versions...) in a single pass
+over them, and returns only what changed: values that moved, and values of
+shows added to or removed from a section, each with its absolute and
+relative delta.
+- The changes are rendered as one plain text document, so showing thousands
+of them costs a single update of a text browser.
+- Please only adjust values if totally sure of what you are doing!
+
+Written in Python3.
+"""
+
+from allocation_model import PERCENT_DECIMALS
+
+# Share values are written to the config file with three decimals
+SHARE_DECIMALS = 3
+
+# Name of every field in the UI
+FIELD_NAMES = {"nominal": "Nominal", "cap": "Hard Cap"}
+
+
+class ShareChange:
+    """A share value that differs between two snapshots.
+
+    Attributes:
+        section (str): Name of the farm section.
+        show (str): Name of the show.
+        field (str): Either 'nominal' or 'cap'.
+        old (float): Value (0 to 1) in the first snapshot, None if added.
+        new (float): Value (0 to 1) in the second snapshot, None if removed.
+    """
+
+    __slots__ = ("section", "show", "field", "old", "new")
+
+    def __init__(self, section, show, field, old, new):
+        self.section = section
+        self.show = show
+        self.field = field
+        self.old = old
+        self.new = new
+
+    @property
+    def key(self):
+        """The (section, show, field) key of the value."""
+        return (self.section, self.show, self.field)
+
+    @property
+    def kind(self):
+        """Either 'added', 'removed' or 'changed'."""
+        if self.old is None:
+            return "added"
+        if self.new is None:
+            return "removed"
+        return "changed"
+
+    @property
+    def delta(self):
+        """Change in percentage points, None if the value was added or removed."""
+        if self.old is None or self.new is None:
+            return None
+        return round((self.new - self.old) * 100, PERCENT_DECIMALS)
+
+    @property
+    def relative(self):
+        """Change relative to the old value (0.25 is 25% more), None if there
+        was no old value to compare with."""
+        if not self.old or self.new is None:
+            return None
+        return (self.new - self.old) / self.old
+
+    def __repr__(self):
+        return (
+            f"ShareChange({self.section!r}, {self.show!r}, {self.field!r}, "
+            f"{self.old}, {self.new})"
+        )
+
+
+def diff_share_values(base, new):
+    """Compares two snapshots of share values.
+
+    Parameters:
+        base (dict): Share values (0 to 1) keyed by (section, show, field),
+        as returned by StagingOverlay.snapshots() or tractor_engine.share_values().
+        new (dict): Share values of the other snapshot, keyed the same way.
+
+    Returns:
+        changes (list): ShareChange objects of the values that differ, were
+        added or were removed, sorted by key.
+    """
+
+    changes = []
+    for key, old in base.items():
+        value = new.get(key)
+        if value is None:
+            changes.append(ShareChange(*key, old, None))
+        elif round(value, SHARE_DECIMALS) != round(old, SHARE_DECIMALS):
+            changes.append(ShareChange(*key, old, value))
+    for key, value in new.items():
+        if key not in base:
+            changes.append(ShareChange(*key, None, value))
+
+    changes.sort(key=lambda change: change.key)
+    return changes
+
+
+def format_percent(value):
+    """Formats a share value (0 to 1) as a percentage, e.g. '20.5%'."""
+    return f"{round(value * 100, PERCENT_DECIMALS)}%"
+
+
+def format_change(change):
+    """Describes a single change in one line.
+
+    Parameters:
+        change (ShareChange): The change.
+
+    Returns:
+        line (str): e.g. 'ABC Nominal: 20.0% -> 25.0% (+5.0, +25%)'.
+    """
+
+    name = f"{change.show} {FIELD_NAMES.get(change.field, change.field)}"
+
+    if change.old is None:
+        return f"{name}: added at {format_percent(change.new)}"
+    if change.new is None:
+        return f"{name}: removed (was {format_percent(change.old)})"
+
+    relative = change.relative
+    relative = "from 0" if relative is None else f"{relative:+.0%}"
+    return (
+        f"{name}: {format_percent(change.old)} -> {format_percent(change.new)} "
+        f"({change.delta:+.{PERCENT_DECIMALS}f}, {relative})"
+    )
+
+
+def format_changes(changes):
+    """Renders changes as one plain text document, grouped by section.
+
+    Parameters:
+        changes (list): ShareChange objects sorted by key, as returned by
+        diff_share_values().
+
+    Returns:
+        text (str): One line per section followed by one line per change.
+    """
+
+    lines = []
+    previous_section = None
+    for change in changes:
+        if change.section != previous_section:
+            lines.append(f"{change.section}:")
+            previous_section = change.section
+        lines.append(f"    {format_change(change)}")
+    return "\n".join(lines) or "No changes"
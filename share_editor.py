@@ -0,0 +1,807 @@
+#!/usr/bin/python3
+
+"""
+- Share editor of the Farm UI, used by both farm windows.
+- Every show of a farm section is a row of a table backed by the section's
+SectionAllocations: its name, a slider and a spin box for the nominal
+percentage, and a spin box for the hard cap. Sliders are only painted, and
+the spin boxes are only created for the cell being edited, so opening a
+section with hundreds of shows costs about the same as opening one with ten;
+the table only draws the rows on screen and scrolls instead of growing the
+window.
+- Please only adjust values if totally sure of what you are doing!
+
+Written in Python3.
+"""
+
+from qtpy import QtCore, QtWidgets
+
+from allocation_model import PERCENT_DECIMALS, round_to_total
+
+# Columns of the table
+SHOW_COLUMN = 0
+SLIDER_COLUMN = 1
+NOMINAL_COLUMN = 2
+CAP_COLUMN = 3
+
+# Range of every slider and spin box
+MINIMUM_PERCENT = 0
+MAXIMUM_PERCENT = 100
+
+# Height of every row, in pixels
+ROW_HEIGHT = 30
+
+# Percentages are added up as whole steps of the spin boxes (tenths), so the
+# running total never drifts however many times a value changes
+PERCENT_STEPS = 10**PERCENT_DECIMALS
+
+
+class ShareTableModel(QtCore.QAbstractTableModel):
+    """Table model of the nominal and hard cap percentages of a farm section.
+
+    Edits are written straight into a copy of the SectionAllocations it was
+    built from, which can be taken back with allocations().
+
+    Parameters:
+        allocations (SectionAllocations): Percentages to start from.
+        show_label (function): Optional function turning a show name into the
+        text shown for it.
+        show_font (QFont): Optional font of the show names.
+
+    Attributes:
+        rebalance (bool): True to keep the total at 100 while editing: every
+        change of a nominal value is taken from (or given to) the shows that
+        are not pinned, in proportion to their values.
+
+    Signals:
+        totalChanged (float): New sum of every nominal percentage, only
+        emitted when it actually changes.
+
+    Methods:
+        allocations(): Returns a copy of the edited percentages.
+        total(): Returns the sum of every nominal percentage.
+        normalize(rows): Scales nominal values so the total is 100.
+        scale(factor, rows): Multiplies nominal values by a factor.
+        set_values(value, field, rows): Sets values to the same percentage.
+        reset(base, rows): Puts back the values of another model.
+        copy_nominal_to_cap(rows): Sets hard caps to the nominal values.
+        pinned_rows(): Returns the rows of the pinned shows.
+
+    Every bulk operation works on the given rows, or every row if None, and
+    updates the view and the total once however many rows it changes.
+    """
+
+    totalChanged = QtCore.Signal(float)
+
+    def __init__(self, allocations, show_label=None, show_font=None, parent=None):
+        super().__init__(parent)
+
+        self._allocations = allocations.copy()
+        self._show_font = show_font
+        # Kept up to date from the change of every edit instead of adding up
+        # every show again
+        self._total_steps = sum(
+            round(value * PERCENT_STEPS) for value in self._allocations.nominal
+        )
+        self._labels = [
+            show if show_label is None else show_label(show)
+            for show in allocations.shows
+        ]
+
+        self.rebalance = False
+        self._pinned = bytearray(len(self._allocations))
+        # Row being rebalanced, the rows sharing its changes and their values
+        # when it started, so the proportions hold for a whole slider drag
+        self._rebalance_anchor = None
+
+    def allocations(self):
+        """Returns a copy of the edited percentages.
+
+        Returns:
+            allocations (SectionAllocations): The edited model.
+        """
+
+        return self._allocations.copy()
+
+    def total(self):
+        """Returns the sum of every nominal percentage."""
+        return self._total_steps / PERCENT_STEPS
+
+    def pinned_rows(self):
+        """Returns the rows of the pinned shows."""
+        return [row for row, pinned in enumerate(self._pinned) if pinned]
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._allocations)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return 4
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+
+        row = index.row()
+        column = index.column()
+
+        if role in (
+            QtCore.Qt.ItemDataRole.DisplayRole,
+            QtCore.Qt.ItemDataRole.EditRole,
+        ):
+            if column == SHOW_COLUMN:
+                return self._labels[row]
+            if column == CAP_COLUMN:
+                return self._allocations.cap[row]
+            return self._allocations.nominal[row]
+
+        if column == SHOW_COLUMN:
+            if role == QtCore.Qt.ItemDataRole.ToolTipRole:
+                return (
+                    f"{self._allocations.shows[row]} (tick to pin it while the "
+                    "total is kept at 100)"
+                )
+            if role == QtCore.Qt.ItemDataRole.FontRole:
+                return self._show_font
+            if role == QtCore.Qt.ItemDataRole.CheckStateRole:
+                if self._pinned[row]:
+                    return QtCore.Qt.CheckState.Checked
+                return QtCore.Qt.CheckState.Unchecked
+
+        if role == QtCore.Qt.ItemDataRole.TextAlignmentRole and column in (
+            NOMINAL_COLUMN,
+            CAP_COLUMN,
+        ):
+            return int(QtCore.Qt.AlignmentFlag.AlignCenter)
+
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.ItemDataRole.EditRole):
+        if (
+            index.isValid()
+            and index.column() == SHOW_COLUMN
+            and role == QtCore.Qt.ItemDataRole.CheckStateRole
+        ):
+            checked = QtCore.Qt.CheckState.Checked
+            self._pinned[index.row()] = getattr(value, "value", value) == getattr(
+                checked, "value", checked
+            )
+            self._rebalance_anchor = None
+            self.dataChanged.emit(index, index)
+            return True
+
+        if (
+            not index.isValid()
+            or role != QtCore.Qt.ItemDataRole.EditRole
+            or index.column() == SHOW_COLUMN
+        ):
+            return False
+
+        row = index.row()
+        value = round(
+            min(max(float(value), MINIMUM_PERCENT), MAXIMUM_PERCENT), PERCENT_DECIMALS
+        )
+
+        if index.column() == CAP_COLUMN:
+            if self._allocations.cap[row] == value:
+                return False
+            self._allocations.cap[row] = value
+            self.dataChanged.emit(index, index)
+            return True
+
+        if self.rebalance:
+            return self._rebalance(row, value) > 0
+
+        self._rebalance_anchor = None
+        old_value = self._allocations.nominal[row]
+        if old_value == value:
+            return False
+        self._allocations.nominal[row] = value
+        self._total_steps += round(value * PERCENT_STEPS) - round(
+            old_value * PERCENT_STEPS
+        )
+        # The slider and the spin box of the nominal show the same value
+        self.dataChanged.emit(
+            self.index(row, SLIDER_COLUMN), self.index(row, NOMINAL_COLUMN)
+        )
+        self.totalChanged.emit(self.total())
+        return True
+
+    def _rebalance(self, row, value):
+        """Sets the nominal value of a row and splits what is left up to 100
+        between the shows that are not pinned, in proportion to the values
+        they had when this row started being edited.
+
+        Parameters:
+            row (int): The row being edited.
+            value (float): Its new nominal percentage.
+
+        Returns:
+            changed (int): Amount of values that changed.
+        """
+
+        nominal = self._allocations.nominal
+        anchor = self._rebalance_anchor
+        if anchor is None or anchor[0] != row:
+            free_rows = [
+                other
+                for other in range(len(nominal))
+                if other != row and not self._pinned[other]
+            ]
+            anchor = (row, free_rows, [nominal[other] for other in free_rows])
+
+        _row, free_rows, weights = anchor
+        pinned_steps = sum(
+            round(nominal[other] * PERCENT_STEPS)
+            for other in self.pinned_rows()
+            if other != row
+        )
+        # What this row can take, the pinned shows are never touched
+        limit = MAXIMUM_PERCENT - pinned_steps / PERCENT_STEPS
+        value = min(value, limit) if free_rows else limit
+
+        values = {row: value}
+        values.update(zip(free_rows, round_to_total(weights, limit - value)))
+        changed = self._bulk_update(nominal=values)
+        self._rebalance_anchor = anchor
+        return changed
+
+    def _rows(self, rows):
+        if rows is None:
+            return range(len(self._allocations))
+        return sorted(set(rows))
+
+    def _bulk_update(self, nominal=None, cap=None):
+        """Writes new values of many rows and notifies the view a single time.
+
+        Parameters:
+            nominal (dict): New nominal percentages keyed by row.
+            cap (dict): New hard cap percentages keyed by row.
+
+        Returns:
+            changed (int): Amount of values that actually changed.
+        """
+
+        changed_rows = []
+        changed_columns = []
+        for field, column, values in (
+            ("nominal", NOMINAL_COLUMN, nominal),
+            ("cap", CAP_COLUMN, cap),
+        ):
+            if not values:
+                continue
+            array_values = getattr(self._allocations, field)
+            rows = []
+            for row, value in values.items():
+                value = round(
+                    min(max(float(value), MINIMUM_PERCENT), MAXIMUM_PERCENT),
+                    PERCENT_DECIMALS,
+                )
+                if array_values[row] != value:
+                    array_values[row] = value
+                    rows.append(row)
+            if rows:
+                changed_rows.extend(rows)
+                changed_columns.append(column)
+
+        self._rebalance_anchor = None
+        if not changed_rows:
+            return 0
+
+        self.dataChanged.emit(
+            self.index(min(changed_rows), SLIDER_COLUMN),
+            self.index(max(changed_rows), max(changed_columns)),
+        )
+        if NOMINAL_COLUMN in changed_columns:
+            self._total_steps = sum(
+                round(value * PERCENT_STEPS) for value in self._allocations.nominal
+            )
+            self.totalChanged.emit(self.total())
+        return len(changed_rows)
+
+    def normalize(self, rows=None):
+        """Scales the nominal values of some rows proportionally so the total
+        of every row is exactly 100.
+
+        Parameters:
+            rows (iterable): Rows to scale, every row if None.
+
+        Returns:
+            changed (int): Amount of values that changed.
+        """
+
+        rows = self._rows(rows)
+        nominal = self._allocations.nominal
+        others = self._total_steps - sum(
+            round(nominal[row] * PERCENT_STEPS) for row in rows
+        )
+        remaining = MAXIMUM_PERCENT - others / PERCENT_STEPS
+        if remaining < 0:
+            raise ValueError("The other shows already add up to more than 100")
+
+        values = round_to_total([nominal[row] for row in rows], remaining)
+        return self._bulk_update(nominal=dict(zip(rows, values)))
+
+    def scale(self, factor, rows=None):
+        """Multiplies the nominal values of some rows by a factor.
+
+        Parameters:
+            factor (float): The factor, e.g. 0.5 to halve every value.
+            rows (iterable): Rows to scale, every row if None.
+
+        Returns:
+            changed (int): Amount of values that changed.
+        """
+
+        nominal = self._allocations.nominal
+        return self._bulk_update(
+            nominal={row: nominal[row] * factor for row in self._rows(rows)}
+        )
+
+    def set_values(self, value, field="nominal", rows=None):
+        """Sets the nominal or hard cap of some rows to the same percentage.
+
+        Parameters:
+            value (float): The percentage.
+            field (str): Either 'nominal' or 'cap'.
+            rows (iterable): Rows to change, every row if None.
+
+        Returns:
+            changed (int): Amount of values that changed.
+        """
+
+        return self._bulk_update(**{field: dict.fromkeys(self._rows(rows), value)})
+
+    def reset(self, base, rows=None):
+        """Puts back the nominal and hard cap values of another model of the
+        same shows, e.g. the ones live in the config file.
+
+        Parameters:
+            base (SectionAllocations): The model to take the values from.
+            rows (iterable): Rows to reset, every row if None.
+
+        Returns:
+            changed (int): Amount of values that changed.
+        """
+
+        if base.shows != self._allocations.shows:
+            raise ValueError("Both models need the same shows to be reset")
+
+        rows = self._rows(rows)
+        return self._bulk_update(
+            nominal={row: base.nominal[row] for row in rows},
+            cap={row: base.cap[row] for row in rows},
+        )
+
+    def copy_nominal_to_cap(self, rows=None):
+        """Sets the hard cap of some rows to their nominal value.
+
+        Parameters:
+            rows (iterable): Rows to change, every row if None.
+
+        Returns:
+            changed (int): Amount of values that changed.
+        """
+
+        nominal = self._allocations.nominal
+        return self._bulk_update(cap={row: nominal[row] for row in self._rows(rows)})
+
+    def flags(self, index):
+        if not index.isValid():
+            return QtCore.Qt.ItemFlag.NoItemFlags
+        flags = QtCore.Qt.ItemFlag.ItemIsEnabled | QtCore.Qt.ItemFlag.ItemIsSelectable
+        if index.column() in (NOMINAL_COLUMN, CAP_COLUMN):
+            flags |= QtCore.Qt.ItemFlag.ItemIsEditable
+        elif index.column() == SHOW_COLUMN:
+            flags |= QtCore.Qt.ItemFlag.ItemIsUserCheckable
+        return flags
+
+
+class SliderDelegate(QtWidgets.QStyledItemDelegate):
+    """Paints the nominal percentage of a row as a horizontal slider. No
+    widget is created for it: dragging is handled by the ShareEditor.
+
+    Methods:
+        value_at(rect, x, widget): Returns the value under a position.
+    """
+
+    def _style_option(self, rect, value, widget):
+        option = QtWidgets.QStyleOptionSlider()
+        option.initFrom(widget)
+        option.rect = rect.adjusted(4, 0, -4, 0)
+        option.orientation = QtCore.Qt.Orientation.Horizontal
+        option.minimum = MINIMUM_PERCENT
+        option.maximum = MAXIMUM_PERCENT
+        option.sliderPosition = int(round(value))
+        option.sliderValue = int(round(value))
+        option.subControls = (
+            QtWidgets.QStyle.SubControl.SC_SliderGroove
+            | QtWidgets.QStyle.SubControl.SC_SliderHandle
+        )
+        return option
+
+    def paint(self, painter, option, index):
+        widget = option.widget
+        # Background first, so selected shows are highlighted here too
+        if option.state & QtWidgets.QStyle.StateFlag.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        slider_option = self._style_option(
+            option.rect, index.data(QtCore.Qt.ItemDataRole.EditRole), widget
+        )
+        # Drawn without the widget, so the style sheet of the window does not
+        # paint its background over the cell
+        widget.style().drawComplexControl(
+            QtWidgets.QStyle.ComplexControl.CC_Slider, slider_option, painter, None
+        )
+
+    def value_at(self, rect, x, widget):
+        """Returns the slider value under a horizontal position.
+
+        Parameters:
+            rect (QRect): Rectangle of the cell.
+            x (int): Horizontal position, in the same coordinates as 'rect'.
+            widget (QWidget): Widget the slider is painted on.
+
+        Returns:
+            value (int): The value, between the minimum and maximum.
+        """
+
+        style = widget.style()
+        slider_option = self._style_option(rect, MINIMUM_PERCENT, widget)
+        groove = style.subControlRect(
+            QtWidgets.QStyle.ComplexControl.CC_Slider,
+            slider_option,
+            QtWidgets.QStyle.SubControl.SC_SliderGroove,
+            None,
+        )
+        handle = style.subControlRect(
+            QtWidgets.QStyle.ComplexControl.CC_Slider,
+            slider_option,
+            QtWidgets.QStyle.SubControl.SC_SliderHandle,
+            None,
+        )
+        span = max(groove.width() - handle.width(), 1)
+        return QtWidgets.QStyle.sliderValueFromPosition(
+            MINIMUM_PERCENT,
+            MAXIMUM_PERCENT,
+            x - groove.x() - handle.width() // 2,
+            span,
+        )
+
+    def sizeHint(self, option, index):
+        return QtCore.QSize(100, ROW_HEIGHT)
+
+
+class PercentDelegate(QtWidgets.QStyledItemDelegate):
+    """Shows a percentage as text and edits it with a spin box, created only
+    for the cell being edited. Every change is written to the model as it is
+    typed, like the spin boxes of the farm windows used to."""
+
+    def displayText(self, value, locale):
+        return f"{value:.{PERCENT_DECIMALS}f}"
+
+    def createEditor(self, parent, option, index):
+        editor = QtWidgets.QDoubleSpinBox(parent)
+        editor.setDecimals(PERCENT_DECIMALS)
+        editor.setMinimum(MINIMUM_PERCENT)
+        editor.setMaximum(MAXIMUM_PERCENT)
+        editor.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
+        editor.setFont(option.font)
+        editor.valueChanged.connect(lambda _value: self.commitData.emit(editor))
+        return editor
+
+    def setEditorData(self, editor, index):
+        value = index.data(QtCore.Qt.ItemDataRole.EditRole)
+        # Left alone while its own value is being written back, so the text
+        # being typed is not reformatted under the cursor
+        if editor.value() != value:
+            editor.blockSignals(True)
+            editor.setValue(value)
+            editor.blockSignals(False)
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.value(), QtCore.Qt.ItemDataRole.EditRole)
+
+
+class ShareTotalBox(QtWidgets.QDoubleSpinBox):
+    """Read-only spin box showing the total of every nominal percentage, green
+    when it is 100 and red otherwise.
+
+    The colour comes from a 'totalState' property matched by a style sheet set
+    once, so a new total only repaints the number and the box is only restyled
+    when the total goes from right to wrong or back.
+
+    Methods:
+        set_total(total): Shows a new total.
+    """
+
+    def __init__(self, parent, font, total):
+        super().__init__(parent)
+
+        self.setFont(font)
+        self.setDecimals(0)
+        self.setDisabled(True)
+        self.setButtonSymbols(QtWidgets.QAbstractSpinBox.ButtonSymbols.NoButtons)
+        self.setMaximum(2000)
+        self.setStyleSheet(
+            'QDoubleSpinBox[totalState="right"] { color: green; }'
+            'QDoubleSpinBox[totalState="wrong"] { color: red; }'
+        )
+        self.set_total(total)
+
+    def set_total(self, total):
+        """Shows a new total, restyling the box only if its state changed.
+
+        Parameters:
+            total (float): Sum of every nominal percentage.
+
+        Returns:
+            None
+        """
+
+        self.setValue(total)
+        state = "right" if total == 100 else "wrong"
+        if self.property("totalState") != state:
+            self.setProperty("totalState", state)
+            self.style().unpolish(self)
+            self.style().polish(self)
+
+
+class ShareEditor(QtWidgets.QTableView):
+    """Table of the shows of a farm section with a slider and spin boxes each.
+
+    Parameters:
+        allocations (SectionAllocations): Percentages to start from.
+        parent (QWidget): Widget to create the table in.
+        font (QFont): Font of the table.
+        show_font (QFont): Font of the show names.
+        show_label (function): Optional function turning a show name into the
+        text shown for it.
+        show_column_width (int): Width of the column with the show names.
+
+    Methods:
+        share_model(): Returns the ShareTableModel being edited.
+        selected_rows(): Returns the rows of the selected shows.
+        height_for_rows(rows): Returns the height showing that many rows.
+    """
+
+    def __init__(
+        self,
+        allocations,
+        parent,
+        font,
+        show_font=None,
+        show_label=None,
+        show_column_width=80,
+    ):
+        super().__init__(parent)
+
+        self.setModel(ShareTableModel(allocations, show_label, show_font, self))
+        self.setFont(font)
+
+        self._slider_delegate = SliderDelegate(self)
+        self._percent_delegate = PercentDelegate(self)
+        self.setItemDelegateForColumn(SLIDER_COLUMN, self._slider_delegate)
+        self.setItemDelegateForColumn(NOMINAL_COLUMN, self._percent_delegate)
+        self.setItemDelegateForColumn(CAP_COLUMN, self._percent_delegate)
+
+        self.setEditTriggers(
+            QtWidgets.QAbstractItemView.EditTrigger.CurrentChanged
+            | QtWidgets.QAbstractItemView.EditTrigger.SelectedClicked
+            | QtWidgets.QAbstractItemView.EditTrigger.DoubleClicked
+            | QtWidgets.QAbstractItemView.EditTrigger.AnyKeyPressed
+        )
+        # Shows are selected by clicking their names, for the bulk operations
+        self.setSelectionMode(
+            QtWidgets.QAbstractItemView.SelectionMode.ExtendedSelection
+        )
+        self.setSelectionBehavior(
+            QtWidgets.QAbstractItemView.SelectionBehavior.SelectRows
+        )
+        self.setVerticalScrollMode(
+            QtWidgets.QAbstractItemView.ScrollMode.ScrollPerPixel
+        )
+        self.setShowGrid(False)
+        self.setWordWrap(False)
+        self.horizontalHeader().hide()
+        self.verticalHeader().hide()
+
+        # Every row has the same height, so the view never measures them
+        self.verticalHeader().setSectionResizeMode(
+            QtWidgets.QHeaderView.ResizeMode.Fixed
+        )
+        self.verticalHeader().setDefaultSectionSize(ROW_HEIGHT)
+        self.horizontalHeader().setSectionResizeMode(
+            QtWidgets.QHeaderView.ResizeMode.Fixed
+        )
+        self.horizontalHeader().setSectionResizeMode(
+            SLIDER_COLUMN, QtWidgets.QHeaderView.ResizeMode.Stretch
+        )
+        self.setColumnWidth(SHOW_COLUMN, show_column_width)
+        self.setColumnWidth(NOMINAL_COLUMN, 66)
+        self.setColumnWidth(CAP_COLUMN, 66)
+
+        self._dragged_row = None
+
+    def share_model(self):
+        """Returns the ShareTableModel being edited."""
+        return self.model()
+
+    def selected_rows(self):
+        """Returns the rows of the selected shows, None if there are none so
+        the bulk operations of the model work on every show."""
+        rows = [index.row() for index in self.selectionModel().selectedRows()]
+        return rows or None
+
+    def selectionCommand(self, index, event=None):
+        # Only clicking a show name changes the selection, editing a value
+        # leaves it alone
+        if index.isValid() and index.column() != SHOW_COLUMN:
+            return QtCore.QItemSelectionModel.SelectionFlag.NoUpdate
+        return super().selectionCommand(index, event)
+
+    def height_for_rows(self, rows):
+        """Returns the height the table needs to show a number of rows.
+
+        Parameters:
+            rows (int): Amount of rows.
+
+        Returns:
+            height (int): The height in pixels.
+        """
+
+        return rows * ROW_HEIGHT + 2 * self.frameWidth()
+
+    def _drag_to(self, row, x):
+        index = self.model().index(row, SLIDER_COLUMN)
+        value = self._slider_delegate.value_at(self.visualRect(index), x, self)
+        self.model().setData(index, value, QtCore.Qt.ItemDataRole.EditRole)
+
+    def mousePressEvent(self, event):
+        position = event.pos()
+        index = self.indexAt(position)
+        if (
+            event.button() == QtCore.Qt.MouseButton.LeftButton
+            and index.isValid()
+            and index.column() == SLIDER_COLUMN
+        ):
+            # Sliders are dragged without ever opening an editor
+            self.selectionModel().setCurrentIndex(
+                index, QtCore.QItemSelectionModel.SelectionFlag.NoUpdate
+            )
+            self._dragged_row = index.row()
+            self._drag_to(self._dragged_row, position.x())
+            return
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if self._dragged_row is not None:
+            self._drag_to(self._dragged_row, event.pos().x())
+            return
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if self._dragged_row is not None:
+            self._dragged_row = None
+            return
+        super().mouseReleaseEvent(event)
+
+    def keyPressEvent(self, event):
+        index = self.currentIndex()
+        steps = {
+            QtCore.Qt.Key.Key_Left: -1,
+            QtCore.Qt.Key.Key_Right: 1,
+            QtCore.Qt.Key.Key_PageDown: -10,
+            QtCore.Qt.Key.Key_PageUp: 10,
+        }
+        if index.isValid() and index.column() == SLIDER_COLUMN and event.key() in steps:
+            value = index.data(QtCore.Qt.ItemDataRole.EditRole)
+            self.model().setData(index, value + steps[event.key()])
+            return
+        super().keyPressEvent(event)
+
+
+class ShareBulkPanel(QtWidgets.QWidget):
+    """Buttons running the bulk operations of a share editor on the selected
+    shows, or on every show if none is selected, and the switch keeping the
+    total at 100 while editing.
+
+    Parameters:
+        editor (ShareEditor): The share editor.
+        live_allocations (SectionAllocations): Values of the config file, put
+        back by 'Reset'.
+        parent (QWidget): Widget to create the buttons in.
+        font (QFont): Font of the buttons.
+    """
+
+    def __init__(self, editor, live_allocations, parent, font):
+        super().__init__(parent)
+
+        self.editor = editor
+        self.live_allocations = live_allocations
+
+        layout = QtWidgets.QGridLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(4)
+
+        # Text, tooltip and handler of every button, in reading order
+        buttons = (
+            ("Normalize", "Scale the nominal values to add up to 100", self.normalize),
+            ("Scale...", "Multiply the nominal values by a factor", self.scale),
+            ("Reset", "Put back the values of the config file", self.reset),
+            ("Nominal...", "Set the nominal values", self.set_nominal),
+            ("Cap...", "Set the hard cap values", self.set_cap),
+            ("Nom > Cap", "Copy the nominal values to the hard caps", self.copy),
+        )
+        for position, (text, tooltip, handler) in enumerate(buttons):
+            button = QtWidgets.QPushButton(text, self)
+            button.setFont(font)
+            button.setToolTip(
+                f"{tooltip}, of the selected shows or of all of them if none "
+                "is selected."
+            )
+            button.clicked.connect(handler)
+            layout.addWidget(button, position // 3, position % 3)
+
+        self.keep_total_check_box = QtWidgets.QCheckBox("Keep total at 100", self)
+        self.keep_total_check_box.setFont(font)
+        self.keep_total_check_box.setToolTip(
+            "Take every change from the other shows, in proportion to their "
+            "values, so the total stays the same. Tick a show name to pin it."
+        )
+        self.keep_total_check_box.toggled.connect(self.keep_total)
+        layout.addWidget(self.keep_total_check_box, 2, 0, 1, 3)
+
+    def _run(self, operation, *args):
+        try:
+            operation(*args, rows=self.editor.selected_rows())
+        except ValueError as error:
+            QtWidgets.QMessageBox.warning(self, "Share Editor", str(error))
+
+    def keep_total(self, checked):
+        """Turns the proportional rebalancing of the other shows on or off."""
+        self.editor.share_model().rebalance = checked
+
+    def normalize(self):
+        """Scales the nominal values so the total is 100."""
+        self._run(self.editor.share_model().normalize)
+
+    def scale(self):
+        """Asks for a factor and multiplies the nominal values by it."""
+        factor, accepted = QtWidgets.QInputDialog.getDouble(
+            self, "Scale", "Multiply the nominal values by:", 1.0, 0.0, 100.0, 3
+        )
+        if accepted:
+            self._run(self.editor.share_model().scale, factor)
+
+    def reset(self):
+        """Puts back the values of the config file."""
+        self._run(self.editor.share_model().reset, self.live_allocations)
+
+    def _set(self, field, label):
+        value, accepted = QtWidgets.QInputDialog.getDouble(
+            self,
+            "Set",
+            f"New {label} percentage:",
+            0.0,
+            MINIMUM_PERCENT,
+            MAXIMUM_PERCENT,
+            PERCENT_DECIMALS,
+        )
+        if accepted:
+            self._run(self.editor.share_model().set_values, value, field)
+
+    def set_nominal(self):
+        """Asks for a percentage and sets the nominal values to it."""
+        self._set("nominal", "nominal")
+
+    def set_cap(self):
+        """Asks for a percentage and sets the hard cap values to it."""
+        self._set("cap", "hard cap")
+
+    def copy(self):
+        """Sets the hard caps to the nominal values."""
+        self._run(self.editor.share_model().copy_nominal_to_cap)
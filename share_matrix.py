@@ -0,0 +1,542 @@
+#!/usr/bin/python3
+
+"""
+- Share matrix of the Farm UI, used by the All Linux Sections window.
+- Every farm section is a column and every show a row, backed by the
+SectionAllocations of each section, so the values of all sections can be
+edited side by side. Each column header shows the total of its section,
+kept as whole spin box steps and only recomputed for the columns an edit
+touches.
+- Edits work on single cells, whole rows or columns, or any block of
+selected cells, and each one updates the table with a single signal however
+many cells it changes.
+- Please only adjust values if totally sure of what you are doing!
+
+Written in Python3.
+"""
+
+from qtpy import QtCore, QtGui, QtWidgets
+
+from allocation_model import PERCENT_DECIMALS
+from allocation_solver import ShareConstraint, solve_sections
+from share_editor import (
+    MAXIMUM_PERCENT,
+    MINIMUM_PERCENT,
+    PERCENT_STEPS,
+    PercentDelegate,
+)
+
+# Fields a matrix can show, with the name used in the UI
+FIELDS = {"nominal": "Nominal", "cap": "Hard Cap"}
+
+# Size of every cell, in pixels
+CELL_WIDTH = 72
+ROW_HEIGHT = 26
+
+
+class ShareMatrixModel(QtCore.QAbstractTableModel):
+    """Table model of one field (nominal or hard cap) of many farm sections.
+
+    Shows missing from a section have an empty cell that cannot be edited.
+
+    Parameters:
+        sections (list): SectionAllocations of every section, the model works
+        on copies of them.
+        section_label (function): Optional function turning a section name
+        into its column title.
+
+    Attributes:
+        field (str): Field shown, either 'nominal' or 'cap'.
+
+    Methods:
+        allocations(): Returns copies of the edited SectionAllocations.
+        total(column): Returns the nominal total of a section.
+        set_field(field): Shows the nominal or the hard cap values.
+        cells(): Lists every cell holding a value.
+        set_values(value, cells): Sets cells to a percentage.
+        scale(factor, cells): Multiplies cells by a factor.
+        fill_right(cells): Copies the leftmost value of every row to the right.
+        reset(base, cells): Puts back the values of other models.
+        normalize(cells): Scales cells so every section adds up to 100.
+
+    Every bulk operation takes the cells it works on as (row, column) tuples,
+    all the cells holding a value when None, and returns the amount of values
+    it changed.
+    """
+
+    def __init__(self, sections, section_label=None, parent=None):
+        super().__init__(parent)
+
+        self._sections = [allocations.copy() for allocations in sections]
+        self._labels = [
+            (
+                allocations.section
+                if section_label is None
+                else section_label(allocations.section)
+            )
+            for allocations in self._sections
+        ]
+        self.field = "nominal"
+
+        # Every show once, in the order they first appear
+        shows = {}
+        for allocations in self._sections:
+            for show in allocations.shows:
+                shows.setdefault(show, len(shows))
+        self._shows = list(shows)
+
+        # Position of every row inside the arrays of every section, -1 if the
+        # section does not have the show
+        self._positions = [
+            [
+                allocations.position(show) if show in allocations else -1
+                for show in self._shows
+            ]
+            for allocations in self._sections
+        ]
+        self._total_steps = [
+            sum(round(value * PERCENT_STEPS) for value in allocations.nominal)
+            for allocations in self._sections
+        ]
+
+    def allocations(self):
+        """Returns copies of the edited SectionAllocations, in column order."""
+        return [allocations.copy() for allocations in self._sections]
+
+    def total(self, column):
+        """Returns the sum of the nominal percentages of a section."""
+        return self._total_steps[column] / PERCENT_STEPS
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._shows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._sections)
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+
+        row = index.row()
+        column = index.column()
+        position = self._positions[column][row]
+
+        if role in (
+            QtCore.Qt.ItemDataRole.DisplayRole,
+            QtCore.Qt.ItemDataRole.EditRole,
+        ):
+            if position < 0:
+                return None
+            return getattr(self._sections[column], self.field)[position]
+        if role == QtCore.Qt.ItemDataRole.ToolTipRole:
+            return f"{self._shows[row]} in {self._labels[column]}"
+        if role == QtCore.Qt.ItemDataRole.TextAlignmentRole:
+            return int(QtCore.Qt.AlignmentFlag.AlignCenter)
+        return None
+
+    def headerData(self, section, orientation, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if orientation == QtCore.Qt.Orientation.Vertical:
+            if role == QtCore.Qt.ItemDataRole.DisplayRole:
+                return self._shows[section]
+            return None
+
+        if role == QtCore.Qt.ItemDataRole.DisplayRole:
+            return (
+                f"{self._labels[section]}\n{self.total(section):.{PERCENT_DECIMALS}f}"
+            )
+        if role == QtCore.Qt.ItemDataRole.ToolTipRole:
+            return f"{self._sections[section].section}, nominal total"
+        if role == QtCore.Qt.ItemDataRole.ForegroundRole:
+            if self._total_steps[section] == MAXIMUM_PERCENT * PERCENT_STEPS:
+                return QtGui.QBrush(QtGui.QColor("green"))
+            return QtGui.QBrush(QtGui.QColor("red"))
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.ItemDataRole.EditRole):
+        if not index.isValid() or role != QtCore.Qt.ItemDataRole.EditRole:
+            return False
+        return self._bulk_update({(index.row(), index.column()): value}) > 0
+
+    def flags(self, index):
+        if not index.isValid():
+            return QtCore.Qt.ItemFlag.NoItemFlags
+        if self._positions[index.column()][index.row()] < 0:
+            return QtCore.Qt.ItemFlag.NoItemFlags
+        return (
+            QtCore.Qt.ItemFlag.ItemIsEnabled
+            | QtCore.Qt.ItemFlag.ItemIsSelectable
+            | QtCore.Qt.ItemFlag.ItemIsEditable
+        )
+
+    def set_field(self, field):
+        """Shows the nominal or the hard cap values.
+
+        Parameters:
+            field (str): Either 'nominal' or 'cap'.
+
+        Returns:
+            None
+        """
+
+        if field not in FIELDS:
+            raise ValueError(f"Unknown field '{field}'")
+        if field == self.field or not self._shows:
+            self.field = field
+            return
+        self.field = field
+        self.dataChanged.emit(
+            self.index(0, 0),
+            self.index(len(self._shows) - 1, len(self._sections) - 1),
+        )
+
+    def cells(self):
+        """Lists every cell holding a value, as (row, column) tuples."""
+        return [
+            (row, column)
+            for column, positions in enumerate(self._positions)
+            for row, position in enumerate(positions)
+            if position >= 0
+        ]
+
+    def _cells(self, cells):
+        if cells is None:
+            return self.cells()
+        return [
+            (row, column) for row, column in cells if self._positions[column][row] >= 0
+        ]
+
+    def _value(self, row, column):
+        return getattr(self._sections[column], self.field)[self._positions[column][row]]
+
+    def _bulk_update(self, values, field=None):
+        """Writes many values of the matrix and signals them at once.
+
+        Parameters:
+            values (dict): New percentages keyed by (row, column).
+            field (str): Field written, the one shown by default.
+
+        Returns:
+            changed (int): Amount of values that changed.
+        """
+
+        field = self.field if field is None else field
+        changed_cells = []
+        changed_columns = set()
+        for (row, column), value in values.items():
+            position = self._positions[column][row]
+            if position < 0:
+                continue
+            value = round(
+                min(max(value, MINIMUM_PERCENT), MAXIMUM_PERCENT), PERCENT_DECIMALS
+            )
+            array = getattr(self._sections[column], field)
+            if array[position] == value:
+                continue
+            if field == "nominal":
+                self._total_steps[column] += round(
+                    (value - array[position]) * PERCENT_STEPS
+                )
+                changed_columns.add(column)
+            array[position] = value
+            changed_cells.append((row, column))
+
+        if not changed_cells:
+            return 0
+
+        if field == self.field:
+            rows = [row for row, _column in changed_cells]
+            columns = [column for _row, column in changed_cells]
+            self.dataChanged.emit(
+                self.index(min(rows), min(columns)),
+                self.index(max(rows), max(columns)),
+            )
+        if changed_columns:
+            self.headerDataChanged.emit(
+                QtCore.Qt.Orientation.Horizontal,
+                min(changed_columns),
+                max(changed_columns),
+            )
+        return len(changed_cells)
+
+    def set_values(self, value, cells=None):
+        """Sets cells to the same percentage.
+
+        Parameters:
+            value (float): The percentage.
+            cells (list): Cells to change, every cell if None.
+
+        Returns:
+            changed (int): Amount of values that changed.
+        """
+
+        return self._bulk_update({cell: value for cell in self._cells(cells)})
+
+    def scale(self, factor, cells=None):
+        """Multiplies cells by a factor.
+
+        Parameters:
+            factor (float): The factor.
+            cells (list): Cells to change, every cell if None.
+
+        Returns:
+            changed (int): Amount of values that changed.
+        """
+
+        return self._bulk_update(
+            {cell: self._value(*cell) * factor for cell in self._cells(cells)}
+        )
+
+    def fill_right(self, cells=None):
+        """Copies the value of the leftmost cell of every row to the other
+        cells of the row, e.g. the values of one section to other sections.
+
+        Parameters:
+            cells (list): Cells to change, every cell if None.
+
+        Returns:
+            changed (int): Amount of values that changed.
+        """
+
+        cells = self._cells(cells)
+        sources = {}
+        for row, column in cells:
+            if column < sources.get(row, column + 1):
+                sources[row] = column
+        return self._bulk_update(
+            {
+                (row, column): self._value(row, sources[row])
+                for row, column in cells
+                if column != sources[row]
+            }
+        )
+
+    def reset(self, base, cells=None):
+        """Puts back the values of other models of the same sections, both
+        nominal and hard cap.
+
+        Parameters:
+            base (list): SectionAllocations to take the values from, in
+            column order.
+            cells (list): Cells to change, every cell if None.
+
+        Returns:
+            changed (int): Amount of values that changed.
+        """
+
+        cells = self._cells(cells)
+        changed = 0
+        for field in FIELDS:
+            values = {}
+            for row, column in cells:
+                show = self._shows[row]
+                if show in base[column]:
+                    values[(row, column)] = getattr(base[column], field)[
+                        base[column].position(show)
+                    ]
+            changed += self._bulk_update(values, field)
+        return changed
+
+    def normalize(self, cells=None):
+        """Scales the nominal values of cells so every section they are in
+        adds up to 100, leaving the other cells of those sections alone.
+        Hard caps below their new nominal value are raised to it.
+
+        Parameters:
+            cells (list): Cells to change, every cell if None.
+
+        Returns:
+            changed (int): Amount of values that changed.
+        """
+
+        if self.field != "nominal":
+            raise ValueError("Only nominal values can be normalized")
+
+        rows_by_column = {}
+        for row, column in self._cells(cells):
+            rows_by_column.setdefault(column, set()).add(row)
+
+        # Every section is solved in the same pass, the cells left out are
+        # locked to their current value
+        columns = sorted(rows_by_column)
+        constraints = {}
+        for column in columns:
+            allocations = self._sections[column]
+            for row, position in enumerate(self._positions[column]):
+                if position >= 0 and row not in rows_by_column[column]:
+                    constraints[(allocations.section, self._shows[row])] = (
+                        ShareConstraint(locked=allocations.nominal[position])
+                    )
+        solved = solve_sections(
+            [self._sections[column] for column in columns], constraints=constraints
+        )
+
+        changed = 0
+        for field in FIELDS:
+            values = {}
+            for column, allocations in zip(columns, solved):
+                array = getattr(allocations, field)
+                for row in rows_by_column[column]:
+                    values[(row, column)] = array[self._positions[column][row]]
+            changed += self._bulk_update(values, field)
+        return changed
+
+
+class ShareMatrix(QtWidgets.QTableView):
+    """Table of every show (rows) of many farm sections (columns).
+
+    Clicking a show or a section header selects its row or column, and
+    dragging selects a block of cells.
+
+    Parameters:
+        sections (list): SectionAllocations of every section.
+        parent (QWidget): Widget to create the table in.
+        font (QFont): Font of the table.
+        section_label (function): Optional function turning a section name
+        into its column title.
+
+    Methods:
+        share_model(): Returns the ShareMatrixModel of the table.
+        selected_cells(): Returns the selected cells, None if there are none.
+    """
+
+    def __init__(self, sections, parent, font, section_label=None):
+        super().__init__(parent)
+
+        self.setFont(font)
+        self.setModel(ShareMatrixModel(sections, section_label, self))
+        self.setItemDelegate(PercentDelegate(self))
+        self.setEditTriggers(
+            QtWidgets.QAbstractItemView.EditTrigger.DoubleClicked
+            | QtWidgets.QAbstractItemView.EditTrigger.AnyKeyPressed
+            | QtWidgets.QAbstractItemView.EditTrigger.EditKeyPressed
+        )
+        self.setSelectionMode(
+            QtWidgets.QAbstractItemView.SelectionMode.ExtendedSelection
+        )
+        self.setVerticalScrollMode(
+            QtWidgets.QAbstractItemView.ScrollMode.ScrollPerPixel
+        )
+        self.setHorizontalScrollMode(
+            QtWidgets.QAbstractItemView.ScrollMode.ScrollPerPixel
+        )
+
+        vertical_header = self.verticalHeader()
+        vertical_header.setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Fixed)
+        vertical_header.setDefaultSectionSize(ROW_HEIGHT)
+        horizontal_header = self.horizontalHeader()
+        horizontal_header.setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Fixed)
+        horizontal_header.setDefaultSectionSize(CELL_WIDTH)
+        horizontal_header.setFixedHeight(
+            2 * QtGui.QFontMetrics(horizontal_header.font()).height() + 8
+        )
+
+    def share_model(self):
+        """Returns the ShareMatrixModel of the table."""
+        return self.model()
+
+    def selected_cells(self):
+        """Returns the selected cells as (row, column) tuples, None if nothing
+        is selected."""
+        cells = [(index.row(), index.column()) for index in self.selectedIndexes()]
+        return cells or None
+
+
+class ShareMatrixPanel(QtWidgets.QWidget):
+    """Buttons running the bulk operations of a share matrix on the selected
+    cells, or on every cell if none is selected, and the choice of the field
+    shown.
+
+    Parameters:
+        matrix (ShareMatrix): The share matrix.
+        live_allocations (list): SectionAllocations of the config file, in
+        column order, put back by 'Reset'.
+        parent (QWidget): Widget to create the buttons in.
+        font (QFont): Font of the buttons.
+    """
+
+    def __init__(self, matrix, live_allocations, parent, font):
+        super().__init__(parent)
+
+        self.matrix = matrix
+        self.live_allocations = live_allocations
+
+        layout = QtWidgets.QGridLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(4)
+
+        self.field_combo_box = QtWidgets.QComboBox(self)
+        self.field_combo_box.setFont(font)
+        for field, name in FIELDS.items():
+            self.field_combo_box.addItem(f"{name} values", field)
+        self.field_combo_box.currentIndexChanged.connect(self.show_field)
+        layout.addWidget(self.field_combo_box, 0, 0, 1, 3)
+
+        # Text, tooltip and handler of every button, in reading order
+        buttons = (
+            ("Set...", "Set the values", self.set_values),
+            ("Scale...", "Multiply the values by a factor", self.scale),
+            (
+                "Fill Right",
+                "Copy the leftmost value of every row to the right",
+                self.fill_right,
+            ),
+            (
+                "Normalize",
+                "Scale the nominal values so every section adds up to 100",
+                self.normalize,
+            ),
+            ("Reset", "Put back the values of the config file", self.reset),
+        )
+        for position, (text, tooltip, handler) in enumerate(buttons, 3):
+            button = QtWidgets.QPushButton(text, self)
+            button.setFont(font)
+            button.setToolTip(
+                f"{tooltip}, of the selected cells or of all of them if none "
+                "is selected."
+            )
+            button.clicked.connect(handler)
+            layout.addWidget(button, position // 3, position % 3)
+
+    def _run(self, operation, *args):
+        try:
+            operation(*args, cells=self.matrix.selected_cells())
+        except ValueError as error:
+            QtWidgets.QMessageBox.warning(self, "Share Matrix", str(error))
+
+    def show_field(self, _index):
+        """Shows the field picked in the combo box."""
+        self.matrix.share_model().set_field(self.field_combo_box.currentData())
+
+    def set_values(self):
+        """Asks for a percentage and sets the values to it."""
+        value, accepted = QtWidgets.QInputDialog.getDouble(
+            self,
+            "Set",
+            "New percentage:",
+            0.0,
+            MINIMUM_PERCENT,
+            MAXIMUM_PERCENT,
+            PERCENT_DECIMALS,
+        )
+        if accepted:
+            self._run(self.matrix.share_model().set_values, value)
+
+    def scale(self):
+        """Asks for a factor and multiplies the values by it."""
+        factor, accepted = QtWidgets.QInputDialog.getDouble(
+            self, "Scale", "Multiply the values by:", 1.0, 0.0, 100.0, 3
+        )
+        if accepted:
+            self._run(self.matrix.share_model().scale, factor)
+
+    def fill_right(self):
+        """Copies the leftmost value of every row to the right."""
+        self._run(self.matrix.share_model().fill_right)
+
+    def normalize(self):
+        """Scales the nominal values so every section adds up to 100."""
+        self._run(self.matrix.share_model().normalize)
+
+    def reset(self):
+        """Puts back the values of the config file."""
+        self._run(self.matrix.share_model().reset, self.live_allocations)
@@ -0,0 +1,313 @@
+#!/usr/bin/python3
+
+"""
+- Copy-on-write staging layer of the Farm UI.
+- Staged changes are kept as a small overlay of share values on top of the
+live config file, which itself is never touched until the changes are
+written. Staging, cancelling and going back for more changes only cost as
+much as the amount of changes made, and the overlay is kept on disk as a
+JSON patch so it survives going back and forth between windows.
+- Please only adjust values if totally sure of what you are doing!
+
+Written in Python3.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from allocation_model import PERCENT_DECIMALS
+from config_spans import edit_config_file, load_share_spans, read_share_values
+from config_store import file_signature, write_atomic
+
+# Name of the file inside the temporary folder holding the staged changes
+PATCH_FILE_NAME = "staged.patch"
+
+# One overlay per config file for the whole process
+_overlays = {}
+_overlays_lock = threading.Lock()
+
+
+def _escape_pointer(token):
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def _unescape_pointer(token):
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def share_pointer(section, show, field):
+    """Builds the JSON Pointer of a share value.
+
+    Parameters:
+        section (str): Name of the farm section.
+        show (str): Name of the show.
+        field (str): Either 'nominal' or 'cap'.
+
+    Returns:
+        pointer (str): The pointer, e.g. '/Limits/linuxfarm/Shares/ABC/nominal'.
+    """
+
+    tokens = ("Limits", section, "Shares", show, field)
+    return "/" + "/".join(_escape_pointer(token) for token in tokens)
+
+
+class StagingOverlay:
+    """Staged share values on top of an untouched base config file.
+
+    Attributes:
+        config_file_path_name (str): Path to the main configuration file the
+        changes are staged on top of.
+        patch_file_name (str): Path to the file where the overlay is kept.
+        base_signature (tuple): The (mtime, size, inode) of the config file
+        when the first change was staged.
+
+    Methods:
+        stage(edits): Records new share values.
+        snapshots(edits): Returns every share value before and after the write.
+        staged_value(section, show, field): Returns a staged value.
+        sections(): Lists the sections with staged changes.
+        applied_to(allocations): Returns a model with the staged values.
+        discard(): Drops every staged change.
+        render_patch(): Returns the staged changes as a JSON Patch.
+        render(): Returns the contents of the config file with the changes.
+        base_changed(): Checks if the config file changed since staging began.
+    """
+
+    def __init__(self, config_file_path_name, patch_file_name):
+        self.config_file_path_name = config_file_path_name
+        self.patch_file_name = patch_file_name
+        self.base_signature = None
+        # Staged share values (0 to 1) keyed by section and then (show, field)
+        self._deltas = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(values) for values in self._deltas.values())
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def items(self):
+        """Returns every staged value.
+
+        Returns:
+            items (list): ((section, show, field), value) tuples, in the order
+            they were staged.
+        """
+
+        with self._lock:
+            return [
+                ((section, show, field), value)
+                for section, values in self._deltas.items()
+                for (show, field), value in values.items()
+            ]
+
+    def stage(self, edits):
+        """Records new share values on top of the base config file.
+
+        Values that end up being the same as the ones in the base file are
+        dropped from the overlay, so cancelling a change is the same as never
+        having made it.
+
+        Parameters:
+            edits (dict): New share values (0 to 1) keyed by (section, show, field).
+
+        Returns:
+            None
+        """
+
+        if not edits:
+            return
+
+        base_values = read_share_values(self.config_file_path_name, edits)
+
+        with self._lock:
+            if self.base_signature is None:
+                self.base_signature = file_signature(
+                    os.stat(self.config_file_path_name)
+                )
+
+            for key, value in edits.items():
+                if key not in base_values:
+                    raise KeyError(f"No '{key[2]}' value for {key[1]} in {key[0]}")
+                section, show, field = key
+                values = self._deltas.setdefault(section, OrderedDict())
+                if round(value, 3) == round(base_values[key], 3):
+                    values.pop((show, field), None)
+                else:
+                    values[(show, field)] = round(value, 3)
+                if not values:
+                    del self._deltas[section]
+
+            self.save()
+
+    def snapshots(self, edits=None):
+        """Returns every share value of the base config file, and the same
+        values with the staged changes and some not yet staged edits on top.
+
+        Parameters:
+            edits (dict): Optional new share values (0 to 1) keyed by
+            (section, show, field), taking precedence over the staged ones.
+
+        Returns:
+            base (dict): Share values (0 to 1) of the base config file, keyed by
+            (section, show, field), read straight from their byte spans.
+            staged (dict): The values the next write would leave in the file.
+        """
+
+        base = read_share_values(
+            self.config_file_path_name, load_share_spans(self.config_file_path_name)
+        )
+        staged = dict(base)
+        staged.update(self.items())
+        staged.update(edits or {})
+        return base, staged
+
+    def staged_value(self, section, show, field, default=None):
+        """Returns the staged value of a share, or 'default' if it has none."""
+        with self._lock:
+            return self._deltas.get(section, {}).get((show, field), default)
+
+    def sections(self):
+        """Returns the names of the sections with staged changes."""
+        with self._lock:
+            return list(self._deltas)
+
+    def applied_to(self, allocations):
+        """Returns a copy of a section model with the staged values on top.
+
+        Parameters:
+            allocations (SectionAllocations): Model built from the base file.
+
+        Returns:
+            allocations (SectionAllocations): Model with the staged values.
+        """
+
+        staged = allocations.copy()
+        with self._lock:
+            values = dict(self._deltas.get(allocations.section, {}))
+
+        for (show, field), value in values.items():
+            if show in staged:
+                getattr(staged, field)[staged.position(show)] = round(
+                    value * 100, PERCENT_DECIMALS
+                )
+        return staged
+
+    def discard(self):
+        """Drops every staged change, including the copy kept on disk.
+
+        Returns:
+            None
+        """
+
+        with self._lock:
+            self._deltas.clear()
+            self.base_signature = None
+            if os.path.exists(self.patch_file_name):
+                os.remove(self.patch_file_name)
+
+    def render_patch(self):
+        """Returns the staged changes as a JSON Patch (RFC 6902) on top of the
+        base config file.
+
+        Returns:
+            patch (list): One 'replace' operation per staged value.
+        """
+
+        return [
+            {"op": "replace", "path": share_pointer(*key), "value": value}
+            for key, value in self.items()
+        ]
+
+    def render(self):
+        """Returns the contents of the base config file with every staged value
+        rewritten in place.
+
+        Returns:
+            data (bytes): The new contents of the configuration file.
+        """
+
+        return edit_config_file(self.config_file_path_name, dict(self.items()))
+
+    def base_changed(self):
+        """Checks if the config file changed since the first change was staged.
+
+        Returns:
+            changed (bool): True if the base file is not the staged-on version.
+        """
+
+        with self._lock:
+            if self.base_signature is None:
+                return False
+            current = file_signature(os.stat(self.config_file_path_name))
+            return current != self.base_signature
+
+    def save(self):
+        """Keeps the overlay on disk, or removes the file if nothing is staged.
+
+        Returns:
+            None
+        """
+
+        with self._lock:
+            if not self._deltas:
+                if os.path.exists(self.patch_file_name):
+                    os.remove(self.patch_file_name)
+                return
+            write_atomic(
+                self.patch_file_name,
+                json.dumps(
+                    {
+                        "base_signature": list(self.base_signature),
+                        "patch": self.render_patch(),
+                    },
+                    indent=4,
+                ),
+            )
+
+    def load(self):
+        """Loads the overlay kept on disk, if there is one.
+
+        Returns:
+            None
+        """
+
+        if not os.path.exists(self.patch_file_name):
+            return
+
+        with open(self.patch_file_name, "r") as patch_file:
+            raw = json.load(patch_file)
+
+        with self._lock:
+            self._deltas.clear()
+            self.base_signature = tuple(raw["base_signature"])
+            for operation in raw["patch"]:
+                tokens = [_unescape_pointer(t) for t in operation["path"].split("/")]
+                _limits, section, _shares, show, field = tokens[1:]
+                values = self._deltas.setdefault(section, OrderedDict())
+                values[(show, field)] = operation["value"]
+
+
+def get_overlay(config_file_path_name, temp_folder):
+    """Returns the staging overlay of a config file, shared by every window.
+
+    Parameters:
+        config_file_path_name (str): Path to the main configuration file.
+        temp_folder (str): Path to the temporary folder for storing temp files.
+
+    Returns:
+        overlay (StagingOverlay): The overlay of the config file.
+    """
+
+    path = os.path.abspath(config_file_path_name)
+    with _overlays_lock:
+        overlay = _overlays.get(path)
+        if overlay is None:
+            overlay = StagingOverlay(path, os.path.join(temp_folder, PATCH_FILE_NAME))
+            overlay.load()
+            _overlays[path] = overlay
+    return overlay
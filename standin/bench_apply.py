@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+
+"""
+- Benchmark of the write, reload and verify path of the Farm UI against the
+local engine stand-in.
+- Works on a copy of the given config file: every round changes a few random
+share values, commits them, reloads the stand-in through the fake 'tq' and
+waits until it serves the new values, reporting how long each round took.
+Takes the same fault options as the stand-in, so the cost of a slow or
+flaky engine can be measured too.
+
+Usage:
+    python3 standin/bench_apply.py --config limits.config --rounds 20 --reload-lag 0.5
+
+Written in Python3.
+"""
+
+import argparse
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+STANDIN_FOLDER = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(STANDIN_FOLDER))
+
+from engine_standin import EngineStandIn, start_standin  # noqa: E402
+
+
+def main(argv=None):
+    """Command line entry point of the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark reload/verify.")
+    parser.add_argument("--config", required=True, help="limits.config to copy.")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--edits", type=int, default=10, help="Values per round.")
+    parser.add_argument("--reload-timeout", type=float, default=10.0)
+    parser.add_argument("--interval", type=float, default=0.05)
+    parser.add_argument("--reload-lag", type=float, default=0.0)
+    parser.add_argument("--partial", type=float, default=0.0)
+    parser.add_argument("--stale-rate", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--reload-fail-rate", type=float, default=0.0)
+    parser.add_argument("--response-delay", type=float, default=0.0)
+    parser.add_argument("--no-direct-reload", action="store_true")
+    parser.add_argument("--require-session", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    work_folder = tempfile.mkdtemp(prefix="farm_ui_bench_")
+    config_file_path_name = os.path.join(work_folder, "limits.config")
+    backup_folder = os.path.join(work_folder, "limits_backup") + os.sep
+    shutil.copy(args.config, config_file_path_name)
+
+    engine = EngineStandIn(
+        config_file_path_name,
+        reload_lag=args.reload_lag,
+        partial=args.partial,
+        stale_rate=args.stale_rate,
+        fail_rate=args.fail_rate,
+        reload_fail_rate=args.reload_fail_rate,
+        response_delay=args.response_delay,
+        direct_reload=not args.no_direct_reload,
+        require_session=args.require_session,
+        seed=args.seed,
+    )
+    server = start_standin(engine)
+    host, port = server.server_address
+
+    # The tool and the fake 'tq' both find the engine through these
+    os.environ["TRACTOR_ENGINE"] = f"{host}:{port}"
+    os.environ["PATH"] = STANDIN_FOLDER + os.pathsep + os.environ["PATH"]
+
+    from config_spans import edit_config_file, load_share_spans
+    from config_store import commit_config
+    from tractor_engine import engine_metrics, reload_and_verify, reload_metrics
+
+    keys = list(load_share_spans(config_file_path_name))
+    generator = random.Random(args.seed)
+    timings = []
+    failed_rounds = 0
+
+    try:
+        for round_number in range(1, args.rounds + 1):
+            edits = {
+                key: round(generator.random(), 3)
+                for key in generator.sample(keys, min(args.edits, len(keys)))
+            }
+            start = time.monotonic()
+            commit_config(
+                config_file_path_name,
+                edit_config_file(config_file_path_name, edits),
+                backup_folder,
+            )
+            mismatches, reload_count = reload_and_verify(
+                edits, reload_timeout=args.reload_timeout, interval=args.interval
+            )
+            elapsed = time.monotonic() - start
+            timings.append(elapsed)
+            failed_rounds += bool(mismatches)
+            print(
+                f"Round {round_number}: {elapsed * 1000:.1f} ms, "
+                f"{reload_count} reload(s), {len(mismatches)} mismatches"
+            )
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    timings.sort()
+    print(f"Rounds: {len(timings)}, failed: {failed_rounds}")
+    print(
+        f"Latency ms: min {timings[0] * 1000:.1f}, "
+        f"avg {math.fsum(timings) / len(timings) * 1000:.1f}, "
+        f"p95 {timings[math.ceil(len(timings) * 0.95) - 1] * 1000:.1f}, "
+        f"max {timings[-1] * 1000:.1f}"
+    )
+    print(f"Stand-in: {engine.stats()}")
+    print(f"Engine client: {engine_metrics()}")
+    print(f"Reloads: {reload_metrics()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/python3
+
+"""
+- Local stand-in for the Tractor Engine, to exercise the Farm UI without a
+production engine.
+- Serves the limits page ('/Tractor/queue?q=limits') from the config file it
+was started with, and reloads that file when asked to through
+'/Tractor/ctrl?q=reloadconfig&file=limits.config', either directly or from
+the fake 'tq' next to this file. Sessions can be opened through
+'/Tractor/monitor?q=login&user=<name>'.
+- Faults can be injected to test how the tool copes with a real engine: lag
+between a reload and the new limits showing up, reloads that only reach some
+of the sections, stale answers, slow answers and failures. Every random choice
+comes from a seeded generator, so a run can be repeated exactly.
+- Please only adjust values if totally sure of what you are doing!
+
+Usage:
+    python3 standin/engine_standin.py --config limits.config --port 8080
+    PATH=standin:$PATH TRACTOR_ENGINE=localhost:8080 python3 main_farm_selection_window.py
+
+Written in Python3.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+LIMITS_PATH = "/Tractor/queue"
+CONTROL_PATH = "/Tractor/ctrl"
+MONITOR_PATH = "/Tractor/monitor"
+# Header the fake 'tq' sends, so its reloads work even with --no-direct-reload
+TQ_HEADER = "X-Standin-Client"
+
+
+class EngineStandIn:
+    """Limits state of the stand-in engine, with the faults to inject.
+
+    Attributes:
+        config_file_path_name (str): Path to the config file served.
+        reload_lag (float): Seconds between a reload and the new limits
+        showing up.
+        partial (float): Fraction of the sections a reload leaves untouched,
+        until a later reload picks them up.
+        stale_rate (float): Chance of an answer showing the limits from before
+        the last reload.
+        fail_rate (float): Chance of the limits page answering 503.
+        reload_fail_rate (float): Chance of a reload answering 500.
+        response_delay (float): Seconds every answer is held back.
+        direct_reload (bool): False to only accept reloads coming from 'tq',
+        like an engine without the direct reload.
+        require_session (bool): True to only accept reloads with the id of a
+        logged in session ('tsid').
+        seed (int): Seed of the random choices.
+
+    Methods:
+        reload(): Reloads the config file, with the lag and partial faults.
+        limits_page(): Returns the body of the limits page and its ETag.
+        stats(): Returns the counters of the stand-in.
+    """
+
+    def __init__(
+        self,
+        config_file_path_name,
+        reload_lag=0.0,
+        partial=0.0,
+        stale_rate=0.0,
+        fail_rate=0.0,
+        reload_fail_rate=0.0,
+        response_delay=0.0,
+        direct_reload=True,
+        require_session=False,
+        seed=0,
+    ):
+        self.config_file_path_name = config_file_path_name
+        self.reload_lag = reload_lag
+        self.partial = partial
+        self.stale_rate = stale_rate
+        self.fail_rate = fail_rate
+        self.reload_fail_rate = reload_fail_rate
+        self.response_delay = response_delay
+        self.direct_reload = direct_reload
+        self.require_session = require_session
+        self.sessions = set()
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counters = {
+            "pages": 0,
+            "not_modified": 0,
+            "reloads": 0,
+            "tq_reloads": 0,
+            "logins": 0,
+            "failures": 0,
+        }
+
+        contents = self._read_config()
+        self._current = self._publish(contents)
+        self._previous = self._current
+
+    def _read_config(self):
+        with open(self.config_file_path_name, "r") as config_file:
+            return json.load(config_file)
+
+    def _publish(self, contents):
+        body = json.dumps(contents).encode("utf-8")
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        return contents, body, etag
+
+    def chance(self, rate):
+        """Returns True with the given probability, from the seeded generator."""
+        with self._lock:
+            return rate > 0 and self._random.random() < rate
+
+    def reload(self):
+        """Reloads the config file. The new limits show up after 'reload_lag'
+        seconds, and a 'partial' fraction of the sections keeps its old values.
+
+        Returns:
+            reloaded (bool): False if a failure was injected.
+        """
+
+        if self.chance(self.reload_fail_rate):
+            with self._lock:
+                self._counters["failures"] += 1
+            return False
+
+        contents = self._read_config()
+        with self._lock:
+            self._counters["reloads"] += 1
+            old_limits = self._current[0]["Limits"]
+            for section in contents["Limits"]:
+                if section in old_limits and self._random.random() < self.partial:
+                    contents["Limits"][section] = old_limits[section]
+
+        def publish():
+            published = self._publish(contents)
+            with self._lock:
+                self._previous = self._current
+                self._current = published
+
+        if self.reload_lag > 0:
+            timer = threading.Timer(self.reload_lag, publish)
+            timer.daemon = True
+            timer.start()
+        else:
+            publish()
+        return True
+
+    def limits_page(self):
+        """Returns the limits page, stale with a 'stale_rate' chance.
+
+        Returns:
+            page (tuple): The body (bytes) and ETag (str) of the page.
+        """
+
+        stale = self.chance(self.stale_rate)
+        with self._lock:
+            self._counters["pages"] += 1
+            _contents, body, etag = self._previous if stale else self._current
+        return body, etag
+
+    def count(self, counter):
+        """Adds one to a counter of the stand-in."""
+        with self._lock:
+            self._counters[counter] += 1
+
+    def stats(self):
+        """Returns the counters of the stand-in."""
+        with self._lock:
+            return dict(self._counters)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """HTTP handler of the stand-in, keeping connections alive like the engine."""
+
+    protocol_version = "HTTP/1.1"
+    engine = None
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        engine = self.engine
+
+        if engine.response_delay > 0:
+            time.sleep(engine.response_delay)
+
+        if parts.path == LIMITS_PATH and query.get("q") == ["limits"]:
+            if engine.chance(engine.fail_rate):
+                engine.count("failures")
+                self._send(503, b"Engine busy")
+                return
+            body, etag = engine.limits_page()
+            if self.headers.get("If-None-Match") == etag:
+                engine.count("not_modified")
+                self._send(304, headers={"ETag": etag})
+                return
+            headers = {"ETag": etag, "Content-Type": "application/json"}
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body, 1)
+                headers["Content-Encoding"] = "gzip"
+            self._send(200, body, headers)
+
+        elif parts.path == MONITOR_PATH and query.get("q") == ["login"]:
+            engine.count("logins")
+            tsid = f"standin-{query.get('user', ['nobody'])[0]}"
+            engine.sessions.add(tsid)
+            self._send(200, json.dumps({"tsid": tsid}).encode("utf-8"))
+
+        elif parts.path == CONTROL_PATH and query.get("q") == ["reloadconfig"]:
+            from_tq = self.headers.get(TQ_HEADER) == "tq"
+            if not from_tq and not engine.direct_reload:
+                self._send(404, b"Not found")
+                return
+            if (
+                not from_tq
+                and engine.require_session
+                and query.get("tsid", [None])[0] not in engine.sessions
+            ):
+                self._send(401, b"Login required")
+                return
+            if from_tq:
+                engine.count("tq_reloads")
+            if engine.reload():
+                self._send(200, b'{"rc": 0, "msg": "limits reloaded"}')
+            else:
+                self._send(500, b'{"rc": 1, "msg": "reload failed"}')
+
+        else:
+            self._send(404, b"Not found")
+
+    do_POST = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_standin(engine, host="127.0.0.1", port=0):
+    """Starts serving a stand-in engine on a background thread.
+
+    Parameters:
+        engine (EngineStandIn): State and faults of the stand-in.
+        host (str): Address to listen on.
+        port (int): Port to listen on, any free one if 0.
+
+    Returns:
+        server (ThreadingHTTPServer): The running server, its address is in
+        'server.server_address'. Stop it with 'server.shutdown()'.
+    """
+
+    handler = type("Handler", (StandInHandler,), {"engine": engine})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main(argv=None):
+    """Command line entry point of the stand-in engine."""
+    parser = argparse.ArgumentParser(description="Local Tractor Engine stand-in.")
+    parser.add_argument("--config", required=True, help="limits.config to serve.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--reload-lag", type=float, default=0.0)
+    parser.add_argument("--partial", type=float, default=0.0)
+    parser.add_argument("--stale-rate", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--reload-fail-rate", type=float, default=0.0)
+    parser.add_argument("--response-delay", type=float, default=0.0)
+    parser.add_argument("--no-direct-reload", action="store_true")
+    parser.add_argument("--require-session", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    engine = EngineStandIn(
+        args.config,
+        reload_lag=args.reload_lag,
+        partial=args.partial,
+        stale_rate=args.stale_rate,
+        fail_rate=args.fail_rate,
+        reload_fail_rate=args.reload_fail_rate,
+        response_delay=args.response_delay,
+        direct_reload=not args.no_direct_reload,
+        require_session=args.require_session,
+        seed=args.seed,
+    )
+    server = start_standin(engine, args.host, args.port)
+    print(f"Engine stand-in serving {args.config} on {args.host}:{args.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(engine.stats())
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
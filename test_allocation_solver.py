@@ -0,0 +1,102 @@
+"""Tests of the guarantees of the allocation solver (run with pytest)."""
+
+import random
+
+import pytest
+
+from allocation_model import SectionAllocations
+from allocation_solver import (
+    PERCENT_STEPS,
+    TOTAL_PERCENT,
+    ShareConstraint,
+    solve_section,
+    solve_sections,
+)
+
+
+def steps(values):
+    return sum(round(value * PERCENT_STEPS) for value in values)
+
+
+def make_section(name, nominal, cap=None):
+    shows = [f"show{index}" for index in range(len(nominal))]
+    return SectionAllocations(name, shows, nominal, cap or [0.0] * len(nominal))
+
+
+def test_sections_add_up_to_exactly_the_total():
+    rng = random.Random(4)
+    sections = [
+        make_section(f"section{index}", [rng.uniform(0, 30) for _ in range(17)])
+        for index in range(20)
+    ]
+
+    for solved in solve_sections(sections):
+        assert steps(solved.nominal) == TOTAL_PERCENT * PERCENT_STEPS
+
+
+def test_weights_are_followed():
+    solved = solve_section(
+        make_section("farm", [10, 10, 10, 10]),
+        weights={"show0": 1, "show1": 1, "show2": 2, "show3": 4},
+    )
+
+    assert list(solved.nominal) == [12.5, 12.5, 25.0, 50.0]
+
+
+def test_floors_and_ceilings_are_kept():
+    constraints = {
+        "show0": ShareConstraint(ceiling=10),
+        "show1": ShareConstraint(floor=30),
+        "show2": ShareConstraint(floor=5, ceiling=6),
+    }
+    solved = solve_section(
+        make_section("farm", [80, 1, 1, 18]), constraints=constraints
+    )
+
+    assert solved.nominal[0] <= 10
+    assert solved.nominal[1] >= 30
+    assert 5 <= solved.nominal[2] <= 6
+    assert steps(solved.nominal) == TOTAL_PERCENT * PERCENT_STEPS
+
+
+@pytest.mark.parametrize("locked", [45.55, 33.333, 12.04, 50.0])
+def test_locked_values_off_the_grid_still_add_up(locked):
+    solved = solve_section(
+        make_section("farm", [25, 25, 25, 25]),
+        constraints={"show1": ShareConstraint(locked=locked)},
+    )
+
+    assert solved.nominal[1] == round(locked * PERCENT_STEPS) / PERCENT_STEPS
+    assert steps(solved.nominal) == TOTAL_PERCENT * PERCENT_STEPS
+
+
+def test_caps_are_raised_to_the_nominal_values_only():
+    solved = solve_section(
+        make_section("farm", [50, 30, 20], cap=[10, 90, 100]),
+        weights={"show0": 60, "show1": 20, "show2": 20},
+    )
+
+    assert list(solved.cap) == [60.0, 90.0, 100.0]
+    for nominal, cap in zip(solved.nominal, solved.cap):
+        assert cap >= nominal
+
+
+def test_infeasible_constraints_are_rejected():
+    with pytest.raises(ValueError):
+        solve_section(
+            make_section("farm", [50, 50]),
+            constraints={
+                "show0": ShareConstraint(ceiling=40),
+                "show1": ShareConstraint(ceiling=40),
+            },
+        )
+    with pytest.raises(ValueError):
+        ShareConstraint(floor=60, ceiling=40)
+
+
+def test_the_given_sections_are_left_untouched():
+    section = make_section("farm", [10, 20, 30], cap=[5, 5, 5])
+    solve_section(section, weights={"show0": 5})
+
+    assert list(section.nominal) == [10, 20, 30]
+    assert list(section.cap) == [5, 5, 5]
@@ -0,0 +1,99 @@
+"""Tests of the backup store (run with pytest)."""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from backup_store import MAX_CHAIN_DEPTH, BackupNotFound, BackupStore
+
+
+def make_config(version):
+    limits = {
+        f"section{section}": {
+            "Shares": {
+                f"show{show}": {"nominal": show / 100, "cap": 1.0} for show in range(40)
+            }
+        }
+        for section in range(5)
+    }
+    limits["section0"]["Shares"]["show0"]["nominal"] = version / 1000
+    return json.dumps({"Limits": limits}, indent=4).encode("utf-8")
+
+
+def stored_objects(store):
+    return store._load_index()["objects"]
+
+
+def test_add_prunes_the_oldest_versions(tmp_path):
+    store = BackupStore(str(tmp_path), max_versions=5, max_age_days=None)
+    for version in range(30):
+        store.add(make_config(version), name=f"v{version}")
+
+    assert [entry["name"] for entry in store.list_versions()] == [
+        f"v{version}" for version in range(25, 30)
+    ]
+    # Only the objects of the kept versions are left, and all of them read back
+    assert len(stored_objects(store)) == 5
+    assert len(list((tmp_path / "objects").iterdir())) == 5
+    fresh = BackupStore(str(tmp_path))
+    for version in range(25, 30):
+        assert fresh.get(f"v{version}") == make_config(version)
+
+
+def test_add_prunes_the_expired_versions(tmp_path):
+    store = BackupStore(str(tmp_path), max_versions=None, max_age_days=30)
+    now = datetime(2026, 1, 1)
+    for days in (90, 60, 31, 29, 1):
+        store.add(make_config(days), name=f"d{days}", created=now - timedelta(days))
+    store.add(make_config(0), name="d0", created=now)
+
+    assert [entry["name"] for entry in store.list_versions()] == ["d29", "d1", "d0"]
+    assert BackupStore(str(tmp_path)).get("d29") == make_config(29)
+
+
+def test_the_latest_version_is_always_kept(tmp_path):
+    store = BackupStore(str(tmp_path), max_versions=0, max_age_days=1)
+    store.add(make_config(1), name="old", created=datetime(2020, 1, 1))
+    store.compact()
+
+    assert [entry["name"] for entry in store.list_versions()] == ["old"]
+    assert store.get("old") == make_config(1)
+
+
+def test_pruned_chains_are_rebased(tmp_path):
+    store = BackupStore(str(tmp_path), max_versions=None, max_age_days=None)
+    for version in range(MAX_CHAIN_DEPTH):
+        store.add(make_config(version), name=f"v{version}")
+    objects = stored_objects(store)
+    assert [info["depth"] for info in objects.values()] == list(range(MAX_CHAIN_DEPTH))
+
+    store.max_versions = 3
+    assert store.compact() == MAX_CHAIN_DEPTH - 3
+
+    objects = stored_objects(store)
+    assert [info["depth"] for info in objects.values()] == [0, 1, 2]
+    assert [info["kind"] for info in objects.values()] == ["base", "delta", "delta"]
+    fresh = BackupStore(str(tmp_path))
+    for version in range(MAX_CHAIN_DEPTH - 3, MAX_CHAIN_DEPTH):
+        assert fresh.get(f"v{version}") == make_config(version)
+
+
+def test_duplicate_versions_share_one_object(tmp_path):
+    store = BackupStore(str(tmp_path), max_versions=2, max_age_days=None)
+    store.add(make_config(1), name="a")
+    store.add(make_config(2), name="b")
+    store.add(make_config(1), name="c")
+
+    assert [entry["name"] for entry in store.list_versions()] == ["b", "c"]
+    assert len(stored_objects(store)) == 2
+    assert store.get("c") == make_config(1)
+
+
+def test_unknown_versions_raise_backup_not_found(tmp_path):
+    store = BackupStore(str(tmp_path))
+    store.add(make_config(1), name="a")
+
+    with pytest.raises(BackupNotFound) as error:
+        store.find("missing")
+    assert str(error.value) == "There is no backup called 'missing'"
@@ -0,0 +1,39 @@
+"""Tests of the engine targets file (run with pytest)."""
+
+import json
+
+import pytest
+
+from engine_targets import load_targets
+
+
+def load(folder, entries):
+    (folder / "engine_targets.json").write_text(json.dumps(entries))
+    return load_targets(str(folder / "limits.config"), str(folder / "backup"))
+
+
+@pytest.mark.parametrize(
+    "entries, message",
+    [
+        ([], "at least one engine target"),
+        ({"engine": "main"}, "at least one engine target"),
+        ([{"name": "main"}], "Target 1 of .* has no 'engine'"),
+        ([{"engine": "main"}, "standby"], "Target 2 of .* has no 'engine'"),
+    ],
+)
+def test_broken_targets_files_are_rejected(tmp_path, entries, message):
+    with pytest.raises(ValueError, match=message):
+        load(tmp_path, entries)
+
+
+def test_targets_default_to_the_main_config_and_backup_folder(tmp_path):
+    targets = load(
+        tmp_path,
+        [{"engine": "main:80"}, {"name": "standby", "engine": "standby:80"}],
+    )
+
+    assert [target.name for target in targets] == ["main:80", "standby"]
+    assert {target.config_file_path_name for target in targets} == {
+        str(tmp_path / "limits.config")
+    }
+    assert {target.backup_folder for target in targets} == {str(tmp_path / "backup")}
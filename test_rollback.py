@@ -0,0 +1,36 @@
+"""Tests of the engine targets a rollback reaches (run with pytest)."""
+
+import json
+
+from rollback import split_targets
+from tractor_engine import ENGINE
+
+
+def write_targets(folder, entries):
+    (folder / "engine_targets.json").write_text(json.dumps(entries))
+
+
+def test_targets_sharing_the_config_file_are_rolled_back(tmp_path):
+    config = str(tmp_path / "limits.config")
+    write_targets(
+        tmp_path,
+        [
+            {"name": "main", "engine": "main:80"},
+            {"name": "standby", "engine": "standby:80", "config": config},
+            {"name": "site2", "engine": "site2:80", "config": "/other/limits.config"},
+        ],
+    )
+
+    rolled_back, left_alone = split_targets(config, str(tmp_path / "backup"))
+
+    assert [target.name for target in rolled_back] == ["main", "standby"]
+    assert [target.name for target in left_alone] == ["site2"]
+
+
+def test_the_main_engine_is_rolled_back_without_targets_file(tmp_path):
+    rolled_back, left_alone = split_targets(
+        str(tmp_path / "limits.config"), str(tmp_path / "backup")
+    )
+
+    assert [target.engine for target in rolled_back] == [ENGINE]
+    assert left_alone == []
@@ -0,0 +1,99 @@
+"""Tests of the direct reload of the engine and its fallback to tq (run with
+pytest)."""
+
+import http.server
+import threading
+
+import pytest
+
+import tractor_engine
+from engine_client import get_client
+
+
+def serve(login_body, reload_body):
+    """Starts a local engine answering the login and reload pages with fixed
+    bodies, returns its 'host:port'."""
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = login_body if "q=login" in self.path else reload_body
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"127.0.0.1:{server.server_port}"
+
+
+@pytest.fixture
+def tq_calls(monkeypatch):
+    calls = []
+
+    def call(args, env):
+        calls.append(env["TRACTOR_ENGINE"])
+        return 0
+
+    monkeypatch.setattr(tractor_engine.subprocess, "call", call)
+    return calls
+
+
+HTML = b"<html><body>Login</body></html>"
+
+
+@pytest.mark.parametrize("login_body", [HTML, b'["not", "a", "dict"]', b'"tsid"'])
+def test_session_id_of_a_login_page_not_answering_an_object(login_body):
+    server, engine = serve(login_body, b'{"rc": 0}')
+    try:
+        assert get_client(f"http://{engine}/").session_id("user", 5) is None
+    finally:
+        server.shutdown()
+
+
+@pytest.mark.parametrize(
+    "login_body, reload_body",
+    [
+        (HTML, HTML),
+        (b'{"tsid": "abc"}', HTML),
+        (b'{"tsid": "abc"}', b"[]"),
+        (b'{"tsid": "abc"}', b'{"msg": "no rc"}'),
+    ],
+)
+def test_reload_falls_back_to_tq(login_body, reload_body, tq_calls):
+    server, engine = serve(login_body, reload_body)
+    url = f"http://{engine}/Tractor/ctrl?q=reloadconfig&file=limits.config"
+    try:
+        reloaded = tractor_engine.reload_limits(url, timeout=5)
+    finally:
+        server.shutdown()
+
+    assert reloaded and tq_calls == [engine]
+
+
+@pytest.mark.parametrize("login_body", [HTML, b"[1, 2]"])
+def test_broken_login_does_not_stop_the_direct_reload(login_body, tq_calls):
+    server, engine = serve(login_body, b'{"rc": 0, "msg": "limits reloaded"}')
+    url = f"http://{engine}/Tractor/ctrl?q=reloadconfig&file=limits.config"
+    try:
+        assert tractor_engine.reload_limits(url, timeout=5)
+    finally:
+        server.shutdown()
+
+    assert tq_calls == []
+
+
+def test_refused_reload_goes_through_tq_from_then_on(tq_calls):
+    server, engine = serve(b"{}", b'{"rc": 1, "msg": "permission denied"}')
+    url = f"http://{engine}/Tractor/ctrl?q=reloadconfig&file=limits.config"
+    try:
+        assert tractor_engine.reload_limits(url, timeout=5)
+        assert tractor_engine.reload_limits(url, timeout=5)
+    finally:
+        server.shutdown()
+
+    assert tq_calls == [engine, engine]
+    assert engine in tractor_engine._no_direct_reload
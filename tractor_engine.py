@@ -0,0 +1,425 @@
+#!/usr/bin/python3
+
+"""
+- Helpers of the Farm UI to talk to the Tractor Engine.
+- Reloads the 'limits.config' file into the engine, straight through its HTTP
+interface or with 'tq' if that is not possible, and checks the share values
+the engine is using against the ones expected from the config file.
+- Please only adjust values if totally sure of what you are doing!
+
+Written in Python3.
+"""
+
+import getpass
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+from http.client import HTTPException
+from urllib.parse import quote, urlsplit
+
+from engine_client import EngineError, get_client, request_path
+
+# Engine the tool talks to, 'host' or 'host:port'. Read from the same
+# TRACTOR_ENGINE variable 'tq' uses, so both can be pointed elsewhere at once
+ENGINE = os.environ.get("TRACTOR_ENGINE", "tractor-engine")
+
+# Engine page listing the limits currently in use
+ENGINE_LIMITS_URL = f"http://{ENGINE}/Tractor/queue?q=limits"
+
+# Engine control page reloading the limits, what 'tq reloadconfig --limits'
+# asks for, and the user the engine session is opened for
+ENGINE_RELOAD_URL = f"http://{ENGINE}/Tractor/ctrl?q=reloadconfig&file=limits.config"
+ENGINE_USER = os.environ.get("TRACTOR_USER") or getpass.getuser()
+
+
+def engine_reload_url(url):
+    """Returns the control page reloading the limits of the engine any URL
+    points to.
+
+    Parameters:
+        url (str): Any URL of the engine.
+
+    Returns:
+        reload_url (str): The reload page of that engine.
+    """
+
+    parts = urlsplit(url)
+    return (
+        f"{parts.scheme or 'http'}://{parts.netloc}"
+        "/Tractor/ctrl?q=reloadconfig&file=limits.config"
+    )
+
+
+# Deadline of a single request to the engine, in seconds
+FETCH_TIMEOUT = 10.0
+
+# Share values are kept with three decimals in the config file
+SHARE_DECIMALS = 3
+
+# Amount of times Tractor is reloaded before giving up on the engine
+MAX_RELOADS = 7
+# Seconds to wait for the engine after every reload
+RELOAD_TIMEOUT = 10.0
+# Seconds between two checks of the engine
+POLL_INTERVAL = 1.0
+
+# Engines ('host:port') that turned out not to offer or to refuse the direct
+# reload
+_no_direct_reload = set()
+# Amount and time of the reloads done through each path
+_reload_stats = {
+    path: {
+        "count": 0,
+        "failures": 0,
+        "rejected": 0,
+        "seconds": 0.0,
+        "last_seconds": 0.0,
+    }
+    for path in ("http", "tq")
+}
+_reload_lock = threading.Lock()
+
+
+def _record_reload(path, reloaded, seconds, rejected=False):
+    with _reload_lock:
+        stats = _reload_stats[path]
+        stats["count"] += 1
+        stats["failures"] += not reloaded
+        stats["rejected"] += rejected
+        stats["seconds"] += seconds
+        stats["last_seconds"] = seconds
+
+
+def _reload_over_http(url, timeout):
+    client = get_client(url)
+    path = request_path(url)
+    tsid = client.session_id(ENGINE_USER, timeout)
+    if tsid:
+        path += f"&tsid={quote(tsid)}"
+
+    try:
+        response = client.get(path, timeout, cache=False)
+    except EngineError as error:
+        if error.status in (401, 403) and tsid:
+            # The session expired, logging in again next time
+            client.forget_session(ENGINE_USER)
+        raise
+
+    # The engine answers {"rc": ..., "msg": ...}, a non-zero 'rc' being a
+    # refused reload. Any other answer does not tell if it reloaded at all.
+    answer = json.loads(response.body)
+    if not isinstance(answer, dict) or "rc" not in answer:
+        raise ValueError(f"Unexpected answer to the reload: {response.body[:80]!r}")
+    return answer["rc"], answer.get("msg", "")
+
+
+def reload_limits(url=ENGINE_RELOAD_URL, timeout=FETCH_TIMEOUT):
+    """Asks the engine to reload the limits config file, once.
+
+    The reload is asked for straight through the HTTP interface of the
+    engine, reusing the connections and session of the engine client. Only
+    when that is not possible a single 'tq reloadconfig --limits' is run,
+    which is much slower as 'tq' has to start up first. If the engine does
+    not offer the direct reload at all, or refuses it with a non-zero 'rc',
+    'tq' is used from then on.
+
+    Parameters:
+        url (str): Engine control page that reloads the limits.
+        timeout (float): Seconds to wait for the engine to answer.
+
+    Returns:
+        reloaded (bool): True if the reload succeeded.
+    """
+
+    engine = urlsplit(url).netloc
+
+    if engine not in _no_direct_reload:
+        start = time.monotonic()
+        rejected = False
+        try:
+            return_code, message = _reload_over_http(url, timeout)
+        except (OSError, HTTPException, ValueError) as error:
+            print(f"Tractor could not be reloaded directly: {error}")
+            reloaded = False
+            if isinstance(error, EngineError) and error.status in (404, 405, 501):
+                _no_direct_reload.add(engine)
+        else:
+            reloaded = return_code == 0
+            if not reloaded:
+                # Asking again would only be refused again
+                print(
+                    f"Tractor refused the direct reload (rc {return_code}"
+                    f"{', ' + message if message else ''}), using tq from now on"
+                )
+                rejected = True
+                _no_direct_reload.add(engine)
+        seconds = time.monotonic() - start
+        _record_reload("http", reloaded, seconds, rejected)
+        if reloaded:
+            print(f"Tractor reloaded directly in {seconds * 1000:.1f} ms")
+            return True
+
+    start = time.monotonic()
+    # 'tq' finds the engine to talk to through TRACTOR_ENGINE
+    return_code = subprocess.call(
+        ["tq", "reloadconfig", "--limits"],
+        env=dict(os.environ, TRACTOR_ENGINE=engine),
+    )
+    seconds = time.monotonic() - start
+    _record_reload("tq", return_code == 0, seconds)
+    if return_code != 0:
+        print("Command failed with error code: ", return_code)
+    else:
+        print(f"Tractor reloaded with tq in {seconds * 1000:.1f} ms")
+    return return_code == 0
+
+
+def reload_metrics():
+    """Returns how many reloads went through each path and how long they took.
+
+    Returns:
+        metrics (dict): For 'http' (direct) and 'tq' reloads, the amount of
+        reloads, failures, reloads refused by the engine, and the average and
+        last time in milliseconds.
+    """
+
+    metrics = {}
+    with _reload_lock:
+        for path, stats in _reload_stats.items():
+            metrics[path] = {
+                "count": stats["count"],
+                "failures": stats["failures"],
+                "rejected": stats["rejected"],
+                "avg_ms": (
+                    round(stats["seconds"] / stats["count"] * 1000, 1)
+                    if stats["count"]
+                    else None
+                ),
+                "last_ms": round(stats["last_seconds"] * 1000, 1),
+            }
+    return metrics
+
+
+def fetch_limits(url=ENGINE_LIMITS_URL, timeout=FETCH_TIMEOUT):
+    """Fetches the limits currently used by the engine.
+
+    Parameters:
+        url (str): Engine page listing the limits.
+        timeout (float): Seconds to wait for the engine to answer.
+
+    Returns:
+        limits (dict): The parsed engine response, to be treated as read-only.
+    """
+
+    # Connections and unchanged pages are reused between calls; the parsed
+    # limits of an unchanged page are shared, so they must not be modified
+    return get_client(url).get_json(request_path(url), timeout)
+
+
+def share_values(limits_dict, sections=None):
+    """Flattens the share values of a parsed config file or engine response.
+
+    Parameters:
+        limits_dict (dict): Parsed contents, with a top level 'Limits' key.
+        sections (iterable): Optional names of the only sections to include.
+
+    Returns:
+        values (dict): Share values keyed by (section, show, field).
+    """
+
+    values = {}
+    for section, section_dict in limits_dict["Limits"].items():
+        if sections is not None and section not in sections:
+            continue
+        if not isinstance(section_dict, dict) or "Shares" not in section_dict:
+            continue
+        for show, shares in section_dict["Shares"].items():
+            for field in ("nominal", "cap"):
+                if field in shares:
+                    values[(section, show, field)] = float(shares[field])
+    return values
+
+
+def limits_digest(limits_dict, sections=None):
+    """Builds a canonical hash of the effective share values of a parsed config
+    file or engine response, so both can be compared without caring about the
+    key order, spacing or number formatting of either.
+
+    Parameters:
+        limits_dict (dict): Parsed contents, with a top level 'Limits' key.
+        sections (iterable): Optional names of the only sections to include.
+
+    Returns:
+        digests (tuple): The overall hash (str) and the hash of every section
+        (dict keyed by section name).
+    """
+
+    hashes = {}
+    for (section, show, field), value in sorted(
+        share_values(limits_dict, sections).items()
+    ):
+        if section not in hashes:
+            hashes[section] = hashlib.sha1()
+        hashes[section].update(
+            f"{show}\0{field}\0{round(value, SHARE_DECIMALS):.{SHARE_DECIMALS}f}\n".encode(
+                "utf-8"
+            )
+        )
+
+    section_digests = {
+        section: hashed.hexdigest() for section, hashed in hashes.items()
+    }
+    overall = hashlib.sha1(
+        "".join(
+            f"{section}\0{digest}\n"
+            for section, digest in sorted(section_digests.items())
+        ).encode("utf-8")
+    ).hexdigest()
+    return overall, section_digests
+
+
+def find_mismatches(expected, engine_values):
+    """Compares the expected share values with the ones used by the engine.
+
+    Parameters:
+        expected (dict): Share values keyed by (section, show, field).
+        engine_values (dict): Engine share values with the same keys.
+
+    Returns:
+        mismatches (dict): (expected, engine) value pairs keyed by every
+        (section, show, field) the engine does not match, None meaning missing.
+    """
+
+    mismatches = {}
+    for key, value in expected.items():
+        engine_value = engine_values.get(key)
+        if engine_value is None or round(engine_value, SHARE_DECIMALS) != round(
+            value, SHARE_DECIMALS
+        ):
+            mismatches[key] = (value, engine_value)
+    return mismatches
+
+
+def wait_for_limits(
+    expected, timeout=30.0, interval=0.5, url=ENGINE_LIMITS_URL, cancelled=None
+):
+    """Polls the engine until it uses every expected share value.
+
+    Every round fetches the engine limits once and compares all the values in
+    a single pass. Values the engine already matched are not checked again,
+    so later rounds only look at the ones that were still wrong. A round the
+    engine fails to answer counts as every pending value being wrong.
+
+    Parameters:
+        expected (dict): Share values keyed by (section, show, field).
+        timeout (float): Seconds to keep polling before giving up.
+        interval (float): Seconds to wait between two polls.
+        url (str): Engine page listing the limits.
+        cancelled (threading.Event): Optional event that stops the polling
+        as soon as it is set.
+
+    Returns:
+        mismatches (dict): (expected, engine) value pairs the engine still did
+        not match when giving up, empty if everything matched.
+    """
+
+    deadline = time.monotonic() + timeout
+    pending = expected
+    while True:
+        sections = {section for section, _show, _field in pending}
+        try:
+            engine_values = share_values(fetch_limits(url), sections)
+        except (OSError, ValueError, HTTPException) as error:
+            # A busy or restarting engine is asked again on the next round
+            print(f"The engine limits could not be read: {error}")
+            engine_values = {}
+        mismatches = find_mismatches(pending, engine_values)
+        if not mismatches or time.monotonic() >= deadline:
+            return mismatches
+        pending = {key: values[0] for key, values in mismatches.items()}
+        if cancelled is None:
+            time.sleep(interval)
+        elif cancelled.wait(interval):
+            return mismatches
+
+
+def reload_and_verify(
+    expected,
+    max_reloads=MAX_RELOADS,
+    reload_timeout=RELOAD_TIMEOUT,
+    interval=POLL_INTERVAL,
+    url=ENGINE_LIMITS_URL,
+    reload_url=ENGINE_RELOAD_URL,
+    cancelled=None,
+    progress=None,
+):
+    """Reloads Tractor until the engine uses every expected share value, up to
+    'max_reloads' times. Only the values still wrong after a reload are checked
+    after the next one.
+
+    Parameters:
+        expected (dict): Share values keyed by (section, show, field).
+        max_reloads (int): Amount of reloads before giving up.
+        reload_timeout (float): Seconds to wait for the engine after a reload.
+        interval (float): Seconds to wait between two checks of the engine.
+        url (str): Engine page listing the limits.
+        reload_url (str): Engine control page that reloads the limits.
+        cancelled (threading.Event): Optional event that stops everything as
+        soon as it is set.
+        progress (function): Optional callback receiving the number of every
+        reload right before it happens.
+
+    Returns:
+        result (tuple): The (expected, engine) value pairs still wrong, empty
+        if everything matched, and the amount of reloads done.
+    """
+
+    sections = {section for section, _show, _field in expected}
+    pending = dict(expected)
+    mismatches = {}
+    for reload_count in range(1, max_reloads + 1):
+        if cancelled is not None and cancelled.is_set():
+            return mismatches, reload_count - 1
+        if progress is not None:
+            progress(reload_count)
+        reload_limits(reload_url)
+        print(f"Amount of config-reloads: {reload_count}")
+
+        mismatches = wait_for_limits(
+            pending,
+            timeout=reload_timeout,
+            interval=interval,
+            url=url,
+            cancelled=cancelled,
+        )
+        if not mismatches:
+            return mismatches, reload_count
+
+        wrong_sections = {section for section, _show, _field in mismatches}
+        print(
+            f"The engine does not match {len(mismatches)} of the "
+            f"{len(expected)} new values yet, in "
+            f"{len(wrong_sections)} of {len(sections)} section(s):"
+        )
+        print("Section | Show | Field | New Value | Web Value")
+        for (section, show, field), values in mismatches.items():
+            print(section, show, field, *values)
+        pending = {key: values[0] for key, values in mismatches.items()}
+
+    return mismatches, max_reloads
+
+
+def engine_metrics(url=ENGINE_LIMITS_URL):
+    """Returns the request counters and latencies of the engine client.
+
+    Parameters:
+        url (str): Any URL of the engine.
+
+    Returns:
+        metrics (dict): See EngineClient.metrics().
+    """
+
+    return get_client(url).metrics()
@@ -12,14 +12,14 @@ Created by Guillermo Aguero - Render TD
 Written in Python3.
 """
 
-import json
-import os
 import re
-from collections import OrderedDict
-from functools import partial
 from qtpy import QtWidgets, QtCore, QtGui
 
 from changes_confirmation_window import UiConfirmFarmChangesMainWindow
+from allocation_model import SectionAllocations
+from share_editor import ShareBulkPanel, ShareEditor, ShareTotalBox
+from config_spans import load_section
+from staging import get_overlay
 
 
 class UiWindowsFarmMainWindow(QtWidgets.QMainWindow):
@@ -60,19 +60,19 @@ class UiWindowsFarmMainWindow(QtWidgets.QMainWindow):
 
         Attributes:
             shows (list): List of show names available on the farm.
-            current_perc_list (list): List of current percentage values for shows.
-            spinboxes_list (list): List of spin box widgets for nominal percentages.
-            sliders_list (list): List of slider widgets for nominal percentages.
-            spinboxes_hardcap_list (list): List of spin box widgets for hard cap
-            percentages.
-            current_values_full_dict (dict): Dictionary of current percentage
-            values for shows.
-            current_values_cap_full_dict (dict): Dictionary of current hard cap
-            percentage values for shows.
+            share_editor (ShareEditor): Table with the slider and spin boxes
+            of every show.
+            allocations (SectionAllocations): Current nominal and hard cap
+            percentages of every show, including the changes staged so far.
+            live_allocations (SectionAllocations): The same percentages as
+            they are in the configuration file.
             y_axis_window_size (int): Initial window height.
 
         Config Data:
-            contents_dict (dict): Dictionary containing the configuration file contents.
+            section_dict (OrderedDict): Contents of this farm's section of the
+            configuration file.
+            overlay (StagingOverlay): Changes staged so far on top of the
+            configuration file.
 
         UI Components:
             centralwidget: The central widget of the main window.
@@ -102,22 +102,16 @@ class UiWindowsFarmMainWindow(QtWidgets.QMainWindow):
         self.centralwidget = ""
         self.windows_farm_groupbox = None
         self.shows = []
-        self.current_perc_list = []
-        self.spinboxes_list = []
-        self.sliders_list = []
-        self.spinboxes_hardcap_list = []
-        self.current_values_full_dict = dict()
-        self.current_values_cap_full_dict = dict()
+        self.share_editor = None
+        self.live_allocations = None
+        self.allocations = None
         self.y_axis_window_size = None
 
-        # Opening config file
-        if os.path.exists(self.temp_folder + "temp.config"):
-            with open(self.temp_folder + "temp.config", "r") as i:
-                self.contents_dict = json.load(i, object_pairs_hook=OrderedDict)
-        else:
-            # Opening config file if temp file does not exist.
-            with open(config_file_path_name, "r") as i:
-                self.contents_dict = json.load(i, object_pairs_hook=OrderedDict)
+        # Opening only this farm's section of the config file (shared and only
+        # parsed again if it changed). Changes staged so far are kept apart
+        # from it in the staging overlay.
+        self.section_dict = load_section(config_file_path_name, self.farm_name)
+        self.overlay = get_overlay(config_file_path_name, temp_folder)
 
         self.m_font = QtGui.QFont("Cantarell", 12, QtGui.QFont.Bold)
         self.m_font.setUnderline(True)
@@ -146,7 +140,8 @@ class UiWindowsFarmMainWindow(QtWidgets.QMainWindow):
         self.button_creation()
 
     def get_shows(self):
-        """Generates a list of show names that the farm has access to.
+        """Generates the allocations model and the list of show names that the
+        farm has access to.
 
         Parameters:
             self (object): The object instance.
@@ -155,11 +150,15 @@ class UiWindowsFarmMainWindow(QtWidgets.QMainWindow):
             None
         """
 
-        # This generates a list of all shows for this farm
+        # This generates the model (and list) of all shows for this farm
         avoid = ["default"]
-        for key in self.contents_dict["Limits"][self.farm_name]["Shares"].keys():
-            if all(word not in key for word in avoid):
-                self.shows.append(key)
+        self.live_allocations = SectionAllocations.from_section(
+            self.farm_name,
+            self.section_dict,
+            include=lambda key: all(word not in key for word in avoid),
+        )
+        self.allocations = self.overlay.applied_to(self.live_allocations)
+        self.shows = list(self.allocations.shows)
 
     def windowsfarm_window_setup(self):
         """This function sets up the farm selection window, including the size,
@@ -226,153 +225,51 @@ class UiWindowsFarmMainWindow(QtWidgets.QMainWindow):
         self.windows_farm_groupbox.setFont(self.l_font)
 
     def groupbox_info_creation(self):
-        """Creates and configures UI components (labels, spin boxes, and sliders)
-        within a group box for displaying and modifying show allocations.
+        """Creates the share editor (a table with a label, slider and spin
+        boxes per show) within the group box for displaying and modifying show
+        allocations, the spin box showing the total of every nominal
+        percentage and the buttons of the bulk operations.
+
+        The window grows with the amount of shows only until it fills the
+        screen, past that the share editor scrolls. Only the rows on screen are
+        drawn, so farms with hundreds of shows open as fast as small ones.
 
-        This function iterates through the list of shows and dynamically creates
-        labels, spin boxes, and sliders for each show. It then connects the spin
-        boxes and sliders to synchronize their values and calculates the total
-        percentage of allocations. If the UI components exceed the initial window
-        size, the window and group box sizes are adjusted accordingly.
+        Parameters:
+            self (object): The object instance.
 
         Internal Functions:
-            label_creation(show, y_axis_value): Creates a label for a show.
-            spin_box_creation(y_axis_value): Creates spin boxes for show allocations
-            and hard cap values.
-            sliders_creation(y_axis_value): Creates a horizontal slider for a show.
-            connect_parts(spin_box, slider): Connects a spin box and a slider to
-            update each other's values.
             current_percent_spin_box_creation(): Creates a spin box to display the
             total current percentage of allocations.
         """
 
-        labels_y_axis_value = 70
-        slider_box_y_axis_value = 100
-
-        def label_creation(show, labels_y_axis_value):
-            """Creates a QLabel object with the provided show title and sets
-            its properties.
-
-            Parameters:
-                show (str): The title of the show
-                labels_y_axis_value (int): The y-axis value where the label
-                will be created.
-
-            Returns:
-                None
-            """
-
-            spaced_out_label = re.sub(r"(\w)([A-Z])", r"\1 \2", show)
-            label = QtWidgets.QLabel(spaced_out_label, self.windows_farm_groupbox)
-            label.setGeometry(270, labels_y_axis_value, 180, 20)
-            label.setFont(self.m_font)
-            label.setTextFormat(QtCore.Qt.TextFormat.AutoText)
-            label.setScaledContents(False)
-            label.setWordWrap(True)
-
-        def spin_box_creation(slider_box_y_axis_value):
-            """Creates two QDoubleSpinBoxes for a show and its hard cap value
-
-            Parameters:
-                slider_box_y_axis_value (int): y-axis value for positioning
-                the spin boxes.
-
-            Returns:
-                spin_box (QDoubleSpinBox): QDoubleSpinBox for the show
-                hardcap_spin_box (QDoubleSpinBox): QDoubleSpinBox for the
-                hard cap value of the show.
-            """
-
-            # Minimum and Maximum for all spin boxes
-            minimum = 0
-            maximum = 100
-
-            spin_box = QtWidgets.QDoubleSpinBox(self.windows_farm_groupbox)
-            spin_box.setGeometry(560, slider_box_y_axis_value, 57, 22)
-            spin_box.setFont(self.s_font)
-            spin_box.setDecimals(1)
-            spin_box.setMinimum(minimum)
-            spin_box.setMaximum(maximum)
-
-            hardcap_spin_box = QtWidgets.QDoubleSpinBox(self.windows_farm_groupbox)
-            hardcap_spin_box.setGeometry(640, slider_box_y_axis_value, 60, 22)
-            hardcap_spin_box.setFont(self.s_font)
-            hardcap_spin_box.setDecimals(1)
-            hardcap_spin_box.setMinimum(minimum)
-            hardcap_spin_box.setMaximum(maximum)
-
-            return spin_box, hardcap_spin_box
-
-        def sliders_creation(slider_box_y_axis_value):
-            """Creates a horizontal slider widget and sets its properties.
-
-            Parameters:
-                show (str): A string representing the name of the slider.
-                slider_box_y_axis_value (int): An integer representing the
-                y-axis value of the slider.
-
-            Returns:
-                slider (QSlider): A horizontal slider widget with a specified
-                range and name.
-            """
-
-            # Minimum and Maximum for all sliders
-            minimum = 0
-            maximum = 100
-            # Setting up
-            slider = QtWidgets.QSlider(self.windows_farm_groupbox)
-            slider.setGeometry(270, slider_box_y_axis_value, 251, 20)
-            slider.setTracking(True)
-            slider.setOrientation(QtCore.Qt.Orientation.Horizontal)
-            slider.setMinimum(minimum)
-            slider.setMaximum(maximum)
-
-            return slider
-
-        def connect_parts(spin_box, slider):
-            """Connects a Spin Box and Slider to update each other's values.
-
-            Parameters:
-                spin_box (QSpinBox): the spin box to be connected to the
-                slider.
-                slider (QSlider): the slider to be connected to the spin box.
-
-            Returns:
-                None
-            """
-
-            def _update_slider(slide, value):
-                slide.setValue(value)
-
-            def _update_box(box, value):
-                box.setValue(value)
-
-            spin_box.valueChanged.connect(partial(_update_slider, slider))
-            slider.valueChanged.connect(partial(_update_box, spin_box))
-
-        # This "for" loop individually sets-up every single show in the list of shows.
-        for show in self.shows:
-            label_creation(show, labels_y_axis_value)
-            spin_box, hardcap_spin_box = spin_box_creation(slider_box_y_axis_value)
-            slider = sliders_creation(slider_box_y_axis_value)
-            # Connecting all sliders to their Spin Boxes and vice versa
-            connect_parts(spin_box, slider)
-            # Getting current Percentages per show to be able to pass it to the
-            # Confirmation Window
-            self.current_values_show(
-                show,
-                slider,
-                spin_box,
-                hardcap_spin_box,
-            )
-
-            self.sliders_list.append(slider)
-            self.spinboxes_list.append(spin_box)
-            self.spinboxes_hardcap_list.append(hardcap_spin_box)
-            labels_y_axis_value = labels_y_axis_value + 60
-            slider_box_y_axis_value = slider_box_y_axis_value + 60
+        # Show names are spaced out, e.g. 'SomeShow' reads 'Some Show'
+        self.share_editor = ShareEditor(
+            self.allocations,
+            self.windows_farm_groupbox,
+            self.s_font,
+            self.m_font,
+            show_label=lambda show: re.sub(r"(\w)([A-Z])", r"\1 \2", show),
+            show_column_width=170,
+        )
 
-        total_current_percent = sum(self.current_perc_list)
+        # Sizing the window once for every show, capped to the screen
+        screen = QtGui.QGuiApplication.screenAt(QtGui.QCursor().pos())
+        if screen is None:
+            screen = QtGui.QGuiApplication.primaryScreen()
+        self.y_axis_window_size = min(
+            max(
+                self.y_axis_window_size,
+                70 + self.share_editor.height_for_rows(len(self.shows)) + 70,
+            ),
+            max(self.y_axis_window_size, screen.availableGeometry().height() - 60),
+        )
+        self.setFixedSize(740, self.y_axis_window_size)
+        self.windows_farm_groupbox.setGeometry(
+            10, 10, 721, self.y_axis_window_size - 20
+        )
+        self.share_editor.setGeometry(
+            260, 70, 451, self.y_axis_window_size - 20 - 70 - 45
+        )
 
         def current_percent_spin_box_creation():
             """Creates a spinbox to be able to show the current total of all
@@ -381,84 +278,27 @@ class UiWindowsFarmMainWindow(QtWidgets.QMainWindow):
             Returns:
                 None
             """
-            total_spin_box = QtWidgets.QDoubleSpinBox(self.windows_farm_groupbox)
-            total_spin_box.setGeometry(190, 250, 50, 22)
-            total_spin_box.setFont(self.s_font)
-            total_spin_box.setDecimals(0)
-            total_spin_box.setValue(total_current_percent)
-            total_spin_box.setDisabled(True)
-            total_spin_box.setButtonSymbols(
-                QtWidgets.QAbstractSpinBox.ButtonSymbols.NoButtons
+            total_spin_box = ShareTotalBox(
+                self.windows_farm_groupbox, self.s_font, self.allocations.total()
             )
-            total_spin_box.setMaximum(2000)
-            total_spin_box.setStyleSheet("color: green")
-
-            def update_total():
-                total_value = sum(box.value() for box in self.spinboxes_list)
-                total_spin_box.setValue(total_value)
-
-                if total_value > 100 or total_value < 100:
-                    total_spin_box.setStyleSheet("color: red")
-                else:
-                    total_spin_box.setStyleSheet("color: green")
+            total_spin_box.setGeometry(190, 250, 50, 22)
 
-            for box, slide in zip(self.spinboxes_list, self.sliders_list):
-                box.valueChanged.connect(update_total)
-                slide.valueChanged.connect(update_total)
+            # The model keeps the total itself and only signals real changes
+            self.share_editor.share_model().totalChanged.connect(
+                total_spin_box.set_total
+            )
 
         current_percent_spin_box_creation()
 
-        # If the size of the y-axis being used to create all the sliders,
-        # labels and boxes is greater than the window size minus 50 then it
-        # increases the size of both the Window and the groupbox.
-
-        if labels_y_axis_value > (self.y_axis_window_size - 50):
-            self.y_axis_window_size = self.y_axis_window_size + 120
-            self.setFixedSize(740, self.y_axis_window_size)
-            self.y_axis_window_size = self.y_axis_window_size - 20  # 42
-            self.windows_farm_groupbox.setGeometry(10, 10, 721, self.y_axis_window_size)
-
-    def current_values_show(
-        self,
-        show,
-        slider,
-        spin_box,
-        hardcap_spin_box,
-    ):
-        """Function to update the current percentage values for the nominal
-        and hard cap for a given show.
-
-        Parameters:
-            self (object): The object instance.
-            show (str): The show name.
-            slider (QSlider): The slider for the nominal percentage.
-            spin_box (QSpinBox): The spin box for the nominal percentage.
-            hardcap_spin_box (QSpinBox): The spin box for the hard cap
-            percentage.
-
-        Returns:
-            None
-        """
-
-        # Nominal
-        current_value = self.contents_dict["Limits"][self.farm_name]["Shares"][show][
-            "nominal"
-        ]
-        current_perc = round(current_value * 100, 1)
-        slider.setValue(current_perc)
-        spin_box.setValue(current_perc)
-        self.current_values_full_dict.update({show: current_perc})
-
-        self.current_perc_list.append(current_perc)
-
-        # Hard Cap
-        current_cap_value = self.contents_dict["Limits"][self.farm_name]["Shares"][
-            show
-        ]["cap"]
-
-        current_cap_perc = round(current_cap_value * 100, 1)
-        hardcap_spin_box.setValue(current_cap_perc)
-        self.current_values_cap_full_dict.update({show: current_cap_perc})
+        # Bulk operations on the selected shows (or all of them) and the
+        # switch keeping the total at 100
+        bulk_panel = ShareBulkPanel(
+            self.share_editor,
+            self.live_allocations,
+            self.windows_farm_groupbox,
+            self.s_font,
+        )
+        bulk_panel.setGeometry(10, 285, 240, 72)
 
     def info_label_creation(self):
         """Creates and sets text for various labels in the window.
@@ -512,7 +352,7 @@ class UiWindowsFarmMainWindow(QtWidgets.QMainWindow):
 
         # Nominal and Hard Cap labels
         nominal_label = QtWidgets.QLabel("Nominal", self.windows_farm_groupbox)
-        nominal_label.setGeometry(560, 40, 61, 20)  # 565 10
+        nominal_label.setGeometry(577, 40, 61, 20)
         nominal_label.setFont(self.m_font)
         nominal_label.setTextFormat(QtCore.Qt.TextFormat.AutoText)
         nominal_label.setScaledContents(False)
@@ -583,17 +423,9 @@ class UiWindowsFarmMainWindow(QtWidgets.QMainWindow):
             None
         """
 
-        new_values_list = []
-        for box in self.spinboxes_list:
-            new_value = box.value()
-            new_values_list.append(new_value)
-
-        new_hard_values_list = []
-        for box in self.spinboxes_hardcap_list:
-            new_hard_value = box.value()
-            new_hard_values_list.append(new_hard_value)
+        new_allocations = self.share_editor.share_model().allocations()
 
-        big_sum = round(sum(new_values_list), 1)
+        big_sum = new_allocations.total()
 
         if big_sum < 100.0 or big_sum > 100.0:
             error_label = QtWidgets.QLabel(
@@ -616,8 +448,6 @@ class UiWindowsFarmMainWindow(QtWidgets.QMainWindow):
             error_label.show()
 
         else:
-            new_values_dict = dict(zip(self.shows, new_values_list))
-            new_hard_values_dict = dict(zip(self.shows, new_hard_values_list))
 
             # This check is needed for the following window to choose whether
             # to display the "Stage All" button or not
@@ -627,12 +457,8 @@ class UiWindowsFarmMainWindow(QtWidgets.QMainWindow):
             farm_sections: list = []
 
             changes_confirmation_window = UiConfirmFarmChangesMainWindow(
-                self.current_values_full_dict,
-                new_values_dict,
-                self.current_values_cap_full_dict,
-                new_hard_values_dict,
-                self.farm_name,
-                self.contents_dict,
+                self.allocations,
+                new_allocations,
                 self.config_file_path_name,
                 self.temp_folder,
                 self.backup_folder,